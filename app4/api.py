@@ -12,23 +12,34 @@ load_dotenv()
 
 # Agregar el directorio actual al PYTHONPATH para que Python encuentre el paquete 'backend'
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, Response, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional, Any
 import os
+import json
+import hashlib
 import asyncio
 from datetime import datetime
 
 from backend.core.prompt_orchestrator import PromptOrchestrator
+from backend.core.webai_client import WebAIClient
 from backend.db.database import db
-from backend.db.repositories import ProjectRepository, ClipRepository
+from backend.db.repositories import ProjectRepository, ClipRepository, IdempotencyRepository
 from backend.models.models import Project, ProjectStatus, ClipStatus
+from backend.utils import metrics, admission
+from backend.utils.admission import production_gate, prompt_gate
+from backend.utils.loop_monitor import loop_monitor
+from backend.utils.prompt_cache import prompt_cache
 
 # Imports opcionales para el agente de optimización
 try:
-    from backend.core.prompt_engineer_agent import PromptEngineerAgent
+    from backend.core.context_cache import context_cache
+    from backend.core.prompt_engineer_agent import (
+        PromptEngineerAgent, get_agent, get_generative_model, registered_agents,
+        generate_official, official_stats, response_stats
+    )
     from backend.core.prompt_validator import PromptValidator
     from backend.core.prompt_optimizer import PromptOptimizer
     from backend.models.models import PromptOptimizationConfig
@@ -43,22 +54,6 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS - Allow frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5175",  # Current frontend port
-        "http://127.0.0.1:5175",
-        "http://localhost:5174",
-        "http://127.0.0.1:5174",
-        "http://localhost:3000",
-        "http://127.0.0.1:3000"
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # Global orchestrator - initialized lazily to prevent blocking
 orchestrator = None
 
@@ -79,14 +74,94 @@ active_productions: dict[str, dict[str]] = {}
 async def startup():
     """Connect to database on startup"""
     await db.connect()
+    loop_monitor.start()
+    _warm_prompt_agents()
     print("[OK] API started and connected to MongoDB")
 
 @app.on_event("shutdown")
 async def shutdown():
     """Close database connection on shutdown"""
+    loop_monitor.stop()
+    await WebAIClient.aclose_all()
+    if AGENT_AVAILABLE:
+        # Cached content is billed while it exists
+        await asyncio.to_thread(context_cache.close)
     await db.close()
     print("[BYE] API shutdown")
 
+# ============================================================
+# IDEMPOTENCY
+# ============================================================
+
+# POST endpoints that create paid work (Gemini calls, Veo generations)
+IDEMPOTENT_PATHS = {"/api/projects", "/api/production/start", "/api/prompts/optimize", "/api/prompts/optimize/batch"}
+IDEMPOTENCY_TTL = float(os.getenv("APP4_IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_LEASE = float(os.getenv("APP4_IDEMPOTENCY_LEASE", "600"))
+
+@app.middleware("http")
+async def idempotent_requests(request: Request, call_next):
+    """
+    Replay the first successful response to retries with the same Idempotency-Key header,
+    so a client retrying after a network timeout does not trigger another Gemini/Veo call.
+    """
+    key = request.headers.get("idempotency-key")
+    if request.method != "POST" or request.url.path not in IDEMPOTENT_PATHS or not key:
+        return await call_next(request)
+    if len(key) > 255:
+        return JSONResponse({"detail": "Idempotency-Key must be at most 255 characters"}, status_code=400)
+
+    # Same key + different endpoint or payload is a client bug, not a retry
+    body = await request.body()
+    fingerprint = f"{request.url.path}:{hashlib.sha256(body).hexdigest()}"
+    record = await IdempotencyRepository.claim(key, fingerprint, IDEMPOTENCY_LEASE)
+    if record is not None:
+        if record["fingerprint"] != fingerprint:
+            return JSONResponse({"detail": "Idempotency-Key was already used for a different request"}, status_code=422)
+        if record["state"] != "done":
+            return JSONResponse({"detail": "A request with this Idempotency-Key is still in progress"},
+                                status_code=409, headers={"Retry-After": "2"})
+        return Response(content=record["body"], status_code=record["status_code"], media_type="application/json",
+                        headers={"Idempotent-Replayed": "true"})
+
+    try:
+        response = await call_next(request)
+        content = b"".join([chunk async for chunk in response.body_iterator])
+    except BaseException:
+        await IdempotencyRepository.release(key)
+        raise
+
+    # Only keep real results; errors and {"ok": false} answers (agent disabled, missing key) may succeed on retry
+    stored = False
+    if 200 <= response.status_code < 300:
+        try:
+            payload = json.loads(content)
+            if not (isinstance(payload, dict) and payload.get("ok") is False):
+                await IdempotencyRepository.complete(key, response.status_code, content.decode("utf-8"), IDEMPOTENCY_TTL)
+                stored = True
+        except ValueError:
+            pass
+    if not stored:
+        await IdempotencyRepository.release(key)
+    return Response(content=content, status_code=response.status_code, headers=dict(response.headers))
+
+# CORS - Allow frontend
+# Added after the http middlewares so it runs outermost: their 400/409/422 get CORS headers too
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "http://localhost:5175",  # Current frontend port
+        "http://127.0.0.1:5175",
+        "http://localhost:5174",
+        "http://127.0.0.1:5174",
+        "http://localhost:3000",
+        "http://127.0.0.1:3000"
+    ],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["Retry-After", "Idempotent-Replayed"],
+)
+
 # ============================================================
 # MODELS
 # ============================================================
@@ -113,6 +188,17 @@ class PromptOptimizationRequest(BaseModel):
     camera_specs: Optional[dict] = None
     image_context: Optional[dict] = None  # Visual analysis from image (for first scene)
 
+# Upper bounds for /api/prompts/optimize/batch (each scene is one LLM call)
+BATCH_MAX_SCENES = int(os.getenv("PROMPT_BATCH_MAX_SCENES", "30"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("PROMPT_BATCH_CONCURRENCY", "6"))
+
+class BatchOptimizationRequest(BaseModel):
+    """Request model for optimizing every scene of a project at once"""
+    project_id: Optional[str] = None  # Stored project, or...
+    template: Optional[dict] = None  # ...an unsaved template with "scenes"
+    scene_ids: Optional[List[int]] = Field(None, max_length=BATCH_MAX_SCENES)  # Only these scenes (default: all)
+    max_concurrency: Optional[int] = Field(None, ge=1, le=BATCH_MAX_CONCURRENCY)
+
 class PromptValidationRequest(BaseModel):
     """Request model for prompt validation"""
     action: str
@@ -134,6 +220,44 @@ async def root():
         "status": "running"
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics (event-loop lag, ...)"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/queue")
+async def queue_depth():
+    """Current depth of each admission gate; clients can check it before submitting work"""
+    return {"ok": True, "gates": admission.snapshot()}
+
+@app.get("/api/system/webai")
+async def webai_pool_status():
+    """Connection pool stats for the WebAI-to-API client"""
+    return {"ok": True, "pools": WebAIClient.pool_stats()}
+
+@app.get("/api/system/loop")
+async def loop_status():
+    """Event-loop lag monitor summary"""
+    return loop_monitor.snapshot()
+
+@app.get("/api/system/agents")
+async def agent_registry_status():
+    """Shared PromptEngineerAgent instances"""
+    if not AGENT_AVAILABLE:
+        return {"ok": True, "agents": [], "official": None, "context_cache": None, "responses": None}
+    return {
+        "ok": True,
+        "agents": registered_agents(),
+        "official": official_stats(),
+        "context_cache": context_cache.snapshot(),
+        "responses": response_stats()
+    }
+
+@app.get("/api/system/prompt-cache")
+async def prompt_cache_status():
+    """Prompt optimization cache: size, hit ratio and hits per tier"""
+    return prompt_cache.snapshot()
+
 @app.get("/api/projects")
 async def get_projects(
     status: Optional[str] = None,
@@ -201,7 +325,7 @@ async def delete_project(project_id: str):
 # ENDPOINTS - PRODUCTION
 # ============================================================
 
-async def run_production_background(project_id: str, template: dict[str], auto_mode: bool):
+async def run_production_background(project_id: str, template: dict[str], auto_mode: bool, admitted_at: Optional[float] = None):
     """Background task for running production"""
     try:
         active_productions[project_id] = {
@@ -228,6 +352,9 @@ async def run_production_background(project_id: str, template: dict[str], auto_m
             "error": str(e),
             "failed_at": datetime.utcnow().isoformat()
         }
+    finally:
+        if admitted_at is not None:
+            production_gate.release(admitted_at)
 
 @app.post("/api/production/start")
 async def start_production(data: ProductionStart, background_tasks: BackgroundTasks):
@@ -244,16 +371,23 @@ async def start_production(data: ProductionStart, background_tasks: BackgroundTa
             if status == "running":
                 raise HTTPException(status_code=400, detail="Production already running")
         
-        # Update project status
-        await ProjectRepository.update(data.project_id, {"status": ProjectStatus.IN_PROGRESS})
-        
-        # Start production in background
-        background_tasks.add_task(
-            run_production_background,
-            data.project_id,
-            project,
-            data.auto_mode
-        )
+        # Shed load before committing to a production (429 + Retry-After when full)
+        admitted_at = production_gate.acquire()
+        try:
+            # Update project status
+            await ProjectRepository.update(data.project_id, {"status": ProjectStatus.IN_PROGRESS})
+            
+            # Start production in background; the task releases the slot when it ends
+            background_tasks.add_task(
+                run_production_background,
+                data.project_id,
+                project,
+                data.auto_mode,
+                admitted_at
+            )
+        except Exception:
+            production_gate.release(admitted_at)
+            raise
         
         return {
             "ok": True,
@@ -380,107 +514,126 @@ async def get_clip_video(clip_id: str):
 # ENDPOINTS - PROMPT OPTIMIZATION
 # ============================================================
 
-@app.post("/api/prompts/optimize")
+def _optimization_unavailable(data: PromptOptimizationRequest) -> Optional[dict]:
+    """Error payload when the agent cannot run (not installed, disabled or no API key)"""
+    error = None
+    if not AGENT_AVAILABLE:
+        error = "Prompt optimization agent not available"
+    elif os.getenv("PROMPT_OPTIMIZATION_ENABLED", "true").lower() != "true":
+        error = "Prompt optimization is disabled"
+    elif not (os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")):
+        error = "GEMINI_API_KEY not configured"
+    if error is None:
+        return None
+    return {
+        "ok": False,
+        "error": error,
+        "original": {
+            "action": data.action,
+            "emotion": data.emotion
+        }
+    }
+
+# Target video model for previews (PromptOptimizationConfig is only read once)
+PREVIEW_TARGET_MODEL = str(PromptOptimizationConfig().model_type) if AGENT_AVAILABLE else "veo-3.1"
+PREVIEW_MODEL = "gemini-3.0-pro"  # confirmed available on the local server
+PREVIEW_WEBAI_URL = "http://localhost:6969/v1"
+# Vision model for /api/prompts/analyze-frame (official API, has available quota)
+VISION_MODEL = "gemini-2.5-flash"
+
+def _create_preview_agent() -> "PromptEngineerAgent":
+    """Agente (compartido) con servidor local WebAI para previews de optimización"""
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    return get_agent(
+        api_key=str(api_key),
+        model_name=PREVIEW_MODEL,
+        target_video_model=PREVIEW_TARGET_MODEL,
+        use_local=True,
+        webai_base_url=PREVIEW_WEBAI_URL
+    )
+
+def _warm_prompt_agents() -> None:
+    """Crea los agentes compartidos al arrancar, así el primer request no paga la construcción"""
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    if not AGENT_AVAILABLE or not api_key:
+        return
+    try:
+        agent = _create_preview_agent()
+        if agent.webai_client:
+            agent.webai_client.start_health_probe()
+        get_generative_model(VISION_MODEL, str(api_key))
+        print(f"[OK] Prompt agents ready: {registered_agents()}")
+    except Exception as e:
+        print(f"[WARN] Could not warm prompt agents: {e}")
+
+def _preview_inputs(data: PromptOptimizationRequest) -> tuple[dict, dict, dict]:
+    """(user_input, minimal_template, scene) para optimizar una escena suelta"""
+    # Crear template mínimo
+    minimal_template = {
+        "product": {
+            "name": "Product",
+            "description": data.product_tone or "Premium product"
+        },
+        "brand_guidelines": {
+            "mood": data.product_tone or "professional",
+            "color_palette": [],
+            "lighting_style": "cinematic"
+        },
+        "subject": {
+            "description": "Main subject"
+        }
+    }
+    
+    # Crear escena mínima
+    scene = {
+        "scene_id": 0,
+        "name": "Preview",
+        "duration": 8,
+        "action_details": data.action,
+        "emotion": data.emotion,
+        "camera_specs": data.camera_specs or {}
+    }
+    
+    user_input = {
+        "action": data.action,
+        "emotion": data.emotion,
+        "dialogue": data.dialogue or "",
+        "voice_gender": data.voice_gender or "female"
+    }
+    return user_input, minimal_template, scene
+
+def _optimization_response(optimized_data: dict, user_input: dict) -> dict:
+    """Formato de respuesta de /api/prompts/optimize"""
+    return {
+        "ok": True,
+        "optimized": {
+            "action": optimized_data.get("optimized_action", user_input["action"]),
+            "emotion": optimized_data.get("optimized_emotion", user_input["emotion"]),
+            "dialogue": optimized_data.get("optimized_dialogue", ""),
+            "keywords": optimized_data.get("technical_keywords", [])
+        },
+        "validation": optimized_data.get("validation", {}),
+        "used_local_server": optimized_data.get("optimization_metadata", {}).get("used_local_server", False)
+    }
+
+@app.post("/api/prompts/optimize", dependencies=[Depends(prompt_gate.dependency)])
 async def optimize_prompt(data: PromptOptimizationRequest):
     """
     Optimiza un prompt usando el Agente Gemini
     Útil para preview antes de crear proyecto
     """
     try:
-        # Verificar si el agente está disponible
-        if not AGENT_AVAILABLE:
-            return {
-                "ok": False,
-                "error": "Prompt optimization agent not available",
-                "original": {
-                    "action": data.action,
-                    "emotion": data.emotion
-                }
-            }
-        
-        # Verificar si el agente está habilitado
-        optimization_enabled = os.getenv("PROMPT_OPTIMIZATION_ENABLED", "true").lower() == "true"
-        
-        if not optimization_enabled:
-            return {
-                "ok": False,
-                "error": "Prompt optimization is disabled",
-                "original": {
-                    "action": data.action,
-                    "emotion": data.emotion
-                }
-            }
-        
-        # Obtener API key
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            return {
-                "ok": False,
-                "error": "GEMINI_API_KEY not configured",
-                "original": {
-                    "action": data.action,
-                    "emotion": data.emotion
-                }
-            }
+        # Verificar si el agente está disponible, habilitado y con API key
+        unavailable = _optimization_unavailable(data)
+        if unavailable:
+            return unavailable
         
         # Inicializar agente con modo local WebAI
-        print("[DEBUG] Creating PromptEngineerAgent...")
-        import sys; sys.stdout.flush()
-        
-        config = PromptOptimizationConfig()
-        model_name = str("gemini-3.0-pro")  # Force pure string, confirmed available
-        agent = PromptEngineerAgent(
-            api_key=str(api_key),  # Force string
-            model_name=model_name,
-            target_video_model=str(config.model_type),  # Force string
-            use_local=True,
-            webai_base_url=str("http://localhost:6969/v1")  # Force string
-        )
-        print(f"[DEBUG] Agent created with model: {model_name}")
-        
-        # Crear template mínimo
-        minimal_template = {
-            "product": {
-                "name": "Product",
-                "description": data.product_tone or "Premium product"
-            },
-            "brand_guidelines": {
-                "mood": data.product_tone or "professional",
-                "color_palette": [],
-                "lighting_style": "cinematic"
-            },
-            "subject": {
-                "description": "Main subject"
-            }
-        }
+        agent = _create_preview_agent()
+        user_input, minimal_template, scene = _preview_inputs(data)
         
-        # Crear escena mínima
-        scene = {
-            "scene_id": 0,
-            "name": "Preview",
-            "duration": 8,
-            "action_details": data.action,
-            "emotion": data.emotion,
-            "camera_specs": data.camera_specs or {}
-        }
-        
-        # Optimizar
-        user_input = {
-            "action": data.action,
-            "emotion": data.emotion,
-            "dialogue": data.dialogue or "",
-            "voice_gender": data.voice_gender or "female"
-        }
-        
-        
-        print("[DEBUG] About to call agent.refine_prompt...")
-        print(f"[DEBUG] dialogue value: '{data.dialogue}'")
-        print(f"[DEBUG] voice_gender: {data.voice_gender}")
-        if data.image_context:
-            print(f"[DEBUG] image_context received: {list(data.image_context.keys())}")
-        else:
-            print("[DEBUG] No image_context provided")
-        import sys; sys.stdout.flush()
+        print(f"[DEBUG] Optimizing (dialogue: '{data.dialogue}', voice_gender: {data.voice_gender}, "
+              f"image_context: {list(data.image_context.keys()) if data.image_context else None})")
         
         optimized_data = await agent.refine_prompt(
             user_input=user_input,
@@ -491,18 +644,7 @@ async def optimize_prompt(data: PromptOptimizationRequest):
         
         print("[DEBUG] refine_prompt completed!")
         
-        # Return optimized data directly
-        return {
-            "ok": True,
-            "optimized": {
-                "action": optimized_data.get("optimized_action", user_input["action"]),
-                "emotion": optimized_data.get("optimized_emotion", user_input["emotion"]),
-                "dialogue": optimized_data.get("optimized_dialogue", ""),
-                "keywords": optimized_data.get("technical_keywords", [])
-            },
-            "validation": optimized_data.get("validation", {}),
-            "used_local_server": optimized_data.get("optimization_metadata", {}).get("used_local_server", False)
-        }
+        return _optimization_response(optimized_data, user_input)
         
     except Exception as e:
         print(f"[ERROR] Optimization failed: {e}")
@@ -510,6 +652,125 @@ async def optimize_prompt(data: PromptOptimizationRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Optimization error: {str(e)}")
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/prompts/optimize/stream", dependencies=[Depends(prompt_gate.dependency)])
+async def optimize_prompt_stream(data: PromptOptimizationRequest):
+    """
+    Igual que /api/prompts/optimize pero como Server-Sent Events:
+    
+        event: progress   {"stage": "building_prompt" | "cache_hit" | "calling_model" | "parsing", ...}
+        event: delta      {"text": "..."}            texto parcial del modelo
+        event: result     misma respuesta que /api/prompts/optimize (último evento)
+        event: error      {"error": "..."}
+    
+    El primer evento sale de inmediato, así el cliente ve progreso mientras el modelo responde.
+    """
+    unavailable = _optimization_unavailable(data)
+    
+    async def events():
+        if unavailable:
+            yield _sse("result", unavailable)
+            return
+        try:
+            agent = _create_preview_agent()
+            user_input, minimal_template, scene = _preview_inputs(data)
+            async for event in agent.refine_prompt_stream(
+                user_input=user_input,
+                master_template=minimal_template,
+                scene=scene,
+                image_context=data.image_context
+            ):
+                kind = event.pop("type")
+                if kind == "result":
+                    yield _sse("result", _optimization_response(event["data"], user_input))
+                else:
+                    yield _sse(kind, event)
+        except Exception as e:
+            print(f"[ERROR] Streaming optimization failed: {e}")
+            yield _sse("error", {"error": f"Optimization error: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/prompts/optimize/batch")
+async def optimize_prompts_batch(data: BatchOptimizationRequest):
+    """
+    Optimiza todas las escenas de un proyecto en paralelo (una ronda al LLM en vez de una por escena)
+    
+    Devuelve un resultado por escena, en el orden del template; una escena que falla
+    no hace fallar a las demás. Cada llamada concurrente ocupa un slot de prompt_gate:
+    el batch corre con los slots libres (hasta max_concurrency) o responde 503.
+    """
+    try:
+        if not AGENT_AVAILABLE:
+            return {"ok": False, "error": "Prompt optimization agent not available"}
+        if os.getenv("PROMPT_OPTIMIZATION_ENABLED", "true").lower() != "true":
+            return {"ok": False, "error": "Prompt optimization is disabled"}
+        if not (os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")):
+            return {"ok": False, "error": "GEMINI_API_KEY not configured"}
+        
+        template = data.template
+        if data.project_id:
+            template = await ProjectRepository.get_by_id(data.project_id)
+            if not template:
+                raise HTTPException(status_code=404, detail="Project not found")
+        if not template or not template.get("scenes"):
+            raise HTTPException(status_code=400, detail="A project_id or a template with scenes is required")
+        selected = [
+            scene for scene in template["scenes"]
+            if data.scene_ids is None or scene.get("scene_id") in data.scene_ids
+        ]
+        if len(selected) > BATCH_MAX_SCENES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {BATCH_MAX_SCENES} scenes per batch ({len(selected)} requested)"
+            )
+        if not selected:
+            raise HTTPException(status_code=400, detail="No scenes match scene_ids")
+        
+        started = datetime.utcnow()
+        wanted = min(len(selected), data.max_concurrency or BATCH_MAX_CONCURRENCY)
+        async with prompt_gate.slots(wanted) as concurrency:
+            results = await get_orchestrator().optimize_scenes(
+                template,
+                scene_ids=data.scene_ids,
+                max_concurrency=concurrency,
+                agent=_create_preview_agent()
+            )
+        
+        scenes = []
+        for result in results:
+            scene_result = {
+                "scene_id": result["scene_id"],
+                "ok": result["ok"],
+                "elapsed": result["elapsed"]
+            }
+            if "optimized" in result:
+                scene_result.update(_optimization_response(result["optimized"], result["original"]))
+                scene_result["ok"] = result["ok"]
+            if not result["ok"]:
+                scene_result["error"] = result["error"]
+            scenes.append(scene_result)
+        
+        return {
+            "ok": True,
+            "project_id": data.project_id or template.get("project_id"),
+            "scenes": scenes,
+            "optimized_count": sum(1 for r in scenes if r["ok"]),
+            "elapsed": round((datetime.utcnow() - started).total_seconds(), 3)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Batch optimization failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch optimization error: {str(e)}")
+
 @app.post("/api/prompts/validate")
 async def validate_prompt(data: PromptValidationRequest):
     """Valida coherencia de un prompt"""
@@ -554,7 +815,7 @@ class FrameAnalysisRequest(BaseModel):
     scene_context: Optional[str] = None  # Optional context about the scene
     is_first_scene: bool = False  # True if this is the first scene (product image)
 
-@app.post("/api/prompts/analyze-frame")
+@app.post("/api/prompts/analyze-frame", dependencies=[Depends(prompt_gate.dependency)])
 async def analyze_frame_for_continuity(data: FrameAnalysisRequest):
     """
     Analyze a frame image to extract visual context for scene continuity.
@@ -577,12 +838,8 @@ async def analyze_frame_for_continuity(data: FrameAnalysisRequest):
                 "error": "GEMINI_API_KEY not configured"
             }
         
-        # Create agent with official API (WebAI doesn't support vision)
-        import google.generativeai as genai
-        genai.configure(api_key=str(api_key))
-        
-        # Use Gemini 2.5 Flash for vision (has available quota)
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        # Shared official API model (WebAI doesn't support vision)
+        model = get_generative_model(VISION_MODEL, str(api_key))
         
         # Different prompts for first scene (product) vs continuity
         if data.is_first_scene:
@@ -695,8 +952,8 @@ Format as JSON:
         import io
         image = Image.open(io.BytesIO(image_bytes))
         
-        # Generate content with image
-        response = model.generate_content([analysis_prompt, image])
+        # Generate content with image (async, capped by GEMINI_MAX_CONCURRENCY)
+        response = await generate_official(model, [analysis_prompt, image], op="analyze_frame")
         response_text = response.text
         
         # Parse JSON from response
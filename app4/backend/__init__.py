@@ -1,2 +1,10 @@
 # Backend package
 
+import os
+import sys
+
+# The repository root holds the observability package shared with the Veo backend
+# (metrics registry, event-loop monitor); App4 is run from its own directory.
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
@@ -0,0 +1,194 @@
+"""
+Context Cache - Gemini cached content for the agent's static instructions
+
+The agent's instructions (role, tasks, keywords, response format) only depend
+on the target video model, yet they used to be resent as the prefix of every
+optimization. On the official API they are now uploaded once as cached content
+and each request only carries the project/scene context and the user input:
+
+    model = await context_cache.model_for(model_name, api_key, instructions)
+    response = await generate_official(model, request_prompt)
+
+Lifecycle:
+- one cached content per (model, instructions), created on first use with a
+  TTL of GEMINI_CONTEXT_CACHE_TTL seconds;
+- extended in place when a request arrives close to expiry, recreated if it
+  already expired or the extension fails (the old copy is then deleted);
+- deleted on shutdown (close()), so nothing keeps billing storage.
+
+When the model or the account can't cache (unsupported model, instructions
+below the minimum cacheable size, SDK without ``genai.caching``) the
+instructions are set as the model's system_instruction instead: a stable
+prefix the API can still reuse implicitly. Creation is retried after
+GEMINI_CONTEXT_CACHE_RETRY seconds. GEMINI_CONTEXT_CACHE=false always uses
+the system_instruction model.
+"""
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import datetime as dt
+from typing import Any, Dict, Optional, Tuple
+
+import google.generativeai as genai
+
+from ..utils import metrics
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_EVENTS = metrics.counter(
+    "app4_gemini_context_cache_total",
+    "Official-API instruction cache events (created, reused, refreshed, fallback, deleted)",
+    ["event"])
+
+
+def _model_path(model_name: str) -> str:
+    return model_name if model_name.startswith(("models/", "tunedModels/")) else f"models/{model_name}"
+
+
+class ContextCache:
+    """Official-API models whose static instructions are served from Gemini cached content"""
+
+    def __init__(self, ttl: float = 3600.0, enabled: bool = True, retry_after: float = 600.0):
+        self.ttl = max(60.0, ttl)
+        self.enabled = enabled
+        self.retry_after = retry_after
+        # refresh once less than this much of the TTL is left
+        self.refresh_margin = max(30.0, self.ttl / 10)
+        # guards the dicts only; network calls run outside it
+        self._lock = threading.Lock()
+        # (model_name, instructions hash) -> entry
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # key -> set once the create/refresh running for it is done
+        self._pending: Dict[Tuple[str, str], threading.Event] = {}
+
+    @classmethod
+    def from_env(cls) -> "ContextCache":
+        return cls(
+            ttl=float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600")),
+            enabled=os.getenv("GEMINI_CONTEXT_CACHE", "true").lower() == "true",
+            retry_after=float(os.getenv("GEMINI_CONTEXT_CACHE_RETRY", "600")),
+        )
+
+    async def model_for(self, model_name: str, api_key: str, instructions: str):
+        """GenerativeModel carrying `instructions` (cached content when possible)"""
+        return await asyncio.to_thread(self._model_for, model_name, api_key, instructions)
+
+    def _model_for(self, model_name: str, api_key: str, instructions: str):
+        # imported here: prompt_engineer_agent imports this module
+        from .prompt_engineer_agent import configure_genai
+        key = (model_name, hashlib.sha256(instructions.encode("utf-8")).hexdigest())
+        configure_genai(api_key)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                entry = self._entries.get(key)
+                pending = self._pending.get(key)
+                if entry and entry["mode"] == "cached":
+                    left = entry["expires_at"] - now
+                    # still valid while another thread refreshes it
+                    if left > self.refresh_margin or (left > 0 and pending):
+                        CONTEXT_CACHE_EVENTS.inc(event="reused")
+                        return entry["model"]
+                elif entry and (not self.enabled or now < entry["retry_at"]):
+                    CONTEXT_CACHE_EVENTS.inc(event="fallback")
+                    return entry["model"]
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    break
+            # another thread is creating it: wait for that one instead of creating a second
+            pending.wait()
+
+        try:
+            if entry and entry["mode"] == "cached" and left > 0 and self._refresh(entry):
+                with self._lock:
+                    entry["expires_at"] = time.monotonic() + self.ttl
+                return entry["model"]
+
+            previous = entry
+            entry = self._create(model_name, instructions) if self.enabled else None
+            if entry is None:
+                entry = {
+                    "mode": "system_instruction",
+                    "model": genai.GenerativeModel(model_name, system_instruction=instructions),
+                    "retry_at": time.monotonic() + self.retry_after,
+                }
+                CONTEXT_CACHE_EVENTS.inc(event="fallback")
+            with self._lock:
+                self._entries[key] = entry
+            if previous and previous["mode"] == "cached":
+                # replaced (expired, or the refresh failed): stop paying for the old copy
+                self._delete(previous)
+            return entry["model"]
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+
+    def _create(self, model_name: str, instructions: str) -> Optional[Dict[str, Any]]:
+        caching = getattr(genai, "caching", None)
+        if caching is None:
+            logger.info("[CACHE] google.generativeai has no caching support; using system_instruction")
+            return None
+        try:
+            cached = caching.CachedContent.create(
+                model=_model_path(model_name),
+                display_name="app4-prompt-engineer",
+                system_instruction=instructions,
+                ttl=dt.timedelta(seconds=self.ttl),
+            )
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+        except Exception as e:
+            logger.warning(f"[WARN] Context cache unavailable for {model_name}, using system_instruction: {e}")
+            return None
+        logger.info(f"[CACHE] Created context cache {cached.name} for {model_name} (ttl {self.ttl:.0f}s)")
+        CONTEXT_CACHE_EVENTS.inc(event="created")
+        return {
+            "mode": "cached",
+            "cached": cached,
+            "model": model,
+            "expires_at": time.monotonic() + self.ttl,
+        }
+
+    def _refresh(self, entry: Dict[str, Any]) -> bool:
+        try:
+            entry["cached"].update(ttl=dt.timedelta(seconds=self.ttl))
+        except Exception as e:
+            logger.warning(f"[WARN] Could not extend context cache {entry['cached'].name}: {e}")
+            return False
+        CONTEXT_CACHE_EVENTS.inc(event="refreshed")
+        return True
+
+    def close(self) -> None:
+        """Delete every cached content created by this process"""
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            if entry["mode"] == "cached":
+                self._delete(entry)
+
+    def _delete(self, entry: Dict[str, Any]) -> None:
+        try:
+            entry["cached"].delete()
+            CONTEXT_CACHE_EVENTS.inc(event="deleted")
+        except Exception as e:
+            logger.warning(f"[WARN] Could not delete context cache {entry['cached'].name}: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entries = [
+                {
+                    "model": model_name,
+                    "mode": entry["mode"],
+                    "name": getattr(entry.get("cached"), "name", None),
+                    "expires_in": round(entry["expires_at"] - now) if "expires_at" in entry else None,
+                }
+                for (model_name, _), entry in self._entries.items()
+            ]
+        return {"enabled": self.enabled, "ttl": self.ttl, "entries": entries}
+
+
+context_cache = ContextCache.from_env()
@@ -11,7 +11,8 @@ from .prompt_generator import PromptGenerator
 from .continuity_engine import ContinuityEngine
 from .veo_client import VeoClient
 from .video_assembler import VideoAssembler
-from .prompt_engineer_agent import PromptEngineerAgent
+from .prompt_engineer_agent import get_agent
+from .prompt_orchestrator import optimize_scenes
 from .prompt_validator import PromptValidator
 from .prompt_optimizer import PromptOptimizer
 from ..db.repositories import ProjectRepository, ClipRepository, AssetRepository
@@ -44,7 +45,8 @@ class ProductionOrchestrator:
                 use_local = os.getenv("USE_LOCAL_GEMINI", "false").lower() == "true"
                 webai_url = os.getenv("WEBAI_API_BASE_URL", "http://localhost:6969/v1")
                 
-                self.prompt_agent = PromptEngineerAgent(
+                # Shared instance (no genai.configure / new client per orchestrator)
+                self.prompt_agent = get_agent(
                     api_key=api_key,
                     model_name=self.optimization_config.gemini_model,
                     target_video_model=self.optimization_config.model_type,
@@ -71,84 +73,56 @@ class ProductionOrchestrator:
         self.projects_dir = os.getenv("PROJECTS_DIR", "./projects")
         self.temp_dir = os.getenv("TEMP_DIR", "./temp")
     
-    async def _optimize_prompt_with_agent(
+    def _prompt_from_optimization(
         self,
         scene: dict,
-        project_template: dict
+        project_template: dict,
+        result: dict
     ) -> str:
         """
-        Optimiza el prompt de una escena usando el agente de Gemini
+        Convierte el resultado de optimize_scenes de una escena en el prompt final
         
         Args:
             scene: Datos de la escena
             project_template: Template completo del proyecto
+            result: Resultado de optimize_scenes para esa escena
             
         Returns:
-            Prompt optimizado
+            Prompt optimizado, o el de PromptGenerator si el agente falló
         """
-        if not self.prompt_agent:
-            # Fallback: usar PromptGenerator tradicional
-            prompt_gen = PromptGenerator(project_template)
-            return prompt_gen.generate_scene_prompt(
-                scene['scene_id'],
-                refinement_level=2
-            )
-        
-        try:
-            print("✨ Optimizando prompt con Agente Gemini...")
-            
-            # Extraer campos mutables del usuario
-            user_input = {
-                "action": scene.get("action_details", ""),
-                "emotion": scene.get("emotion", ""),
-                "dialogue": scene.get("variables", {}).get("dialogue", "")
-            }
-            
-            # Llamar al agente para optimización
-            optimized_data = await self.prompt_agent.refine_prompt(
-                user_input=user_input,
-                master_template=project_template,
-                scene=scene
-            )
-            
-            # Mostrar resultados de optimización
-            validation = optimized_data.get("validation", {})
-            print(f"  ├─ Coherencia: {validation.get('confidence_score', 0):.0%}")
-            print(f"  ├─ Keywords agregadas: {len(optimized_data.get('technical_keywords', []))}")
-            print(f"  └─ {validation.get('notes', 'Optimización completada')}")
-            
-            # Construir prompt final con datos optimizados
-            optimized_action = optimized_data.get("optimized_action", user_input["action"])
-            optimized_emotion = optimized_data.get("optimized_emotion", user_input["emotion"])
-            
-            # Usar PromptGenerator para estructura final
-            # pero con datos optimizados
-            scene_optimized = scene.copy()
-            scene_optimized["action_details"] = optimized_action
-            scene_optimized["emotion"] = optimized_emotion
-            
-            prompt_gen = PromptGenerator(project_template)
-            final_prompt = prompt_gen.generate_scene_prompt(
-                scene['scene_id'],
-                refinement_level=1  # Nivel bajo porque ya está optimizado
-            )
-            
-            # Reemplazar con acción optimizada si es necesario
-            if optimized_action and optimized_action not in final_prompt:
-                final_prompt = optimized_action
-            
-            return final_prompt
-            
-        except Exception as e:
-            print(f"⚠️  Error en optimización con agente: {e}")
+        prompt_gen = PromptGenerator(project_template)
+        if not result.get("ok"):
+            print(f"⚠️  Error en optimización con agente (escena {scene['scene_id']}): {result.get('error')}")
             print("   Usando PromptGenerator tradicional como fallback")
-            
-            # Fallback
-            prompt_gen = PromptGenerator(project_template)
             return prompt_gen.generate_scene_prompt(
                 scene['scene_id'],
                 refinement_level=2
             )
+        
+        optimized_data = result["optimized"]
+        user_input = result["original"]
+        
+        # Mostrar resultados de optimización
+        validation = optimized_data.get("validation", {})
+        print(f"✨ Escena {scene['scene_id']} optimizada con Agente Gemini ({result['elapsed']}s)")
+        print(f"  ├─ Coherencia: {validation.get('confidence_score', 0):.0%}")
+        print(f"  ├─ Keywords agregadas: {len(optimized_data.get('technical_keywords', []))}")
+        print(f"  └─ {validation.get('notes', 'Optimización completada')}")
+        
+        # Construir prompt final con datos optimizados
+        optimized_action = optimized_data.get("optimized_action", user_input["action"])
+        
+        # Usar PromptGenerator para estructura final
+        final_prompt = prompt_gen.generate_scene_prompt(
+            scene['scene_id'],
+            refinement_level=1  # Nivel bajo porque ya está optimizado
+        )
+        
+        # Reemplazar con acción optimizada si es necesario
+        if optimized_action and optimized_action not in final_prompt:
+            final_prompt = optimized_action
+        
+        return final_prompt
     
     async def produce_commercial(
         self,
@@ -190,6 +164,16 @@ class ProductionOrchestrator:
         clips_info = []
         scenes = project_template['scenes']
         
+        # Optimize every scene's prompt up front (one round trip instead of one per scene)
+        optimized_prompts = {}
+        if self.optimization_config.use_agent and self.prompt_agent:
+            print(f"✨ Optimizando {len(scenes)} escenas en paralelo...")
+            results = await optimize_scenes(self.prompt_agent, project_template)
+            optimized_prompts = {
+                scene['scene_id']: self._prompt_from_optimization(scene, project_template, result)
+                for scene, result in zip(scenes, results)
+            }
+        
         for scene_idx, scene in enumerate(scenes):
             scene_id = scene['scene_id']
             print(f"\n{'='*60}")
@@ -197,8 +181,8 @@ class ProductionOrchestrator:
             print(f"{'='*60}")
             
             # Generate prompt with agent optimization if enabled
-            if self.optimization_config.use_agent and self.prompt_agent:
-                prompt = await self._optimize_prompt_with_agent(scene, project_template)
+            if scene_id in optimized_prompts:
+                prompt = optimized_prompts[scene_id]
             else:
                 prompt = prompt_gen.generate_scene_prompt(scene_id, refinement_level)
             
@@ -9,18 +9,81 @@ Supports both:
 """
 from __future__ import annotations
 import google.generativeai as genai
+import os
 import json
+import time
+import asyncio
 import logging
 import base64
-from typing import Optional
+import weakref
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, AsyncIterator, Tuple
 from datetime import datetime
 from pathlib import Path
 
+from pydantic import ValidationError
+
 # Import local WebAI client
 from .webai_client import WebAIClient
+from .context_cache import context_cache
+from ..utils.prompt_cache import prompt_cache
+from ..utils import metrics
+from ..models.models import OptimizedPromptData
 
 logger = logging.getLogger(__name__)
 
+# Esquema de respuesta (subconjunto OpenAPI que acepta response_schema de Gemini);
+# debe coincidir con OptimizedPromptData
+OPTIMIZED_PROMPT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "optimized_action": {"type": "string"},
+        "optimized_emotion": {"type": "string"},
+        "optimized_dialogue": {"type": "string"},
+        "technical_keywords": {"type": "array", "items": {"type": "string"}},
+        "validation": {
+            "type": "object",
+            "properties": {
+                "is_coherent": {"type": "boolean"},
+                "confidence_score": {"type": "number"},
+                "notes": {"type": "string"},
+                "issues": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": ["is_coherent", "confidence_score", "notes"]
+        }
+    },
+    "required": ["optimized_action", "optimized_emotion", "validation"]
+}
+
+# JSON mode: response_schema (API oficial) / response_format json_object (WebAI)
+STRUCTURED_OUTPUT = os.getenv("AGENT_STRUCTURED_OUTPUT", "true").lower() == "true"
+# Intentos de reparación de una respuesta que no valida (0 = directo al fallback)
+REPAIR_ATTEMPTS = int(os.getenv("AGENT_REPAIR_ATTEMPTS", "1"))
+
+
+
+class InvalidAgentResponse(ValueError):
+    """The agent's answer did not validate against OptimizedPromptData, even after repair"""
+
+
+# Hedging local WebAI -> API oficial (solo agentes con use_local)
+HEDGE_ENABLED = os.getenv("AGENT_HEDGE", "false").lower() == "true"
+HEDGE_MODEL = os.getenv("AGENT_HEDGE_MODEL", "")  # modelo oficial del hedge (default: el mismo)
+HEDGE_PERCENTILE = float(os.getenv("AGENT_HEDGE_PERCENTILE", "0.95"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("AGENT_HEDGE_DELAY", "10"))  # hasta tener suficientes muestras
+HEDGE_MIN_DELAY = float(os.getenv("AGENT_HEDGE_MIN_DELAY", "1"))
+HEDGE_MAX_DELAY = float(os.getenv("AGENT_HEDGE_MAX_DELAY", "30"))
+
+HEDGE_REQUESTS = metrics.counter(
+    "app4_agent_hedge_total", "Hedged agent calls by winner (local, official, failed)", ["outcome"])
+
+AGENT_RESPONSES = metrics.counter(
+    "app4_agent_responses_total", "Agent responses by parse outcome (valid, repaired, invalid)", ["outcome"])
+AGENT_FALLBACKS = metrics.counter(
+    "app4_agent_fallbacks_total", "refine_prompt calls that returned the original input", ["reason"])
+
 
 class PromptEngineerAgent:
     """
@@ -60,20 +123,29 @@ class PromptEngineerAgent:
         self.target_video_model = target_video_model
         self.use_local = use_local
         self.webai_base_url = webai_base_url
+        # Instrucciones fijas (solo dependen del modelo target): se construyen una vez
+        self.static_instructions = self._build_static_instructions()
         
         # Initialize clients
+        self.official_model_name = model_name
+        self.hedge = False
         if use_local:
             logger.info(f"[LOCAL] Initializing with LOCAL WebAI-to-API server: {webai_base_url}")
             self.webai_client = WebAIClient(base_url=webai_base_url)
             self.local_available = True
             self.model = None  # Don't initialize blocking official client
+            if HEDGE_ENABLED and api_key and api_key != "None":
+                # Hedging: the official API backs up slow local calls
+                self.hedge = True
+                self.official_model_name = HEDGE_MODEL or model_name
+                self.model = get_generative_model(self.official_model_name, api_key)
+                logger.info(f"[HEDGE] Slow local calls will be hedged with OFFICIAL {self.official_model_name}")
         else:
             logger.info(f"[CLOUD] Initializing with OFFICIAL Google Gemini API")
             self.webai_client = None
             self.local_available = False
             # Only initialize official client when NOT using local mode
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel(model_name)
+            self.model = get_generative_model(model_name, api_key)
         
         logger.info(f"PromptEngineerAgent initialized with model: {model_name}")
 
@@ -145,10 +217,10 @@ Respond in JSON format:
                 response_text = response.text
             else:
                 # Use official Gemini API with vision
-                response = self.model.generate_content([
+                response = await generate_official(self.model, [
                     {"mime_type": mime_type, "data": image_data},
                     analysis_prompt
-                ])
+                ], op="analyze_frame")
                 response_text = response.text
             
             # Parse JSON response
@@ -203,111 +275,325 @@ Respond in JSON format:
             dict con campos optimizados y metadata de optimización
         """
         try:
-            # 1. Construir prompt del sistema para el agente
-            system_prompt = self._build_system_prompt(master_template, scene)
+            # 1-3. Construir prompts del sistema y del usuario
+            request_prompt = self._build_request_prompt(user_input, master_template, scene, image_context)
+            full_prompt = f"{self.static_instructions}\n\n{request_prompt}"
             
-            # 2. Construir prompt del usuario (with image context if available)
-            user_prompt = self._build_user_prompt(user_input, scene, image_context)
+            # Mismo prompt + mismo modelo => misma respuesta: reusar cache / llamada en curso
+            cache_key = prompt_cache.key(self.model_name, self.target_video_model, full_prompt)
+            optimized_data, source = await prompt_cache.get_or_compute(
+                cache_key,
+                lambda: self._optimize(full_prompt, request_prompt, user_input, scene)
+            )
+            if source != "miss":
+                logger.info(f"[CACHE] Prompt for scene {scene.get('scene_id')} served from cache ({source})")
+                self._mark_cache_hit(optimized_data, user_input, source)
+            return optimized_data
             
-            # 3. Combine prompts
-            full_prompt = f"{system_prompt}\n\n{user_prompt}"
+        except Exception as e:
+            logger.error(f"[ERROR] Error in refine_prompt: {e}")
+            return self._fallback_result(user_input, e)
+    
+    async def _optimize(self, full_prompt: str, request_prompt: str, user_input: dict, scene: dict) -> dict:
+        """
+        Llamada al modelo (local u oficial) + parseo; lanza excepción si falla
+        
+        full_prompt = instrucciones fijas + request_prompt. La API oficial recibe solo
+        request_prompt: las instrucciones ya están en el contenido cacheado del modelo.
+        """
+        # 4. Use local WebAI server (forced - no check)
+        used_local = None
+        if self.use_local and self.webai_client and self.local_available and self.hedge:
+            response_text, used_local = await self._generate_hedged(full_prompt, request_prompt, scene)
+        elif self.use_local and self.webai_client and self.local_available:
+            try:
+                logger.info(f"[LOCAL] Using LOCAL WebAI-to-API server for scene {scene.get('scene_id')}")
+                logger.info(f"[MODEL] Model: {self.model_name}, Base URL: {self.webai_client.base_url}")
+                response_text = await self._generate_local(full_prompt)
+                logger.info("[OK] Local server response received")
+                
+            except Exception as e:
+                logger.error(f"[ERROR] Local WebAI-to-API failed: {e}")
+                # Re-raise the error - don't use blocking fallback
+                raise
+        else:
+            # 5. Use official Gemini API
+            logger.info(f"[CLOUD] Using OFFICIAL Google Gemini API for scene {scene.get('scene_id')}")
+            response_text = await self._generate_official(request_prompt)
+            logger.info("[OK] Official API response received")
+        
+        # 6-7. Parsear respuesta y agregar metadata
+        return await self._finalize_response(response_text, user_input, used_local=used_local)
+    
+    async def _generate_local(self, full_prompt: str) -> str:
+        """Llamada al servidor local WebAI-to-API"""
+        response = await self.webai_client.generate_content(
+            prompt=full_prompt,
+            model=str(self.model_name),  # Force pure string
+            temperature=0.7,
+            top_p=0.9,
+            max_tokens=2048,
+            response_format=self._webai_response_format()
+        )
+        return response.text
+    
+    def _hedge_delay(self) -> float:
+        """Cuánto esperar al servidor local antes de lanzar también la API oficial"""
+        observed = self.webai_client.latency.percentile(HEDGE_PERCENTILE)
+        if observed is None:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, observed))
+    
+    async def _generate_hedged(self, full_prompt: str, request_prompt: str, scene: dict) -> Tuple[str, bool]:
+        """
+        Hedged request: local primero; si no responde dentro del percentil
+        AGENT_HEDGE_PERCENTILE de su latencia observada (o falla), se lanza también
+        la API oficial. Gana la primera respuesta y la otra se cancela.
+        
+        Returns:
+            (texto de respuesta, True si respondió el servidor local)
+        """
+        delay = self._hedge_delay()
+        started = time.perf_counter()
+        local = asyncio.create_task(self._generate_local(full_prompt))
+        tasks = {local: True}
+        errors = []
+        try:
+            done, _ = await asyncio.wait({local}, timeout=delay)
+            if local in done and local.exception() is None:
+                HEDGE_REQUESTS.inc(outcome="local")
+                return local.result(), True
+            if local in done:
+                errors.append(local.exception())
+                del tasks[local]
+                logger.warning(f"[HEDGE] Local server failed for scene {scene.get('scene_id')}, using OFFICIAL API: {errors[-1]}")
+            else:
+                logger.info(f"[HEDGE] Local server slower than {delay:.1f}s for scene {scene.get('scene_id')}, hedging with OFFICIAL API")
+            official = asyncio.create_task(self._generate_official(request_prompt))
+            tasks[official] = False
+            
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    is_local = tasks.pop(task)
+                    if task.exception() is None:
+                        HEDGE_REQUESTS.inc(outcome="local" if is_local else "official")
+                        logger.info(f"[HEDGE] {'Local server' if is_local else 'Official API'} won after {time.perf_counter() - started:.1f}s")
+                        return task.result(), is_local
+                    errors.append(task.exception())
+            HEDGE_REQUESTS.inc(outcome="failed")
+            raise errors[-1]
+        finally:
+            for task, is_local in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    if is_local:
+                        # the local call took at least this long; keep the percentile honest
+                        self.webai_client.latency.record(time.perf_counter() - started)
+    
+    def _mark_cache_hit(self, optimized_data: dict, user_input: dict, source: str) -> None:
+        """Metadata de un resultado servido desde el cache"""
+        metadata = optimized_data.setdefault("optimization_metadata", {})
+        metadata["original_input"] = user_input
+        metadata["cache_hit"] = source
+    
+    async def refine_prompt_stream(
+        self,
+        user_input: dict,
+        master_template: dict,
+        scene: dict,
+        image_context: dict = None
+    ) -> AsyncIterator[dict]:
+        """
+        Igual que refine_prompt, pero emite eventos mientras llega la respuesta
+        
+        Yields:
+            {"type": "progress", "stage": "building_prompt" | "cache_hit" | "calling_model" | "parsing", ...}
+            {"type": "delta", "text": "..."}   texto parcial del modelo (solo servidor local)
+            {"type": "result", "data": {...}}  mismo dict que devuelve refine_prompt (último evento)
+        """
+        yield {"type": "progress", "stage": "building_prompt"}
+        try:
+            request_prompt = self._build_request_prompt(user_input, master_template, scene, image_context)
+            full_prompt = f"{self.static_instructions}\n\n{request_prompt}"
+            
+            cache_key = prompt_cache.key(self.model_name, self.target_video_model, full_prompt)
+            cached, source = await prompt_cache.lookup(cache_key)
+            if cached is not None:
+                logger.info(f"[CACHE] Prompt for scene {scene.get('scene_id')} served from cache ({source})")
+                self._mark_cache_hit(cached, user_input, source)
+                yield {"type": "progress", "stage": "cache_hit", "source": source}
+                yield {"type": "result", "data": cached}
+                return
             
-            # 4. Use local WebAI server (forced - no check)
             if self.use_local and self.webai_client and self.local_available:
-                try:
-                    logger.info(f"[LOCAL] Using LOCAL WebAI-to-API server for scene {scene.get('scene_id')}")
-                    logger.info(f"[MODEL] Model: {self.model_name}, Base URL: {self.webai_client.base_url}")
-                    
-                    response = await self.webai_client.generate_content(
-                        prompt=full_prompt,
-                        model=str(self.model_name),  # Force pure string
-                        temperature=0.7,
-                        top_p=0.9,
-                        max_tokens=2048
-                    )
-                    
-                    response_text = response.text
-                    logger.info("[OK] Local server response received")
-                    
-                except Exception as e:
-                    logger.error(f"[ERROR] Local WebAI-to-API failed: {e}")
-                    # Re-raise the error - don't use blocking fallback
-                    raise
+                logger.info(f"[LOCAL] Streaming from LOCAL WebAI-to-API server for scene {scene.get('scene_id')}")
+                yield {"type": "progress", "stage": "calling_model", "server": "local"}
+                chunks = []
+                async for delta in self.webai_client.stream_content(
+                    prompt=full_prompt,
+                    model=str(self.model_name),
+                    temperature=0.7,
+                    top_p=0.9,
+                    max_tokens=2048,
+                    response_format=self._webai_response_format()
+                ):
+                    chunks.append(delta)
+                    yield {"type": "delta", "text": delta}
+                response_text = "".join(chunks)
             else:
-                # 5. Use official Gemini API
                 logger.info(f"[CLOUD] Using OFFICIAL Google Gemini API for scene {scene.get('scene_id')}")
-                
-                response = self.model.generate_content(
-                    full_prompt,
-                    generation_config=genai.GenerationConfig(
-                        temperature=0.7,
-                        top_p=0.9,
-                        max_output_tokens=2048,
-                    )
-                )
-                response_text = response.text
-                logger.info("[OK] Official API response received")
+                yield {"type": "progress", "stage": "calling_model", "server": "official"}
+                response_text = await self._generate_official(request_prompt)
             
-            # 6. Parsear respuesta
+            yield {"type": "progress", "stage": "parsing"}
+            data = await self._finalize_response(response_text, user_input)
+            await prompt_cache.put(cache_key, data)
+        except Exception as e:
+            logger.error(f"[ERROR] Error in refine_prompt_stream: {e}")
+            data = self._fallback_result(user_input, e)
+        
+        yield {"type": "result", "data": data}
+    
+    def _build_request_prompt(self, user_input: dict, master_template: dict, scene: dict, image_context: dict = None) -> str:
+        """Lo que cambia en cada request: contexto del proyecto/escena + prompt del usuario"""
+        project_context = self._build_project_context(master_template, scene)
+        user_prompt = self._build_user_prompt(user_input, scene, image_context)
+        return f"{project_context}\n\n{user_prompt}"
+    
+    async def _generate_official(self, request_prompt: str) -> str:
+        """Llamada a la API oficial de Gemini (no bloquea el event loop)"""
+        # Modelo con las instrucciones fijas en contenido cacheado (o system_instruction)
+        model = await context_cache.model_for(self.official_model_name, self.api_key, self.static_instructions)
+        response = await generate_official(
+            model,
+            request_prompt,
+            op="refine_prompt",
+            generation_config=self._generation_config(temperature=0.7, max_output_tokens=2048)
+        )
+        return response.text
+    
+    def _generation_config(self, temperature: float, max_output_tokens: int):
+        """GenerationConfig de la API oficial (con JSON estructurado si está habilitado)"""
+        if STRUCTURED_OUTPUT:
+            return genai.GenerationConfig(
+                temperature=temperature,
+                top_p=0.9,
+                max_output_tokens=max_output_tokens,
+                response_mime_type="application/json",
+                response_schema=OPTIMIZED_PROMPT_SCHEMA,
+            )
+        return genai.GenerationConfig(
+            temperature=temperature,
+            top_p=0.9,
+            max_output_tokens=max_output_tokens,
+        )
+    
+    def _webai_response_format(self) -> Optional[dict]:
+        """response_format para el servidor WebAI (OpenAI-compatible)"""
+        return {"type": "json_object"} if STRUCTURED_OUTPUT else None
+    
+    async def _finalize_response(self, response_text: str, user_input: dict, used_local: Optional[bool] = None) -> dict:
+        """Parsea (y si hace falta repara) la respuesta del agente y agrega metadata de optimización"""
+        try:
             optimized_data = self._parse_agent_response(response_text)
-            
-            # 7. Agregar metadata
-            optimized_data["optimization_metadata"] = {
-                "agent_model": self.model_name,
-                "target_model": self.target_video_model,
-                "timestamp": datetime.utcnow().isoformat(),
-                "original_input": user_input,
-                "used_local_server": self.use_local and self.local_available
-            }
-            
-            logger.info(f"[OK] Prompt optimized successfully. Confidence: {optimized_data.get('validation', {}).get('confidence_score', 0):.0%}")
-            
+            AGENT_RESPONSES.inc(outcome="valid")
+            repaired = False
+        except ValueError as e:
+            optimized_data = await self._repair_response(response_text, e)
+            repaired = True
+        
+        optimized_data["optimization_metadata"] = {
+            "agent_model": self.model_name,
+            "target_model": self.target_video_model,
+            "timestamp": datetime.utcnow().isoformat(),
+            "original_input": user_input,
+            "used_local_server": (self.use_local and self.local_available) if used_local is None else used_local,
+            "repaired": repaired
+        }
+        
+        logger.info(f"[OK] Prompt optimized successfully. Confidence: {optimized_data.get('validation', {}).get('confidence_score', 0):.0%}")
+        
+        return optimized_data
+    
+    async def _repair_response(self, response_text: str, error: Exception) -> dict:
+        """
+        Reintento barato: pide al modelo que corrija solo el JSON inválido
+        (sin las instrucciones ni el contexto), en vez de descartar la respuesta
+        """
+        for attempt in range(REPAIR_ATTEMPTS):
+            logger.warning(f"[WARN] Agent response did not validate, repairing ({attempt + 1}/{REPAIR_ATTEMPTS}): {error}")
+            repair_prompt = f"""El siguiente JSON no cumple el esquema requerido.
+
+ERRORES:
+{error}
+
+ESQUEMA:
+{json.dumps(OPTIMIZED_PROMPT_SCHEMA, ensure_ascii=False)}
+
+JSON A CORREGIR:
+{response_text[:6000]}
+
+Devuelve ÚNICAMENTE el JSON corregido, conservando todo el contenido válido."""
+            try:
+                response_text = await self._complete(repair_prompt, temperature=0.0, max_tokens=2048)
+                optimized_data = self._parse_agent_response(response_text)
+            except ValueError as e:
+                error = e
+                continue
+            AGENT_RESPONSES.inc(outcome="repaired")
+            logger.info("[OK] Agent response repaired")
             return optimized_data
-            
-        except Exception as e:
-            logger.error(f"[ERROR] Error in refine_prompt: {e}")
-            # Fallback: retornar input original
-            return {
-                "optimized_action": user_input.get("action", ""),
-                "optimized_emotion": user_input.get("emotion", ""),
-                "optimized_dialogue": user_input.get("dialogue", ""),
-                "technical_keywords": [],
-                "validation": {
-                    "is_coherent": True,
-                    "confidence_score": 0.5,
-                    "notes": f"Fallback mode - agent error: {str(e)}"
-                },
-                "error": str(e)
-            }
+        AGENT_RESPONSES.inc(outcome="invalid")
+        raise InvalidAgentResponse(f"Invalid response from agent: {error}")
+    
+    async def _complete(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        """Llamada simple al modelo activo, sin instrucciones del sistema"""
+        if self.use_local and self.webai_client and self.local_available:
+            response = await self.webai_client.generate_content(
+                prompt=prompt,
+                model=str(self.model_name),
+                temperature=temperature,
+                top_p=0.9,
+                max_tokens=max_tokens,
+                response_format=self._webai_response_format()
+            )
+        else:
+            response = await generate_official(
+                self.model,
+                prompt,
+                op="repair",
+                generation_config=self._generation_config(temperature=temperature, max_output_tokens=max_tokens)
+            )
+        return response.text
     
-    def _build_system_prompt(self, master_template: dict, scene: dict) -> str:
+    def _fallback_result(self, user_input: dict, error: Exception) -> dict:
+        """Fallback: retornar input original"""
+        AGENT_FALLBACKS.inc(reason="invalid_response" if isinstance(error, InvalidAgentResponse) else "error")
+        return {
+            "optimized_action": user_input.get("action", ""),
+            "optimized_emotion": user_input.get("emotion", ""),
+            "optimized_dialogue": user_input.get("dialogue", ""),
+            "technical_keywords": [],
+            "validation": {
+                "is_coherent": True,
+                "confidence_score": 0.5,
+                "notes": f"Fallback mode - agent error: {str(error)}"
+            },
+            "error": str(error)
+        }
+    
+    def _build_static_instructions(self) -> str:
         """
-        Construye el prompt del sistema que define el rol del agente
+        Instrucciones del agente que no dependen del proyecto ni de la escena
+        (solo del modelo de video target). En la API oficial viajan una sola vez
+        como contenido cacheado, ver context_cache.py.
         """
-        product_info = master_template.get("product", {})
-        brand_guidelines = master_template.get("brand_guidelines", {})
-        subject_info = master_template.get("subject", {})
-        
-        system_prompt = f"""Eres un ingeniero de prompts experto especializado en generación de video con IA.
+        return f"""Eres un ingeniero de prompts experto especializado en generación de video con IA.
 
 TU ROL:
 Optimizar prompts para el modelo {self.target_video_model}, transformando lenguaje simple del usuario en descripciones técnicas cinematográficas profesionales.
 
-CONTEXTO DEL PROYECTO:
-- Producto: {product_info.get('name', 'N/A')}
-- Descripción del producto: {product_info.get('description', 'N/A')}
-- Tono de marca: {brand_guidelines.get('mood', 'N/A')}
-- Paleta de colores: {', '.join(brand_guidelines.get('color_palette', []))}
-- Estilo de iluminación: {brand_guidelines.get('lighting_style', 'N/A')}
-- Sujeto principal: {subject_info.get('description', 'N/A')}
-- Modelo de video target: {self.target_video_model}
-
-ESCENA ACTUAL:
-- ID: {scene.get('scene_id')}
-- Nombre: {scene.get('name', 'N/A')}
-- Duración: {scene.get('duration', 8)} segundos
-- Especificaciones de cámara: {scene.get('camera_specs', {})}
-
 TAREAS QUE DEBES REALIZAR:
 
 1. REFINAMIENTO DE ESTILO:
@@ -369,8 +655,29 @@ IMPORTANTE:
 - Mantén los diálogos en español
 - Sé técnico pero natural
 - Prioriza coherencia sobre complejidad"""
+    
+    def _build_project_context(self, master_template: dict, scene: dict) -> str:
+        """
+        Contexto del proyecto y de la escena actual (cambia en cada request)
+        """
+        product_info = master_template.get("product", {})
+        brand_guidelines = master_template.get("brand_guidelines", {})
+        subject_info = master_template.get("subject", {})
+        
+        return f"""CONTEXTO DEL PROYECTO:
+- Producto: {product_info.get('name', 'N/A')}
+- Descripción del producto: {product_info.get('description', 'N/A')}
+- Tono de marca: {brand_guidelines.get('mood', 'N/A')}
+- Paleta de colores: {', '.join(brand_guidelines.get('color_palette', []))}
+- Estilo de iluminación: {brand_guidelines.get('lighting_style', 'N/A')}
+- Sujeto principal: {subject_info.get('description', 'N/A')}
+- Modelo de video target: {self.target_video_model}
 
-        return system_prompt
+ESCENA ACTUAL:
+- ID: {scene.get('scene_id')}
+- Nombre: {scene.get('name', 'N/A')}
+- Duración: {scene.get('duration', 8)} segundos
+- Especificaciones de cámara: {scene.get('camera_specs', {})}"""
     
     def _build_user_prompt(self, user_input: dict, scene: dict, image_context: dict = None) -> str:
         """
@@ -453,44 +760,35 @@ Recuerda responder ÚNICAMENTE con el objeto JSON, sin texto adicional."""
     
     def _parse_agent_response(self, response_text: str) -> dict:
         """
-        Parsea la respuesta del agente y extrae el JSON
+        Parsea la respuesta del agente y la valida contra OptimizedPromptData
         
         Args:
             response_text: Texto de respuesta del agente
             
         Returns:
             dict con datos optimizados
+            
+        Raises:
+            ValueError: si no es JSON o no cumple el esquema (mensaje con los errores)
         """
+        # Limpiar respuesta (markdown o texto alrededor del objeto), sin parsear
+        cleaned_text = (response_text or "").strip()
+        if not cleaned_text.startswith("{") or not cleaned_text.endswith("}"):
+            start = cleaned_text.find("{")
+            end = cleaned_text.rfind("}") + 1
+            if start != -1 and end > start:
+                cleaned_text = cleaned_text[start:end]
+        
+        # Parseo + validación en una sola pasada
         try:
-            # Limpiar respuesta (remover markdown si existe)
-            cleaned_text = response_text.strip()
-            
-            # Remover backticks de markdown si existen
-            if cleaned_text.startswith("```"):
-                # Encontrar el JSON entre backticks
-                start = cleaned_text.find("{")
-                end = cleaned_text.rfind("}") + 1
-                if start != -1 and end > start:
-                    cleaned_text = cleaned_text[start:end]
-            
-            # Parsear JSON
-            data = json.loads(cleaned_text)
-            
-            # Validar estructura mínima
-            required_fields = ["optimized_action", "optimized_emotion", "validation"]
-            for field in required_fields:
-                if field not in data:
-                    raise ValueError(f"Missing required field: {field}")
-            
-            return data
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse agent response as JSON: {e}")
-            logger.error(f"Response text: {response_text[:500]}")
-            raise ValueError(f"Invalid JSON response from agent: {e}")
-        except Exception as e:
-            logger.error(f"Error parsing agent response: {e}")
-            raise
+            data = OptimizedPromptData.model_validate_json(cleaned_text)
+        except ValidationError as e:
+            logger.error(f"Agent response failed validation: {e.error_count()} error(s)")
+            logger.debug(f"Response text: {response_text[:500]}")
+            errors = "; ".join(f"{'.'.join(str(p) for p in err['loc']) or 'json'}: {err['msg']}" for err in e.errors())
+            raise ValueError(errors) from e
+        
+        return data.model_dump(exclude={"optimization_metadata"}, exclude_none=True)
     
     def get_optimization_preview(
         self,
@@ -528,3 +826,163 @@ Recuerda responder ÚNICAMENTE con el objeto JSON, sin texto adicional."""
             "validation_notes": optimized.get("validation", {}).get("notes", ""),
             "issues": optimized.get("validation", {}).get("issues", [])
         }
+
+
+# ============================================================
+# SHARED INSTANCES
+# ============================================================
+# Building an agent means genai.configure() (process-wide state) plus a new
+# GenerativeModel, or a new WebAIClient. Callers get shared instances instead;
+# the agent keeps no per-request state, so one instance serves concurrent calls.
+
+AgentKey = Tuple[str, str, bool, str]
+
+_agents: Dict[AgentKey, PromptEngineerAgent] = {}
+_models: Dict[str, Any] = {}
+_configured_api_key: Optional[str] = None
+_registry_lock = threading.RLock()
+
+
+def configure_genai(api_key: str) -> None:
+    """genai.configure() once per API key (it rebinds the SDK's global client)"""
+    global _configured_api_key
+    with _registry_lock:
+        if _configured_api_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_api_key = api_key
+            _models.clear()
+
+
+def get_generative_model(model_name: str, api_key: str):
+    """Shared genai.GenerativeModel for the official API"""
+    with _registry_lock:
+        configure_genai(api_key)
+        model = _models.get(model_name)
+        if model is None:
+            model = _models[model_name] = genai.GenerativeModel(model_name)
+        return model
+
+
+def get_agent(
+    api_key: str,
+    model_name: str = "gemini-2.0-flash-exp",
+    target_video_model: str = "veo-3.1",
+    use_local: bool = False,
+    webai_base_url: str = "http://localhost:6969/v1"
+) -> PromptEngineerAgent:
+    """
+    Agente compartido para (model_name, target_video_model, use_local, webai_base_url)
+    
+    Se crea la primera vez que se pide y se reutiliza después.
+    """
+    key: AgentKey = (str(model_name), str(target_video_model), bool(use_local), str(webai_base_url) if use_local else "")
+    agent = _agents.get(key)
+    if agent is not None:
+        return agent
+    with _registry_lock:
+        agent = _agents.get(key)
+        if agent is None:
+            agent = _agents[key] = PromptEngineerAgent(
+                api_key=str(api_key),
+                model_name=key[0],
+                target_video_model=key[1],
+                use_local=key[2],
+                webai_base_url=str(webai_base_url)
+            )
+        return agent
+
+
+def registered_agents() -> list:
+    """Agentes compartidos creados hasta ahora"""
+    with _registry_lock:
+        return [
+            {"model_name": k[0], "target_video_model": k[1], "use_local": k[2], "base_url": k[3] or None,
+             "hedge": agent.hedge}
+            for k, agent in _agents.items()
+        ]
+
+
+# ============================================================
+# OFFICIAL API CALLS
+# ============================================================
+# GenerativeModel.generate_content blocks for the whole LLM round trip, which
+# inside a coroutine freezes every other request on the worker. Official calls
+# go through generate_official(): the SDK's async method when it has one, a
+# worker thread otherwise, at most GEMINI_MAX_CONCURRENCY at a time per loop.
+
+OFFICIAL_MAX_CONCURRENCY = max(1, int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")))
+
+OFFICIAL_SECONDS = metrics.histogram(
+    "app4_gemini_official_seconds", "Official Gemini API call latency (including wait for a slot)", ["op", "outcome"])
+
+_official_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_official_waiting = 0
+_official_active = 0
+_official_executor = ThreadPoolExecutor(max_workers=OFFICIAL_MAX_CONCURRENCY, thread_name_prefix="gemini")
+
+
+def _official_limit() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limit = _official_limits.get(loop)
+    if limit is None:
+        limit = _official_limits[loop] = asyncio.Semaphore(OFFICIAL_MAX_CONCURRENCY)
+    return limit
+
+
+async def generate_official(model, contents, op: str = "generate", **kwargs):
+    """await model.generate_content(contents, **kwargs) sin bloquear el event loop"""
+    global _official_waiting, _official_active
+    started = time.perf_counter()
+    outcome = "error"
+    _official_waiting += 1
+    admitted = False
+    try:
+        async with _official_limit():
+            _official_waiting -= 1
+            _official_active += 1
+            admitted = True
+            generate_async = getattr(model, "generate_content_async", None)
+            if generate_async is not None:
+                response = await generate_async(contents, **kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(
+                    _official_executor, functools.partial(model.generate_content, contents, **kwargs)
+                )
+        outcome = "ok"
+        return response
+    finally:
+        if admitted:
+            _official_active -= 1
+        else:
+            _official_waiting -= 1
+        OFFICIAL_SECONDS.observe(time.perf_counter() - started, op=op, outcome=outcome)
+
+
+def response_stats() -> Dict[str, Any]:
+    """Parse outcomes of agent responses, with repair and fallback rates"""
+    counts = {outcome: int(AGENT_RESPONSES.value(outcome=outcome)) for outcome in ("valid", "repaired", "invalid")}
+    errors = int(AGENT_FALLBACKS.value(reason="error"))
+    fallbacks = errors + int(AGENT_FALLBACKS.value(reason="invalid_response"))
+    total = sum(counts.values()) + errors
+    return {
+        **counts,
+        "errors": errors,
+        "fallbacks": fallbacks,
+        "repair_rate": round(counts["repaired"] / total, 4) if total else 0.0,
+        "fallback_rate": round(fallbacks / total, 4) if total else 0.0,
+    }
+
+
+def official_stats() -> Dict[str, int]:
+    return {"max_concurrency": OFFICIAL_MAX_CONCURRENCY, "active": _official_active, "waiting": _official_waiting}
+
+
+def _collect_official_metrics():
+    state = official_stats()
+    yield ("app4_gemini_official_in_flight", "gauge", "Official Gemini API calls running / waiting for a slot",
+           [("app4_gemini_official_in_flight", {"state": "active"}, state["active"]),
+            ("app4_gemini_official_in_flight", {"state": "waiting"}, state["waiting"])])
+
+
+metrics.register_collector(_collect_official_metrics)
@@ -3,17 +3,84 @@ Prompt Orchestrator - Main coordinator for prompt optimization only
 Simplified version without video generation components
 """
 import os
-from typing import Dict, Any, Optional
+import time
+import asyncio
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import uuid
 
 from .prompt_generator import PromptGenerator
-from .prompt_engineer_agent import PromptEngineerAgent
+from .prompt_engineer_agent import get_agent
 from .prompt_validator import PromptValidator
 from .prompt_optimizer import PromptOptimizer
 from ..models.models import PromptOptimizationConfig
 
 
+def scene_user_input(scene: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos mutables de una escena del template (lo que el usuario escribe)"""
+    variables = scene.get("variables") or {}
+    return {
+        "action": scene.get("action_details", ""),
+        "emotion": scene.get("emotion", ""),
+        "dialogue": variables.get("dialogue", ""),
+        "voice_gender": variables.get("voice_gender", "female")
+    }
+
+
+async def optimize_scenes(
+    agent,
+    template: Dict[str, Any],
+    scene_ids: Optional[List[int]] = None,
+    max_concurrency: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Optimize every scene of a template concurrently
+    
+    Shared by /api/prompts/optimize/batch and ProductionOrchestrator, so both
+    send the same user_input per scene and hit the same prompt-cache entries.
+    
+    Args:
+        agent: PromptEngineerAgent to call refine_prompt on
+        template: Project template with "scenes"
+        scene_ids: Only these scenes (default: all)
+        max_concurrency: Max agent calls at once (default PROMPT_BATCH_CONCURRENCY)
+        
+    Returns:
+        One result per scene, in template order:
+        {"scene_id", "ok", "optimized" | "error", "original", "elapsed"}
+    """
+    scenes = [
+        scene for scene in template.get("scenes", [])
+        if scene_ids is None or scene.get("scene_id") in scene_ids
+    ]
+    limit = asyncio.Semaphore(max(1, max_concurrency or int(os.getenv("PROMPT_BATCH_CONCURRENCY", "6"))))
+    
+    async def optimize(scene: Dict[str, Any]) -> Dict[str, Any]:
+        user_input = scene_user_input(scene)
+        result = {"scene_id": scene.get("scene_id"), "original": user_input}
+        started = time.perf_counter()
+        try:
+            if not agent:
+                raise RuntimeError("Prompt agent not initialized")
+            async with limit:
+                optimized = await agent.refine_prompt(
+                    user_input=user_input,
+                    master_template=template,
+                    scene=scene
+                )
+            if "error" in optimized:
+                # refine_prompt ya devolvió el fallback con el input original
+                result.update(ok=False, error=optimized["error"], optimized=optimized)
+            else:
+                result.update(ok=True, optimized=optimized)
+        except Exception as e:
+            result.update(ok=False, error=str(e))
+        result["elapsed"] = round(time.perf_counter() - started, 3)
+        return result
+    
+    return list(await asyncio.gather(*(optimize(scene) for scene in scenes)))
+
+
 class PromptOrchestrator:
     """Orchestrate prompt optimization process - no video generation"""
     
@@ -32,7 +99,8 @@ class PromptOrchestrator:
                 use_local = os.getenv("USE_LOCAL_GEMINI", "false").lower() == "true"
                 webai_url = os.getenv("WEBAI_API_BASE_URL", "http://localhost:6969/v1")
                 
-                self.prompt_agent = PromptEngineerAgent(
+                # Shared instance (no genai.configure / new client per orchestrator)
+                self.prompt_agent = get_agent(
                     api_key=api_key,
                     model_name=self.optimization_config.gemini_model,
                     target_video_model=self.optimization_config.model_type,
@@ -100,6 +168,21 @@ class PromptOrchestrator:
                 "original": user_input
             }
     
+    scene_user_input = staticmethod(scene_user_input)
+    
+    async def optimize_scenes(
+        self,
+        template: Dict[str, Any],
+        scene_ids: Optional[List[int]] = None,
+        max_concurrency: Optional[int] = None,
+        agent=None
+    ) -> List[Dict[str, Any]]:
+        """Optimize every scene of a template concurrently (see optimize_scenes)"""
+        return await optimize_scenes(
+            agent or self.prompt_agent, template,
+            scene_ids=scene_ids, max_concurrency=max_concurrency
+        )
+    
     async def validate_prompt(self, prompt: str) -> Dict[str, Any]:
         """Validate a prompt for video generation compatibility"""
         if not hasattr(self, 'prompt_validator') or not self.prompt_validator:
@@ -5,16 +5,50 @@ This client allows using a local WebAI-to-API server (running on localhost:6969)
 instead of the official Google Gemini API, saving costs and avoiding rate limits.
 
 FIXED: Uses httpx.AsyncClient for proper async compatibility with FastAPI
+
+All WebAIClient instances pointing at the same server share one long-lived,
+pooled httpx.AsyncClient (keep-alive, optional HTTP/2), created on first use
+and closed by WebAIClient.aclose_all() on app shutdown:
+
+    WEBAI_MAX_CONNECTIONS=20 WEBAI_MAX_KEEPALIVE=10 WEBAI_KEEPALIVE_EXPIRY=30 WEBAI_HTTP2=false
+
+Failure handling, per server:
+- a circuit breaker opens after WEBAI_BREAKER_FAILURES consecutive failures
+  (transport errors, timeouts, 5xx); while open, calls raise CircuitOpenError at
+  once instead of waiting out the timeout. After WEBAI_BREAKER_RESET seconds one
+  trial call goes through;
+- a background probe hits /health every WEBAI_HEALTH_INTERVAL seconds and caches
+  the result (check_connection() reads the cache). WEBAI_HEALTH_FAILURES failed
+  probes in a row open the breaker; a successful probe lets a trial call through;
+- completion timeouts adapt to observed latency: p99 x WEBAI_TIMEOUT_MULTIPLIER,
+  clamped to [WEBAI_MIN_TIMEOUT, WEBAI_TIMEOUT], once enough calls have been seen.
+  A call that times out counts as a sample at its timeout, so when the server
+  slows down the p99 (and the timeout) grows back instead of every call failing.
 """
+import os
+import time
+import asyncio
 import httpx
 import logging
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, ClassVar, AsyncIterator
 from datetime import datetime
 
+from ..utils import metrics
+from ..utils.latency import LatencyWindow
+from ..utils.circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker
+
 logger = logging.getLogger(__name__)
 
 
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (httpx needs the h2 package for HTTP/2)
+        return True
+    except ImportError:
+        return False
+
+
 class WebAIResponse:
     """Response wrapper for Gemini-compatible response format"""
     
@@ -36,11 +70,21 @@ class WebAIClient:
     Uses httpx.AsyncClient for proper FastAPI async compatibility
     """
     
+    # One pooled client per server, shared by every WebAIClient instance
+    _pools: ClassVar[Dict[str, httpx.AsyncClient]] = {}
+    _pool_stats: ClassVar[Dict[str, Dict[str, int]]] = {}
+    _pool_loops: ClassVar[Dict[str, asyncio.AbstractEventLoop]] = {}
+    # Completion latencies per server (hedging delays, adaptive timeouts)
+    _latencies: ClassVar[Dict[str, LatencyWindow]] = {}
+    # Cached health probe results and the background probe task per server
+    _health: ClassVar[Dict[str, Dict[str, Any]]] = {}
+    _probes: ClassVar[Dict[str, asyncio.Task]] = {}
+    
     def __init__(
         self,
         base_url: str = "http://localhost:6969/v1",
         api_key: str = "sk-test123",
-        timeout: int = 180  # Increased to 3 minutes for Gemini
+        timeout: Optional[float] = None  # default WEBAI_TIMEOUT, 3 minutes for Gemini
     ):
         """
         Initialize WebAI client
@@ -48,47 +92,235 @@ class WebAIClient:
         Args:
             base_url: Base URL of WebAI-to-API server
             api_key: API key (not required for local server, but kept for compatibility)
-            timeout: Request timeout in seconds
+            timeout: Request timeout in seconds (upper bound of the adaptive completion timeout)
         """
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
-        self.timeout = float(timeout)
+        self.timeout = float(timeout if timeout is not None else os.getenv("WEBAI_TIMEOUT", "180"))
         
         logger.info(f"WebAIClient initialized with base_url: {self.base_url}")
     
-    async def check_connection(self) -> bool:
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Circuit breaker for this server (shared by all instances)"""
+        return get_breaker(
+            self.base_url,
+            failure_threshold=int(os.getenv("WEBAI_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("WEBAI_BREAKER_RESET", "30")),
+        )
+    
+    def completion_timeout(self) -> float:
+        """Timeout for a completion: p99 of observed latency x multiplier, within [min, self.timeout]"""
+        p99 = self.latency.percentile(0.99)
+        if p99 is None:
+            return self.timeout
+        adaptive = p99 * float(os.getenv("WEBAI_TIMEOUT_MULTIPLIER", "3"))
+        return min(self.timeout, max(float(os.getenv("WEBAI_MIN_TIMEOUT", "20")), adaptive))
+    
+    @property
+    def latency(self) -> LatencyWindow:
+        """Rolling window of completion latencies for this server (shared by all instances)"""
+        window = self._latencies.get(self.base_url)
+        if window is None:
+            window = self._latencies.setdefault(self.base_url, LatencyWindow(int(os.getenv("WEBAI_LATENCY_WINDOW", "256"))))
+        return window
+    
+    @classmethod
+    def _limits(cls) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=int(os.getenv("WEBAI_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("WEBAI_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("WEBAI_KEEPALIVE_EXPIRY", "30")),
+        )
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared pooled client for this server, creating it on first use"""
+        # No await between the lookup and the insert, so concurrent callers cannot race.
+        # A client is tied to the event loop it was created on (scripts may call asyncio.run twice).
+        loop = asyncio.get_running_loop()
+        client = self._pools.get(self.base_url)
+        if client is not None and not client.is_closed and self._pool_loops.get(self.base_url) is loop:
+            return client
+        http2 = os.getenv("WEBAI_HTTP2", "false").lower() == "true"
+        if http2 and not _http2_available():
+            logger.warning("[WARN] WEBAI_HTTP2=true but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        client = httpx.AsyncClient(limits=self._limits(), http2=http2, timeout=self.timeout)
+        self._pools[self.base_url] = client
+        self._pool_loops[self.base_url] = loop
+        self._pool_stats.setdefault(self.base_url, {"requests": 0, "errors": 0, "in_flight": 0})
+        logger.info(f"WebAIClient pool created for {self.base_url} (http2={http2})")
+        self.start_health_probe()
+        return client
+    
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        timeout: Optional[float] = None,
+        guarded: bool = True,
+        **kwargs
+    ) -> httpx.Response:
         """
-        Check if WebAI-to-API server is reachable
+        Send a request through the shared pool and keep per-server counters
         
-        Returns:
-            True if server is reachable, False otherwise
+        guarded requests go through the circuit breaker (CircuitOpenError when open)
+        and report their outcome to it; health probes are not guarded.
         """
+        if guarded:
+            self.breaker.allow()
+        client = await self._get_client()
+        stats = self._pool_stats[self.base_url]
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        ok, error = None, ""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                # Try health endpoint first
-                response = await client.get(f"{self.base_url.replace('/v1', '')}/health")
-                if response.status_code == 200:
-                    logger.info("[OK] WebAI-to-API server is reachable")
-                    return True
-                    
+            response = await client.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            ok = response.status_code < 500
+            error = "" if ok else f"HTTP {response.status_code}"
+            return response
+        except httpx.HTTPError as e:
+            stats["errors"] += 1
+            ok, error = False, (f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+            raise
+        finally:
+            stats["in_flight"] -= 1
+            if guarded:
+                self.breaker.record(ok, error)
+    
+    # ------------------------------------------------------------------
+    # Health
+    # ------------------------------------------------------------------
+    
+    def start_health_probe(self) -> None:
+        """Start the background /health probe for this server (needs a running loop)"""
+        interval = float(os.getenv("WEBAI_HEALTH_INTERVAL", "10"))
+        if interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        task = self._probes.get(self.base_url)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        self._probes[self.base_url] = loop.create_task(
+            self._probe_loop(interval), name=f"webai-health-{self.base_url}"
+        )
+    
+    async def _probe_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.probe()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[ERROR] WebAI health probe crashed: {e}")
+            await asyncio.sleep(interval)
+    
+    async def probe(self) -> Dict[str, Any]:
+        """Probe /health (then /models), cache the result and feed the circuit breaker"""
+        timeout = float(os.getenv("WEBAI_HEALTH_TIMEOUT", "5"))
+        started = time.perf_counter()
+        healthy, error = False, ""
+        try:
+            # Try health endpoint first
+            response = await self._request(
+                "GET", f"{self.base_url.replace('/v1', '')}/health", timeout=timeout, guarded=False
+            )
+            if response.status_code != 200:
                 # Fallback: try models endpoint
-                response = await client.get(
+                response = await self._request(
+                    "GET",
                     f"{self.base_url}/models",
+                    timeout=timeout,
+                    guarded=False,
                     headers={"Authorization": f"Bearer {self.api_key}"}
                 )
-                if response.status_code == 200:
-                    logger.info("[OK] WebAI-to-API server is reachable (via /models)")
-                    return True
-                    
-            logger.warning(f"[WARN] WebAI-to-API server returned status {response.status_code}")
-            return False
-            
-        except httpx.ConnectError as e:
-            logger.warning(f"[WARN] Cannot reach WebAI-to-API server: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"[ERROR] Error checking WebAI-to-API connection: {e}")
-            return False
+            healthy = response.status_code == 200
+            if not healthy:
+                error = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            error = (f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+        
+        previous = self._health.get(self.base_url, {})
+        failures = 0 if healthy else previous.get("consecutive_failures", 0) + 1
+        status = {
+            "healthy": healthy,
+            "checked_at": time.time(),
+            "latency": round(time.perf_counter() - started, 3),
+            "error": error or None,
+            "consecutive_failures": failures,
+        }
+        self._health[self.base_url] = status
+        
+        if healthy:
+            if previous and not previous.get("healthy"):
+                logger.info(f"[OK] WebAI-to-API server {self.base_url} is reachable again")
+            self.breaker.probe_ok()
+        elif failures >= int(os.getenv("WEBAI_HEALTH_FAILURES", "2")):
+            if previous.get("healthy", True):
+                logger.warning(f"[WARN] WebAI-to-API server {self.base_url} is down: {error}")
+            self.breaker.trip(f"health check failed: {error}")
+        return status
+    
+    @classmethod
+    def health_status(cls) -> Dict[str, Dict[str, Any]]:
+        """Last cached health probe result per server"""
+        return {url: dict(status) for url, status in cls._health.items()}
+    
+    @classmethod
+    def pool_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """Request counters and open/idle connections for each pooled server"""
+        out = {}
+        for base_url, client in cls._pools.items():
+            stats = dict(cls._pool_stats.get(base_url, {}))
+            stats["closed"] = client.is_closed
+            # httpx has no public pool API; read httpcore's connection list when present
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []) or [])
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for c in connections if c.is_idle())
+            stats["http2_connections"] = sum(1 for c in connections if "HTTP/2" in repr(c))
+            if base_url in cls._latencies:
+                stats["latency"] = cls._latencies[base_url].snapshot()
+            if base_url in cls._health:
+                stats["health"] = dict(cls._health[base_url])
+            stats["breaker"] = get_breaker(base_url).snapshot()
+            out[base_url] = stats
+        return out
+    
+    @classmethod
+    async def aclose_all(cls) -> None:
+        """Stop the health probes and close every pooled client (call on app shutdown)"""
+        probes, cls._probes = list(cls._probes.values()), {}
+        for task in probes:
+            task.cancel()
+        clients, cls._pools, cls._pool_loops = list(cls._pools.values()), {}, {}
+        for client in clients:
+            await client.aclose()
+    
+    async def check_connection(self, max_age: Optional[float] = None) -> bool:
+        """
+        Check if WebAI-to-API server is reachable
+        
+        Uses the background probe's cached result when it is younger than max_age
+        seconds (default WEBAI_HEALTH_TTL); otherwise probes now.
+        
+        Returns:
+            True if server is reachable, False otherwise
+        """
+        if max_age is None:
+            max_age = float(os.getenv("WEBAI_HEALTH_TTL", "30"))
+        status = self._health.get(self.base_url)
+        if status is None or time.time() - status["checked_at"] > max_age:
+            try:
+                status = await self.probe()
+            except Exception as e:
+                logger.error(f"[ERROR] Error checking WebAI-to-API connection: {e}")
+                return False
+        if status["healthy"]:
+            logger.info("[OK] WebAI-to-API server is reachable")
+        else:
+            logger.warning(f"[WARN] Cannot reach WebAI-to-API server: {status['error']}")
+        return status["healthy"]
     
     async def generate_content(
         self,
@@ -96,7 +328,8 @@ class WebAIClient:
         model: str = "gemini-2.0-flash-exp",
         temperature: float = 0.7,
         top_p: float = 0.9,
-        max_tokens: int = 2048
+        max_tokens: int = 2048,
+        response_format: Optional[dict] = None
     ) -> 'WebAIResponse':
         """
         Generate content using WebAI-to-API server
@@ -107,6 +340,7 @@ class WebAIClient:
             temperature: Sampling temperature
             top_p: Nucleus sampling parameter
             max_tokens: Maximum tokens to generate
+            response_format: OpenAI response_format, e.g. {"type": "json_object"} (omitted if None)
             
         Returns:
             WebAIResponse object with generated text
@@ -126,6 +360,8 @@ class WebAIClient:
                 "top_p": top_p,
                 "max_tokens": max_tokens
             }
+            if response_format:
+                request_data["response_format"] = response_format
             
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
@@ -135,40 +371,49 @@ class WebAIClient:
             logger.info(f"[API] Calling WebAI-to-API: {self.base_url}/chat/completions")
             logger.debug(f"Request: model={model}, temp={temperature}, max_tokens={max_tokens}")
             
-            # Use httpx.AsyncClient for proper async behavior in FastAPI
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
+            # Shared pooled client: keep-alive connections are reused across calls
+            started = time.perf_counter()
+            timeout = self.completion_timeout()
+            try:
+                response = await self._request(
+                    "POST",
                     f"{self.base_url}/chat/completions",
+                    timeout=timeout,
                     json=request_data,
                     headers=headers
                 )
+            except httpx.TimeoutException:
+                # censored sample: the answer takes at least this long
+                self.latency.record(timeout)
+                raise
                 
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"[ERROR] WebAI-to-API error {response.status_code}: {error_text}")
-                    raise httpx.HTTPStatusError(
-                        f"WebAI-to-API returned status {response.status_code}: {error_text}",
-                        request=response.request,
-                        response=response
-                    )
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"[ERROR] WebAI-to-API error {response.status_code}: {error_text}")
+                raise httpx.HTTPStatusError(
+                    f"WebAI-to-API returned status {response.status_code}: {error_text}",
+                    request=response.request,
+                    response=response
+                )
                 
-                response_data = response.json()
+            response_data = response.json()
                 
-                # Extract generated text
-                try:
-                    generated_text = response_data["choices"][0]["message"]["content"]
-                except (KeyError, IndexError) as e:
-                    logger.error(f"[ERROR] Invalid response format: {response_data}")
-                    raise ValueError(f"Invalid response format from WebAI-to-API: {e}")
+            # Extract generated text
+            try:
+                generated_text = response_data["choices"][0]["message"]["content"]
+            except (KeyError, IndexError) as e:
+                logger.error(f"[ERROR] Invalid response format: {response_data}")
+                raise ValueError(f"Invalid response format from WebAI-to-API: {e}")
                 
-                logger.info(f"[OK] WebAI-to-API response received ({len(generated_text)} chars)")
+            self.latency.record(time.perf_counter() - started)
+            logger.info(f"[OK] WebAI-to-API response received ({len(generated_text)} chars)")
                 
-                # Return Gemini-compatible response object
-                return WebAIResponse(
-                    text=generated_text,
-                    raw_response=response_data,
-                    model=model
-                )
+            # Return Gemini-compatible response object
+            return WebAIResponse(
+                text=generated_text,
+                raw_response=response_data,
+                model=model
+            )
                     
         except httpx.HTTPError as e:
             logger.error(f"[ERROR] WebAI-to-API request failed: {e}")
@@ -177,6 +422,112 @@ class WebAIClient:
             logger.error(f"[ERROR] Unexpected error in generate_content: {e}")
             raise
     
+    async def stream_content(
+        self,
+        prompt: str,
+        model: str = "gemini-2.0-flash-exp",
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        max_tokens: int = 2048,
+        response_format: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a completion as text deltas (OpenAI-compatible SSE, "stream": true)
+        
+        Yields each content delta as soon as the server sends it. Servers that
+        ignore "stream" and answer with a single JSON body yield the whole text once.
+        
+        Raises:
+            httpx.HTTPError: If request fails
+            ValueError: If response is invalid
+        """
+        request_data = {
+            "model": model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        if response_format:
+            request_data["response_format"] = response_format
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        
+        logger.info(f"[API] Streaming from WebAI-to-API: {self.base_url}/chat/completions")
+        breaker = self.breaker
+        breaker.allow()
+        client = await self._get_client()
+        stats = self._pool_stats[self.base_url]
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        chars = 0
+        ok, error = None, ""
+        timeout = self.completion_timeout()
+        try:
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                json=request_data,
+                headers=headers,
+                timeout=timeout
+            ) as response:
+                ok = response.status_code < 500
+                error = "" if ok else f"HTTP {response.status_code}"
+                if response.status_code != 200:
+                    error_text = (await response.aread()).decode("utf-8", "replace")
+                    logger.error(f"[ERROR] WebAI-to-API stream error {response.status_code}: {error_text}")
+                    raise httpx.HTTPStatusError(
+                        f"WebAI-to-API returned status {response.status_code}: {error_text}",
+                        request=response.request,
+                        response=response
+                    )
+                
+                if "text/event-stream" not in response.headers.get("content-type", ""):
+                    # Server does not stream: fall back to the buffered body
+                    response_data = json.loads(await response.aread())
+                    try:
+                        text = response_data["choices"][0]["message"]["content"]
+                    except (KeyError, IndexError) as e:
+                        raise ValueError(f"Invalid response format from WebAI-to-API: {e}")
+                    chars = len(text)
+                    yield text
+                    return
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(payload)
+                    except json.JSONDecodeError:
+                        logger.warning(f"[WARN] Skipping malformed SSE chunk: {payload[:200]}")
+                        continue
+                    for choice in chunk.get("choices", []):
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            chars += len(delta)
+                            yield delta
+            
+            logger.info(f"[OK] WebAI-to-API stream finished ({chars} chars)")
+        except httpx.HTTPError as e:
+            stats["errors"] += 1
+            ok, error = False, (f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+            if isinstance(e, httpx.TimeoutException):
+                self.latency.record(timeout)
+            logger.error(f"[ERROR] WebAI-to-API stream failed: {e}")
+            raise
+        finally:
+            stats["in_flight"] -= 1
+            breaker.record(ok, error)
+    
     async def generate_content_with_image(
         self,
         prompt: str,
@@ -232,37 +583,37 @@ class WebAIClient:
             
             logger.info(f"[API] Calling WebAI-to-API with image: {self.base_url}/chat/completions")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    json=request_data,
-                    headers=headers
-                )
+            response = await self._request(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                json=request_data,
+                headers=headers
+            )
                 
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"[ERROR] WebAI-to-API vision error {response.status_code}: {error_text}")
-                    raise httpx.HTTPStatusError(
-                        f"WebAI-to-API returned status {response.status_code}: {error_text}",
-                        request=response.request,
-                        response=response
-                    )
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"[ERROR] WebAI-to-API vision error {response.status_code}: {error_text}")
+                raise httpx.HTTPStatusError(
+                    f"WebAI-to-API returned status {response.status_code}: {error_text}",
+                    request=response.request,
+                    response=response
+                )
                 
-                response_data = response.json()
+            response_data = response.json()
                 
-                try:
-                    generated_text = response_data["choices"][0]["message"]["content"]
-                except (KeyError, IndexError) as e:
-                    logger.error(f"[ERROR] Invalid vision response format: {response_data}")
-                    raise ValueError(f"Invalid response format from WebAI-to-API: {e}")
+            try:
+                generated_text = response_data["choices"][0]["message"]["content"]
+            except (KeyError, IndexError) as e:
+                logger.error(f"[ERROR] Invalid vision response format: {response_data}")
+                raise ValueError(f"Invalid response format from WebAI-to-API: {e}")
                 
-                logger.info(f"[OK] WebAI-to-API vision response received ({len(generated_text)} chars)")
+            logger.info(f"[OK] WebAI-to-API vision response received ({len(generated_text)} chars)")
                 
-                return WebAIResponse(
-                    text=generated_text,
-                    raw_response=response_data,
-                    model=model
-                )
+            return WebAIResponse(
+                text=generated_text,
+                raw_response=response_data,
+                model=model
+            )
                     
         except httpx.HTTPError as e:
             logger.error(f"[ERROR] WebAI-to-API vision request failed: {e}")
@@ -272,6 +623,23 @@ class WebAIClient:
             raise
 
 
+def _collect_pool_metrics():
+    stats = WebAIClient.pool_stats()
+    families = {
+        "requests": ("counter", "Requests sent to the WebAI-to-API server"),
+        "errors": ("counter", "WebAI-to-API requests that failed at the transport level"),
+        "in_flight": ("gauge", "WebAI-to-API requests currently in flight"),
+        "connections": ("gauge", "Open pooled connections to the WebAI-to-API server"),
+        "idle_connections": ("gauge", "Idle keep-alive connections to the WebAI-to-API server"),
+    }
+    for key, (kind, help) in families.items():
+        name = f"app4_webai_{key}_total" if kind == "counter" else f"app4_webai_{key}"
+        yield name, kind, help, [(name, {"server": url}, s.get(key, 0)) for url, s in stats.items()]
+
+
+metrics.register_collector(_collect_pool_metrics)
+
+
 # Convenience functions for quick access
 async def quick_generate(prompt: str, model: str = "gemini-3.0-pro") -> str:
     """Quick generation without creating a client instance"""
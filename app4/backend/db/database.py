@@ -46,6 +46,14 @@ class Database:
         await self.db.assets.create_index("asset_id", unique=True)
         await self.db.assets.create_index("project_id")
         await self.db.assets.create_index("type")
+        
+        # Idempotency keys collection (TTL index drops records once expires_at passes)
+        await self.db.idempotency_keys.create_index("key", unique=True)
+        await self.db.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+        
+        # Prompt cache (shared tier of backend/utils/prompt_cache.py)
+        await self.db.prompt_cache.create_index("key", unique=True)
+        await self.db.prompt_cache.create_index("expires_at", expireAfterSeconds=0)
     
     async def close(self):
         """Close database connection"""
@@ -2,8 +2,9 @@
 MongoDB Repositories for CRUD operations
 """
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 from ..db.database import db
 from ..models.models import Project, Clip, Asset, ProjectStatus, ClipStatus
@@ -172,3 +173,78 @@ class AssetRepository:
         """Delete all assets for a project"""
         result = await db.db.assets.delete_many({"project_id": project_id})
         return result.deleted_count
+
+class IdempotencyRepository:
+    """Repository for Idempotency-Key records (stored responses replayed to client retries)"""
+    
+    @staticmethod
+    async def claim(key: str, fingerprint: str, lease_seconds: float) -> Optional[dict]:
+        """
+        Reserve a key for the request being processed now.
+        Returns None if the caller owns the key, otherwise the existing record.
+        """
+        now = datetime.utcnow()
+        record = {
+            "key": key,
+            "fingerprint": fingerprint,
+            "state": "pending",
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=lease_seconds)
+        }
+        for _ in range(2):
+            try:
+                await db.db.idempotency_keys.insert_one(dict(record))
+                return None
+            except DuplicateKeyError:
+                existing = await db.db.idempotency_keys.find_one({"key": key})
+                if existing is None:
+                    continue
+                # The TTL monitor only runs once a minute; treat expired records as gone
+                if existing["expires_at"] <= now:
+                    await db.db.idempotency_keys.delete_one({"_id": existing["_id"], "expires_at": existing["expires_at"]})
+                    continue
+                return existing
+        return await db.db.idempotency_keys.find_one({"key": key})
+    
+    @staticmethod
+    async def complete(key: str, status_code: int, body: str, ttl_seconds: float) -> bool:
+        """Store the (JSON text) response for a claimed key"""
+        result = await db.db.idempotency_keys.update_one(
+            {"key": key},
+            {"$set": {
+                "state": "done",
+                "status_code": status_code,
+                "body": body,
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)
+            }}
+        )
+        return result.modified_count > 0
+    
+    @staticmethod
+    async def release(key: str) -> bool:
+        """Drop an unfinished claim so the request can be retried"""
+        result = await db.db.idempotency_keys.delete_one({"key": key, "state": "pending"})
+        return result.deleted_count > 0
+
+
+class PromptCacheRepository:
+    """Repository for cached prompt-optimization results (shared tier of the prompt cache)"""
+    
+    @staticmethod
+    async def get(key: str) -> Optional[dict]:
+        """Get an unexpired entry by cache key"""
+        return await db.db.prompt_cache.find_one({"key": key, "expires_at": {"$gt": datetime.utcnow()}})
+    
+    @staticmethod
+    async def put(key: str, value: dict, ttl_seconds: float) -> None:
+        """Insert or refresh an entry"""
+        now = datetime.utcnow()
+        await db.db.prompt_cache.update_one(
+            {"key": key},
+            {"$set": {
+                "value": value,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl_seconds)
+            }},
+            upsert=True
+        )
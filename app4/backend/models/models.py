@@ -214,13 +214,20 @@ class PromptValidationResult(BaseModel):
     suggestions: List[str] = []
     notes: str
 
+class AgentValidation(BaseModel):
+    """Validación de coherencia que devuelve el agente"""
+    is_coherent: bool = True
+    confidence_score: float = Field(0.0, ge=0.0, le=1.0)
+    notes: str = ""
+    issues: List[str] = []
+
 class OptimizedPromptData(BaseModel):
     """Datos de un prompt optimizado por el agente"""
     optimized_action: str
     optimized_emotion: str
     optimized_dialogue: Optional[str] = None
     technical_keywords: List[str] = []
-    validation: dict  # Resultado de validación del agente
+    validation: AgentValidation  # Resultado de validación del agente
     optimization_metadata: Optional[dict] = None
 
 class PromptOptimizationResult(BaseModel):
@@ -0,0 +1,165 @@
+"""
+Admission control for the App4 API.
+
+Each expensive resource gets an AdmissionGate with a high-water mark. When the
+gate is full new requests are rejected at once with 429/503 and a Retry-After
+computed from the work in flight and its recent average duration, instead of
+piling up until the client times out:
+
+    productions   full commercial productions (background tasks)   APP4_MAX_PRODUCTIONS   (429)
+    prompts       Gemini calls (optimize, analyze-frame)            APP4_MAX_PROMPT_CALLS  (503)
+
+    @app.post("/api/prompts/optimize", dependencies=[Depends(prompt_gate.dependency)])
+
+Work that fans out into several calls takes one slot per call it runs at once:
+
+    async with prompt_gate.slots(wanted=6) as concurrency:   # 1..6 slots, or Overloaded
+        ...
+
+GET /api/queue reports the current depth of every gate. A limit of 0 disables
+the gate.
+"""
+import os
+import math
+import time
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+from fastapi import HTTPException
+
+from backend.utils import metrics
+
+MAX_RETRY_AFTER = 600
+
+ADMISSION_REJECTED = metrics.counter(
+    "app4_admission_rejected_total", "Requests shed because a gate was at its high-water mark", ["gate"])
+
+
+class Overloaded(HTTPException):
+    """A gate is full; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, gate: str, status_code: int, retry_after: int):
+        self.gate = gate
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=status_code,
+            detail=f"Server busy ({gate} queue is full), retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class AdmissionGate:
+    def __init__(self, name: str, limit: int, reject_status: int = 503, expected_seconds: float = 30.0):
+        self.name = name
+        self.limit = max(0, limit)
+        self.reject_status = reject_status
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        # moving average of how long admitted work holds its slot
+        self.avg_seconds = expected_seconds
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> int:
+        with self._lock:
+            if not self.limit:
+                return 1
+            backlog = max(1, self.in_flight - self.limit + 1)
+            seconds = backlog * self.avg_seconds / self.limit
+        return int(min(MAX_RETRY_AFTER, max(1, math.ceil(seconds))))
+
+    def acquire(self) -> float:
+        """Take a slot or raise Overloaded. Returns the start time to pass to release()."""
+        return self.acquire_many(1)[0]
+
+    def acquire_many(self, wanted: int) -> tuple:
+        """
+        Take between 1 and `wanted` slots (as many as are free) or raise Overloaded.
+        Returns (start time, slots taken) to pass to release().
+        """
+        wanted = max(1, wanted)
+        with self._lock:
+            free = self.limit - self.in_flight if self.limit else wanted
+            taken = min(wanted, free)
+            if taken > 0:
+                self.in_flight += taken
+                self.admitted += taken
+            else:
+                self.rejected += 1
+        if taken <= 0:
+            ADMISSION_REJECTED.inc(gate=self.name)
+            raise Overloaded(self.name, self.reject_status, self.retry_after())
+        return time.monotonic(), taken
+
+    def release(self, started: float, slots: int = 1) -> None:
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - slots)
+            self.avg_seconds += 0.2 * (elapsed - self.avg_seconds)
+
+    @asynccontextmanager
+    async def slot(self):
+        started = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    @asynccontextmanager
+    async def slots(self, wanted: int):
+        """Hold up to `wanted` slots; yields how many were taken (at least 1)"""
+        started, taken = self.acquire_many(wanted)
+        try:
+            yield taken
+        finally:
+            self.release(started, taken)
+
+    async def dependency(self):
+        """FastAPI dependency that holds a slot for the duration of the request."""
+        async with self.slot():
+            yield
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = {
+                "in_flight": self.in_flight,
+                "limit": self.limit,
+                "full": bool(self.limit) and self.in_flight >= self.limit,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "avg_seconds": round(self.avg_seconds, 3),
+            }
+        state["retry_after"] = self.retry_after()
+        return state
+
+
+production_gate = AdmissionGate(
+    "productions",
+    int(os.getenv("APP4_MAX_PRODUCTIONS", os.getenv("MAX_CONCURRENT_GENERATIONS", "2"))),
+    reject_status=429,
+    expected_seconds=600.0,
+)
+prompt_gate = AdmissionGate(
+    "prompts",
+    int(os.getenv("APP4_MAX_PROMPT_CALLS", "8")),
+    reject_status=503,
+    expected_seconds=20.0,
+)
+
+GATES: Dict[str, AdmissionGate] = {gate.name: gate for gate in (production_gate, prompt_gate)}
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return {name: gate.snapshot() for name, gate in GATES.items()}
+
+
+def _collect_gate_metrics():
+    state = snapshot()
+    yield ("app4_admission_in_flight", "gauge", "Work currently holding a slot, per gate",
+           [("app4_admission_in_flight", {"gate": name}, s["in_flight"]) for name, s in state.items()])
+    yield ("app4_admission_limit", "gauge", "High-water mark per gate (0 = unlimited)",
+           [("app4_admission_limit", {"gate": name}, s["limit"]) for name, s in state.items()])
+
+
+metrics.register_collector(_collect_gate_metrics)
@@ -0,0 +1,154 @@
+"""
+Circuit breaker for calls to flaky backends (the WebAI-to-API server).
+
+    closed     calls go through; FAILURES consecutive failures open the circuit
+    open       calls are rejected at once with CircuitOpenError for RESET seconds
+               (or until a health probe sees the backend again)
+    half_open  one trial call goes through: success closes, failure re-opens
+
+    breaker.allow()              # raises CircuitOpenError when open
+    ok = None
+    try:
+        response = await call()
+        ok = response.status_code < 500
+    except httpx.HTTPError:
+        ok = False
+        raise
+    finally:
+        breaker.record(ok)       # None = no verdict (cancelled), frees the trial slot
+
+State per breaker is exported at GET /metrics (app4_circuit_breaker_*).
+"""
+import time
+import threading
+from typing import Any, Dict, Optional
+
+from backend.utils import metrics
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_REJECTED = metrics.counter(
+    "app4_circuit_breaker_rejected_total", "Calls rejected because the circuit was open", ["breaker"])
+BREAKER_TRANSITIONS = metrics.counter(
+    "app4_circuit_breaker_transitions_total", "Circuit state changes", ["breaker", "state"])
+
+
+class CircuitOpenError(RuntimeError):
+    """The backend is considered down; the call was not attempted."""
+
+    def __init__(self, name: str, retry_in: float, reason: str = ""):
+        self.name = name
+        self.retry_in = retry_in
+        detail = f": {reason}" if reason else ""
+        super().__init__(f"Circuit open for {name}, not retrying for {retry_in:.0f}s{detail}")
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = ""
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            BREAKER_TRANSITIONS.inc(breaker=self.name, state=state)
+
+    def _open(self, reason: str) -> None:
+        self._set_state(OPEN)
+        self.opened_at = time.monotonic()
+        self.last_error = reason
+        self._trial_in_flight = False
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self.state == OPEN:
+                waited = time.monotonic() - self.opened_at
+                if waited < self.reset_timeout:
+                    rejected = self.reset_timeout - waited
+                else:
+                    self._set_state(HALF_OPEN)
+                    rejected = None
+            else:
+                rejected = None
+            if rejected is None and self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    rejected = 1.0
+                else:
+                    self._trial_in_flight = True
+        if rejected is not None:
+            BREAKER_REJECTED.inc(breaker=self.name)
+            raise CircuitOpenError(self.name, rejected, self.last_error)
+
+    def record(self, ok: Optional[bool], error: str = "") -> None:
+        """Outcome of an allowed call: True, False, or None when there is no verdict"""
+        with self._lock:
+            was_trial = self.state == HALF_OPEN and self._trial_in_flight
+            if was_trial:
+                self._trial_in_flight = False
+            if ok is None:
+                return
+            if ok:
+                self.failures = 0
+                self._set_state(CLOSED)
+                return
+            self.failures += 1
+            if was_trial or self.failures >= self.failure_threshold:
+                self._open(error or f"{self.failures} consecutive failures")
+
+    def trip(self, reason: str) -> None:
+        """Open the circuit now (e.g. the health probe cannot reach the backend)"""
+        with self._lock:
+            if self.state != OPEN:
+                self._open(reason)
+
+    def probe_ok(self) -> None:
+        """The backend answers health checks again: let the next call through as a trial"""
+        with self._lock:
+            if self.state == OPEN:
+                self._set_state(HALF_OPEN)
+                self._trial_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = {
+                "state": self.state,
+                "failures": self.failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "last_error": self.last_error or None,
+            }
+            if self.state == OPEN:
+                state["retry_in"] = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+        return state
+
+
+BREAKERS: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """Shared breaker for `name`, created on first use"""
+    with _registry_lock:
+        breaker = BREAKERS.get(name)
+        if breaker is None:
+            breaker = BREAKERS[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+        return breaker
+
+
+def _collect_breaker_metrics():
+    with _registry_lock:
+        breakers = list(BREAKERS.values())
+    yield ("app4_circuit_breaker_state", "gauge", "Circuit state (0 closed, 1 half-open, 2 open)",
+           [("app4_circuit_breaker_state", {"breaker": b.name}, STATE_VALUES[b.state]) for b in breakers])
+
+
+metrics.register_collector(_collect_breaker_metrics)
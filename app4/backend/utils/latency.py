@@ -0,0 +1,45 @@
+"""
+Rolling latency window.
+
+Keeps the last N observed durations of an operation and answers percentile
+queries over them. Used to derive hedging delays and adaptive timeouts from
+what a backend actually does instead of fixed numbers:
+
+    window = LatencyWindow(256)
+    window.record(1.8)
+    p95 = window.percentile(0.95)   # None until min_samples observations
+"""
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 256, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=max(1, size))
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(max(0.0, float(seconds)))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q in [0, 1] (nearest rank), or None while there are fewer than min_samples observations"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        rank = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[rank]
+
+    def snapshot(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"samples": len(self)}
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = self.percentile(q)
+            out[name] = round(value, 3) if value is not None else None
+        return out
@@ -0,0 +1,14 @@
+"""
+Event-loop lag monitor for the App4 API (see observability.loop_monitor).
+
+- samples scheduling delay every APP4_LOOP_LAG_INTERVAL seconds into the
+  ``app4_event_loop_lag_seconds`` histogram (GET /metrics);
+- logs the running task and the loop thread's stack from a watchdog thread
+  when the loop has been stuck for more than APP4_LOOP_LAG_THRESHOLD seconds.
+
+Set APP4_LOOP_LAG_THRESHOLD=0 to disable it.
+"""
+from observability.loop_monitor import LoopLagMonitor
+
+# metric names app4_*, environment variables APP4_*
+loop_monitor = LoopLagMonitor.from_env("app4")
@@ -0,0 +1,14 @@
+"""
+Prometheus-style metrics for the App4 API.
+
+Re-exports the registry in observability.metrics (shared with the Veo backend
+at the repository root); ``render()`` is served at GET /metrics by api.py.
+
+    LOOP_LAG_SECONDS.observe(0.012)
+    with SOME_HISTOGRAM.time(stage="optimize"):
+        ...
+"""
+from observability.metrics import (  # noqa: F401
+    CONTENT_TYPE, DEFAULT_BUCKETS, Counter, Gauge, Histogram,
+    counter, gauge, histogram, register_collector, render,
+)
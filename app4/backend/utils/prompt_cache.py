@@ -0,0 +1,253 @@
+"""
+Cache of prompt-optimization results.
+
+The same action/emotion/dialogue/voice for the same template and scene always
+produces the same prompt for the agent, so the LLM answer is reused instead of
+paying for another call:
+
+    memory   in-process LRU (PROMPT_CACHE_MAX_ENTRIES entries)
+    mongo    optional shared tier (PROMPT_CACHE_MONGO=true), survives restarts
+             and is shared between workers
+
+Entries expire after PROMPT_CACHE_TTL seconds. Identical requests that arrive
+while the first one is still waiting for the LLM share its result
+(single-flight) instead of each calling the model.
+
+The key is a hash of the model name, the target video model and the
+whitespace-normalized prompt built from the refine_prompt inputs, so fields of
+the template that never reach the prompt don't cause misses. Fallback results
+(agent errors) are never cached.
+
+    key = prompt_cache.key(model_name, target_video_model, full_prompt)
+    result, source = await prompt_cache.get_or_compute(key, call_llm)
+
+Hit rate is exported at GET /metrics (app4_prompt_cache_*) and
+GET /api/system/prompt-cache. PROMPT_CACHE_ENABLED=false disables the cache.
+"""
+import os
+import copy
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from backend.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+PROMPT_CACHE_REQUESTS = metrics.counter(
+    "app4_prompt_cache_requests_total", "Prompt optimizations by cache outcome (memory, store, shared, miss)", ["result"])
+
+HIT_RESULTS = ("memory", "store", "shared")
+
+
+def _cacheable(value: dict) -> bool:
+    return isinstance(value, dict) and "error" not in value
+
+
+class PromptCache:
+    def __init__(self, max_entries: int = 512, ttl: float = 86400.0, enabled: bool = True, use_store: bool = False):
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl
+        self.enabled = enabled and self.max_entries > 0 and ttl > 0
+        self.use_store = use_store
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> future of the LLM call currently computing it
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"memory": 0, "store": 0, "shared": 0, "miss": 0, "evicted": 0, "store_errors": 0}
+
+    @classmethod
+    def from_env(cls) -> "PromptCache":
+        return cls(
+            max_entries=int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "512")),
+            ttl=float(os.getenv("PROMPT_CACHE_TTL", str(24 * 3600))),
+            enabled=os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true",
+            use_store=os.getenv("PROMPT_CACHE_MONGO", "false").lower() == "true",
+        )
+
+    @staticmethod
+    def key(model_name: str, target_video_model: str, full_prompt: str) -> str:
+        normalized = " ".join(str(full_prompt).split())
+        payload = json.dumps([str(model_name), str(target_video_model), normalized], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # memory tier
+    # ------------------------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _memory_put(self, key: str, value: dict, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+
+    # ------------------------------------------------------------------
+    # mongo tier (errors are logged, never raised: the cache is best effort)
+    # ------------------------------------------------------------------
+
+    def _store_ready(self) -> bool:
+        if not self.use_store:
+            return False
+        from backend.db.database import db
+        return db.db is not None
+
+    async def _store_get(self, key: str) -> Optional[Tuple[dict, float]]:
+        if not self._store_ready():
+            return None
+        from backend.db.repositories import PromptCacheRepository
+        try:
+            record = await PromptCacheRepository.get(key)
+        except Exception as e:
+            self.stats["store_errors"] += 1
+            logger.warning(f"[WARN] Prompt cache lookup failed: {e}")
+            return None
+        if not record:
+            return None
+        remaining = (record["expires_at"] - datetime.utcnow()).total_seconds()
+        return record["value"], remaining
+
+    async def _store_put(self, key: str, value: dict) -> None:
+        if not self._store_ready():
+            return
+        from backend.db.repositories import PromptCacheRepository
+        try:
+            await PromptCacheRepository.put(key, value, self.ttl)
+        except Exception as e:
+            self.stats["store_errors"] += 1
+            logger.warning(f"[WARN] Prompt cache write failed: {e}")
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
+
+    def _count(self, result: str) -> None:
+        self.stats[result] += 1
+        PROMPT_CACHE_REQUESTS.inc(result=result)
+
+    async def lookup(self, key: str) -> Tuple[Optional[dict], str]:
+        """(copy of the cached value or None, "memory" | "store" | "miss")"""
+        if not self.enabled:
+            return None, "miss"
+        value = self._memory_get(key)
+        if value is not None:
+            self._count("memory")
+            return copy.deepcopy(value), "memory"
+        stored = await self._store_get(key)
+        if stored is not None:
+            value, remaining = stored
+            self._memory_put(key, value, ttl=max(1.0, remaining))
+            self._count("store")
+            return copy.deepcopy(value), "store"
+        return None, "miss"
+
+    async def put(self, key: str, value: dict) -> None:
+        """Cache a result unless it is a fallback"""
+        if not self.enabled or not _cacheable(value):
+            return
+        value = copy.deepcopy(value)
+        self._memory_put(key, value)
+        await self._store_put(key, value)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[dict]]) -> Tuple[dict, str]:
+        """
+        Cached value for `key`, or the result of `compute()` (cached if it is not a fallback).
+        Concurrent callers with the same key await a single `compute()`.
+        Returns (value, source) with source in "memory", "store", "shared", "miss".
+        """
+        if not self.enabled:
+            return await compute(), "miss"
+
+        value = self._memory_get(key)
+        if value is not None:
+            self._count("memory")
+            return copy.deepcopy(value), "memory"
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                value = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # the caller that was computing it went away; try again ourselves
+                return await self.get_or_compute(key, compute)
+            self._count("shared")
+            return copy.deepcopy(value), "shared"
+
+        future = asyncio.get_running_loop().create_future()
+        # nobody may be waiting on it; don't warn about an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            value, source = await self.lookup(key)
+            if value is None:
+                self._count("miss")
+                value = await compute()
+                await self.put(key, value)
+            future.set_result(copy.deepcopy(value))
+            return value, source
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def hit_ratio(self) -> float:
+        hits = sum(self.stats[r] for r in HIT_RESULTS)
+        total = hits + self.stats["miss"]
+        return hits / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "enabled": self.enabled,
+            "mongo": self.use_store,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "in_flight": len(self._inflight),
+            "hit_ratio": round(self.hit_ratio(), 4),
+            **self.stats,
+        }
+
+
+prompt_cache = PromptCache.from_env()
+
+
+def _collect_cache_metrics():
+    state = prompt_cache.snapshot()
+    yield ("app4_prompt_cache_hit_ratio", "gauge", "Share of prompt optimizations served without a new LLM call",
+           [("app4_prompt_cache_hit_ratio", {}, state["hit_ratio"])])
+    yield ("app4_prompt_cache_entries", "gauge", "Entries in the in-memory prompt cache",
+           [("app4_prompt_cache_entries", {}, state["entries"])])
+
+
+metrics.register_collector(_collect_cache_metrics)
@@ -1,10 +1,13 @@
 # backend.py
-from fastapi import FastAPI, File, Form, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response, JSONResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as StarletteUploadFile
 from typing import List, Optional
-import io, os, logging
+import io, os, json, time, hashlib, logging
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 load_dotenv()
@@ -20,17 +23,166 @@ from helper import (
     download_video_bytes,
     stitch_videos,
     get_video_object_from_operation,
+    video_filename,
 )
+from uploads import spool_upload, upload_sha256
+from workspace import workspace, WorkspaceQuotaExceeded
+from shared_state import shared_state
+from retry import retry_stats
+import metrics
+import tracing
+import executors
+from loop_monitor import loop_monitor
 
+from logging_setup import configure_logging
+
+configure_logging()
 logger = logging.getLogger("backend")
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 app = FastAPI(title="Veo 3.1 Backend Suite")
 DEFAULT_MODEL = os.getenv("VEO_MODEL_NAME", "veo-3.1-fast-generate-preview")
 # NEW: models that support referenceImages and first/last frames
 SUPPORTED_MODEL = os.getenv("VEO_SUPPORTED_MODEL", "veo-3.1-generate-preview")
 
-# Allow Streamlit (port 8501) and React Frontend (port 5173)
+@app.on_event("startup")
+async def startup():
+    workspace.start_janitor()
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    loop_monitor.stop()
+    workspace.stop_janitor()
+    executors.shutdown()
+    tracing.exporter.flush()
+
+SUBMIT_PATHS = {
+    "/text_to_video", "/image_to_video", "/video_from_reference_images",
+    "/video_from_first_last_frames", "/extend_veo_video",
+}
+
+@app.middleware("http")
+async def shed_load(request: Request, call_next):
+    """Reject new submissions before reading their bodies when the pool that would run them is full."""
+    if request.method == "POST" and request.url.path in SUBMIT_PATHS:
+        try:
+            executors.control.admit()
+        except executors.Overloaded as e:
+            return _overloaded_response(e)
+    return await call_next(request)
+
+def _overloaded_response(e: "executors.Overloaded") -> JSONResponse:
+    # Middleware runs outside FastAPI's exception handlers, so render the 429/503 here
+    return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+
+@app.middleware("http")
+async def trace_submissions(request: Request, call_next):
+    """Start a trace for each generation job; _record_operation stores its ID for later polls/downloads."""
+    if request.method != "POST" or request.url.path not in SUBMIT_PATHS:
+        return await call_next(request)
+    with tracing.trace() as trace_id, tracing.span("submit" + request.url.path):
+        response = await call_next(request)
+    response.headers["X-Trace-Id"] = trace_id
+    return response
+
+def _record_operation(result: dict, mode: str, model: str, **extra) -> None:
+    """Publish metadata for a newly started operation so any worker can serve it later."""
+    op_name = result.get("operation_name")
+    if not op_name:
+        return
+    try:
+        shared_state.put_operation(op_name, {
+            "mode": mode,
+            "model": model,
+            "submitted_at": datetime.now(timezone.utc).isoformat(),
+            "trace_id": tracing.current_trace_id(),
+            **extra,
+        })
+    except Exception:
+        logger.exception("Failed to record operation metadata for %s", op_name)
+
+@contextmanager
+def _timed_submit(mode: str):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        metrics.SUBMIT_SECONDS.observe(time.perf_counter() - start, mode=mode)
+        metrics.SUBMIT_TOTAL.inc(mode=mode, outcome=outcome)
+
+def _collect_runtime_metrics():
+    """Workspace usage and retry stats, read at scrape time."""
+    usage = workspace.usage()
+    gauges = {
+        "veo_workspace_bytes_used": ("Bytes used under the temp workspace", usage["bytes_used"]),
+        "veo_workspace_files": ("Files under the temp workspace", usage["files"]),
+        "veo_workspace_quota_bytes": ("Workspace quota", usage["quota_bytes"]),
+        "veo_workspace_active_jobs": ("Job scopes currently open", usage["active_jobs"]),
+        "veo_workspace_disk_free_bytes": ("Free space on the workspace filesystem", usage["disk_free_bytes"]),
+    }
+    for name, (help, value) in gauges.items():
+        if value is not None:
+            yield name, "gauge", help, [(name, {}, value)]
+    counters = {
+        "veo_workspace_evicted_files_total": ("Files evicted by the janitor or quota", usage["evicted_files"]),
+        "veo_workspace_evicted_bytes_total": ("Bytes evicted by the janitor or quota", usage["evicted_bytes"]),
+        "veo_workspace_quota_rejections_total": ("Requests rejected for workspace quota", usage["quota_rejections"]),
+    }
+    retries = retry_stats()
+    for key in ("calls", "retries", "budget_exhausted", "gave_up", "recovered"):
+        counters[f"veo_retry_{key}_total"] = (f"Retry layer: {key.replace('_', ' ')}", retries[key])
+    for name, (help, value) in counters.items():
+        yield name, "counter", help, [(name, {}, value)]
+    yield "veo_retry_budget_tokens", "gauge", "Retry budget tokens available", [("veo_retry_budget_tokens", {}, retries["tokens"])]
+
+metrics.register_collector(_collect_runtime_metrics)
+
+IDEMPOTENCY_TTL = float(os.getenv("VEO_IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_LEASE = float(os.getenv("VEO_IDEMPOTENCY_LEASE", "900"))
+IDEMPOTENCY_REPLAYED_HEADERS = ("content-type", "x-trace-id")
+
+@app.middleware("http")
+async def idempotent_submissions(request: Request, call_next):
+    """
+    Replay the first successful response to retries carrying the same Idempotency-Key,
+    so a client retrying after a timeout does not start (and pay for) a second generation.
+
+    The key is claimed by the claim_idempotency dependency, once FastAPI has parsed (and
+    spooled) the form, so the fingerprint covers the fields and uploaded files without
+    buffering the body here. This middleware stores or releases the claim.
+    """
+    key = request.headers.get("idempotency-key")
+    if request.method != "POST" or request.url.path not in SUBMIT_PATHS or not key:
+        return await call_next(request)
+    if len(key) > 255:
+        return JSONResponse({"detail": "Idempotency-Key must be at most 255 characters"}, status_code=400)
+
+    request.state.idempotency_key = key
+    try:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    except BaseException:
+        if getattr(request.state, "idempotency_claimed", False):
+            await run_in_threadpool(shared_state.release_idempotency_key, key)
+        raise
+    if not getattr(request.state, "idempotency_claimed", False):
+        # Replayed / conflicting key, or rejected before the claim (validation, load shedding)
+        return Response(content=body, status_code=response.status_code, headers=dict(response.headers))
+    # Recording the outcome must not be shed, or the key would stay pending until the lease expires
+    if 200 <= response.status_code < 300:
+        headers = {k: v for k, v in response.headers.items() if k in IDEMPOTENCY_REPLAYED_HEADERS}
+        await run_in_threadpool(
+            shared_state.complete_idempotency_key, key, response.status_code, headers, body, IDEMPOTENCY_TTL)
+    else:
+        # Nothing was started; let the client retry with the same key
+        await run_in_threadpool(shared_state.release_idempotency_key, key)
+    return Response(content=body, status_code=response.status_code, headers=dict(response.headers))
+
+# Allow Streamlit (port 8501) and React Frontend (port 5173).
+# Registered after the middlewares above so it runs outermost and their 400/409/429/503
+# responses carry the CORS headers too.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -42,8 +194,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # let the browser read the load-shedding and tracing headers
+    expose_headers=["Retry-After", "X-Trace-Id"],
 )
 
+class _IdempotentAnswer(Exception):
+    """Answer a submission from its Idempotency-Key record without running the endpoint."""
+
+    def __init__(self, response: Response):
+        self.response = response
+
+@app.exception_handler(_IdempotentAnswer)
+async def _idempotent_answer(request: Request, exc: _IdempotentAnswer):
+    return exc.response
+
+async def _request_fingerprint(request: Request) -> str:
+    """Path plus a digest of every form field, uploaded files by the sha256 of their content."""
+    form = await request.form()  # already parsed by FastAPI; cached on the request
+    digest = hashlib.sha256()
+    for name, value in form.multi_items():
+        if isinstance(value, StarletteUploadFile):
+            part = ["file", await upload_sha256(value)]
+        else:
+            part = ["field", value]
+        digest.update(json.dumps([name, *part]).encode("utf-8") + b"\n")
+    return f"POST {request.url.path} {digest.hexdigest()}"
+
+async def claim_idempotency(request: Request):
+    """Dependency of the submit endpoints: claim the request's Idempotency-Key (see idempotent_submissions)."""
+    key = getattr(request.state, "idempotency_key", None)
+    if not key:
+        return
+    fingerprint = await _request_fingerprint(request)
+    record = await executors.control.run_admitted(shared_state.claim_idempotency_key, key, fingerprint, IDEMPOTENCY_LEASE)
+    if record is None:
+        request.state.idempotency_claimed = True
+        return
+    if record["fingerprint"] != fingerprint:
+        raise _IdempotentAnswer(JSONResponse(
+            {"detail": "Idempotency-Key was already used for a different request"}, status_code=422))
+    if record["state"] != "done":
+        raise _IdempotentAnswer(JSONResponse(
+            {"detail": "A request with this Idempotency-Key is still in progress"},
+            status_code=409, headers={"Retry-After": "2"}))
+    logger.info("Replaying stored response for Idempotency-Key %s", key)
+    raise _IdempotentAnswer(Response(content=record["body"], status_code=record["status"],
+                                     headers={**record["headers"], "Idempotent-Replayed": "true"}))
+
 # ----------------------------------------------------------------------
 # ENDPOINTS
 # ----------------------------------------------------------------------
@@ -52,7 +249,35 @@ app.add_middleware(
 def root():
     return {"message": "Veo 3.1 Backend is running"}
 
-@app.post("/text_to_video")
+@app.get("/workspace")
+def workspace_usage():
+    return {"ok": True, **workspace.usage()}
+
+@app.get("/queue")
+def queue_depth():
+    """Current load of each worker pool; clients can check it before submitting."""
+    return {"ok": True, "pools": executors.snapshot()}
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/trace/{operation_name:path}")
+def trace_endpoint(operation_name: str, format: str = "chrome"):
+    """Spans of one job as Chrome trace JSON (or OTLP JSON with ?format=otlp)."""
+    meta = shared_state.get_operation(operation_name) or {}
+    trace_id = meta.get("trace_id")
+    if not trace_id:
+        raise HTTPException(status_code=404, detail="No trace recorded for this operation")
+    if "chrome" not in tracing.exporter.sinks:
+        raise HTTPException(status_code=404, detail="Trace storage disabled; set VEO_TRACE_EXPORT=chrome")
+    tracing.exporter.flush()
+    spans = tracing.exporter.load_trace(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"No spans found for trace {trace_id}")
+    return tracing.to_otlp(spans) if format == "otlp" else tracing.to_chrome(spans)
+
+@app.post("/text_to_video", dependencies=[Depends(claim_idempotency)])
 async def text_to_video_endpoint(
     prompt: str = Form(...),
     model: str = Form("veo-3.1-fast-generate-preview"),
@@ -61,13 +286,19 @@ async def text_to_video_endpoint(
     aspect_ratio: str = Form("16:9")
 ):
     try:
-        result = generate_text_to_video(prompt, model, resolution=resolution, aspect_ratio=aspect_ratio, duration_seconds=duration_seconds)
+        with _timed_submit("text_to_video"):
+            result = await executors.control.run_admitted(
+                generate_text_to_video, prompt, model, resolution=resolution, aspect_ratio=aspect_ratio, duration_seconds=duration_seconds
+            )
+        _record_operation(result, "text_to_video", model)
         return {"ok": True, **result}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("text_to_video failed")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/image_to_video")
+@app.post("/image_to_video", dependencies=[Depends(claim_idempotency)])
 async def image_to_video_endpoint(
     prompt: str = Form(...),
     image: UploadFile = File(...),
@@ -76,15 +307,24 @@ async def image_to_video_endpoint(
     resolution: str = Form("1080p"),
     aspect_ratio: str = Form("16:9")
 ):
-    try:
-        image_bytes = await image.read()
-        result = generate_image_to_video(prompt, image_bytes, model, resolution=resolution, aspect_ratio=aspect_ratio, duration_seconds=duration_seconds)
-        return {"ok": True, **result}
-    except Exception as e:
-        logger.exception("image_to_video failed")
-        raise HTTPException(status_code=500, detail=str(e))
+    with workspace.job():
+        try:
+            spooled = await spool_upload(image)
+            with _timed_submit("image_to_video"):
+                result = await executors.control.run_admitted(
+                    generate_image_to_video, prompt, spooled.path, model, resolution=resolution, aspect_ratio=aspect_ratio, duration_seconds=duration_seconds
+                )
+            _record_operation(result, "image_to_video", model, input_sha256=spooled.sha256)
+            return {"ok": True, **result}
+        except HTTPException:
+            raise
+        except WorkspaceQuotaExceeded as e:
+            raise HTTPException(status_code=507, detail=str(e))
+        except Exception as e:
+            logger.exception("image_to_video failed")
+            raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/video_from_reference_images")
+@app.post("/video_from_reference_images", dependencies=[Depends(claim_idempotency)])
 async def video_from_reference_images_endpoint(
     prompt: str = Form(...),
     images: List[UploadFile] = File(...),
@@ -93,28 +333,32 @@ async def video_from_reference_images_endpoint(
     resolution: str = Form("1080p"),
     aspect_ratio: str = Form("16:9")
 ):
-    try:
-        # Read all images
-        image_bytes_list = []
-        for img in images:
-            image_bytes_list.append(await img.read())
-            
-        result = generate_video_from_reference_images(
-            prompt, 
-            image_bytes_list, 
-            model, 
-            resolution=resolution, 
-            aspect_ratio=aspect_ratio, 
-            duration_seconds=duration_seconds
-        )
-        return {"ok": True, **result}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception("video_from_reference_images failed")
-        raise HTTPException(status_code=500, detail=str(e))
+    with workspace.job():
+        try:
+            # Spool all images to disk
+            spooled = [await spool_upload(img) for img in images]
+                
+            with _timed_submit("reference_images"):
+                result = await executors.control.run_admitted(
+                    generate_video_from_reference_images,
+                    prompt, 
+                    [item.path for item in spooled], 
+                    model, 
+                    resolution=resolution, 
+                    aspect_ratio=aspect_ratio, 
+                    duration_seconds=duration_seconds
+                )
+            _record_operation(result, "reference_images", model)
+            return {"ok": True, **result}
+        except HTTPException:
+            raise
+        except WorkspaceQuotaExceeded as e:
+            raise HTTPException(status_code=507, detail=str(e))
+        except Exception as e:
+            logger.exception("video_from_reference_images failed")
+            raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/video_from_first_last_frames")
+@app.post("/video_from_first_last_frames", dependencies=[Depends(claim_idempotency)])
 async def video_from_first_last_frames_endpoint(
     prompt: str = Form(...),
     first_frame: UploadFile = File(...),
@@ -124,28 +368,34 @@ async def video_from_first_last_frames_endpoint(
     resolution: str = Form("1080p"),
     aspect_ratio: str = Form("16:9")
 ):
-    try:
-        first_bytes = await first_frame.read()
-        last_bytes = await last_frame.read()
-        
-        result = generate_video_from_first_last_frames(
-            prompt, 
-            first_bytes, 
-            last_bytes, 
-            model, 
-            resolution=resolution, 
-            aspect_ratio=aspect_ratio, 
-            duration_seconds=duration_seconds
-        )
-        return {"ok": True, **result}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception("video_from_first_last_frames failed")
-        raise HTTPException(status_code=500, detail=str(e))
+    with workspace.job():
+        try:
+            first = await spool_upload(first_frame)
+            last = await spool_upload(last_frame)
+            
+            with _timed_submit("first_last_frames"):
+                result = await executors.control.run_admitted(
+                    generate_video_from_first_last_frames,
+                    prompt, 
+                    first.path, 
+                    last.path, 
+                    model, 
+                    resolution=resolution, 
+                    aspect_ratio=aspect_ratio, 
+                    duration_seconds=duration_seconds
+                )
+            _record_operation(result, "first_last_frames", model)
+            return {"ok": True, **result}
+        except HTTPException:
+            raise
+        except WorkspaceQuotaExceeded as e:
+            raise HTTPException(status_code=507, detail=str(e))
+        except Exception as e:
+            logger.exception("video_from_first_last_frames failed")
+            raise HTTPException(status_code=500, detail=str(e))
     
 # ----------------------------------------------------------------------
-@app.post("/extend_veo_video")
+@app.post("/extend_veo_video", dependencies=[Depends(claim_idempotency)])
 async def extend_veo_video_endpoint(
     prompt: str = Form(...),
     base_video: Optional[UploadFile] = File(None),
@@ -155,66 +405,68 @@ async def extend_veo_video_endpoint(
     resolution: str = Form("1080p"),
     aspect_ratio: str = Form("16:9")
 ):
-    try:
-        prior_video_obj = None
-        video_bytes = None
-        
-        # Scenario 1: Extend from Gallery (using previous operation)
-        if previous_operation_name:
-            logger.info(f"Extending from previous operation: {previous_operation_name}")
-            prior_video_obj = get_video_object_from_operation(previous_operation_name)
-            if not prior_video_obj:
-                raise HTTPException(status_code=400, detail="Could not retrieve video object from previous operation. It might be expired or failed.")
+    with workspace.job():
+        try:
+            prior_video_obj = None
+            spooled = None
             
-            # Try to download the video bytes from the previous operation to save as base for THIS extension
-            try:
-                prev_bytes, _ = download_video_bytes(previous_operation_name)
-                if prev_bytes:
-                    video_bytes = prev_bytes
-            except Exception as e:
-                logger.warning(f"Could not download bytes for previous operation: {e}")
-
-        # Scenario 2: Extend from Upload
-        elif base_video:
-            video_bytes = await base_video.read()
-        else:
-            raise HTTPException(status_code=400, detail="Either base_video or previous_operation_name must be provided")
-
-        if not video_bytes and not prior_video_obj:
-             raise HTTPException(status_code=400, detail="Failed to get video content for extension")
+            # Scenario 1: Extend from Gallery (using previous operation)
+            # The SDK extends the prior generated-video object directly, so the previous
+            # video's bytes are not needed here and are not downloaded.
+            if previous_operation_name:
+                logger.info("Extending from previous operation: %s", previous_operation_name)
+                prior_video_obj = await executors.control.run_admitted(get_video_object_from_operation, previous_operation_name)
+                if not prior_video_obj:
+                    raise HTTPException(status_code=400, detail="Could not retrieve video object from previous operation. It might be expired or failed.")
 
-        if video_bytes is None:
-             video_bytes = b"" # Dummy if we strictly use prior_obj, but stitching will fail.
-        
-        payload = extend_veo_video(
-            prompt, 
-            video_bytes, 
-            model, 
-            prior_generated_video_obj=prior_video_obj,
-            resolution=resolution, 
-            aspect_ratio=aspect_ratio, 
-            duration_seconds=duration_seconds
-        )
-        
-        # Save base video for later stitching ONLY if we uploaded a file (Scenario 2).
-        # If we extended from gallery (Scenario 1), the API returns the FULL video, so stitching is not needed (and causes duplication).
-        print(f"DEBUG: extend_veo_video payload: {payload}")
-        if payload.get("ok", True) and base_video: 
-            op_name = payload.get("operation_name")
-            if op_name and video_bytes:
-                safe_op_name = op_name.replace("/", "_")
-                base_path = f"temp_base_{safe_op_name}.mp4"
-                with open(base_path, "wb") as f:
-                    f.write(video_bytes)
-                print(f"DEBUG: Saved base video to {base_path} (size: {len(video_bytes)})")
-                logger.info(f"Saved base video for stitching: {base_path}")
-                
-        return {"ok": True, **payload}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception("extend_veo_video failed")
-        raise HTTPException(status_code=500, detail=str(e))
+            # Scenario 2: Extend from Upload
+            elif base_video:
+                spooled = await spool_upload(base_video, suffix=".mp4")
+                if not spooled.size:
+                    raise HTTPException(status_code=400, detail="Failed to get video content for extension")
+            else:
+                raise HTTPException(status_code=400, detail="Either base_video or previous_operation_name must be provided")
+            
+            # Uploading a base video is a bulk transfer; extending a gallery video is a plain API call
+            pool = executors.transfer if spooled else executors.control
+            with _timed_submit("extend"):
+                payload = await pool.run(
+                    extend_veo_video,
+                    prompt, 
+                    spooled.path if spooled else None, 
+                    model, 
+                    prior_generated_video_obj=prior_video_obj,
+                    resolution=resolution, 
+                    aspect_ratio=aspect_ratio, 
+                    duration_seconds=duration_seconds
+                )
+            
+            # Save base video for later stitching ONLY if we uploaded a file (Scenario 2).
+            # If we extended from gallery (Scenario 1), the API returns the FULL video, so stitching is not needed (and causes duplication).
+            logger.debug("extend_veo_video payload: %s", payload)
+            stitch_base = False
+            if payload.get("ok", True) and spooled: 
+                op_name = payload.get("operation_name")
+                if op_name:
+                    # Move the spooled upload into the shared store instead of rewriting it,
+                    # so whichever worker serves /download can stitch.
+                    shared_state.put_blob(f"base:{op_name}", spooled.path)
+                    stitch_base = True
+                    logger.info("Saved base video for stitching: %s (%d bytes)", op_name, spooled.size)
+            _record_operation(
+                payload, "extend", model,
+                previous_operation_name=previous_operation_name,
+                stitch_base=stitch_base,
+            )
+                    
+            return {"ok": True, **payload}
+        except HTTPException:
+            raise
+        except WorkspaceQuotaExceeded as e:
+            raise HTTPException(status_code=507, detail=str(e))
+        except Exception as e:
+            logger.exception("extend_veo_video failed")
+            raise HTTPException(status_code=500, detail=str(e))
 
 # ----------------------------------------------------------------------
 # ASYNC OPERATIONS
@@ -222,8 +474,10 @@ async def extend_veo_video_endpoint(
 @app.post("/async_operations")
 async def async_operations(operation_name: str = Form(...)):
     try:
-        payload = handle_async_operation(operation_name)
+        payload = await executors.control.run_admitted(handle_async_operation, operation_name)
         return {"ok": True, **payload}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error in /async_operations")
         raise HTTPException(status_code=500, detail=str(e))
@@ -232,52 +486,88 @@ async def async_operations(operation_name: str = Form(...)):
 # COMMON POLLING / DOWNLOAD / SAVE
 # ----------------------------------------------------------------------
 @app.get("/status/{operation_name:path}")
-def status(operation_name: str):
+async def status(operation_name: str):
     try:
-        return {"ok": True, **get_operation_status(operation_name)}
+        return {"ok": True, **await executors.control.run_admitted(_status, operation_name)}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Status check failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _status(operation_name: str) -> dict:
+    meta = shared_state.get_operation(operation_name) or {}
+    with tracing.trace(meta.get("trace_id")):
+        return get_operation_status(operation_name)
+
 @app.get("/download/{operation_name:path}")
-def download(operation_name: str):
-    data, filename = download_video_bytes(operation_name)
+async def download(operation_name: str):
+    meta = await executors.control.run_admitted(shared_state.get_operation, operation_name) or {}
+    with tracing.trace(meta.get("trace_id")), tracing.span("download", operation=operation_name):
+        return await _download(operation_name, meta)
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+def _video_response(data: bytes, filename: str) -> StreamingResponse:
+    return StreamingResponse(io.BytesIO(data), media_type="video/mp4",
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+async def _download(operation_name: str, meta: dict):
+    # A previous download (possibly on another worker) may already have stitched this one
+    stitched_path = await executors.control.run_admitted(shared_state.blob_path, f"stitched:{operation_name}")
+    if stitched_path:
+        logger.info("Serving previously stitched video for %s", operation_name)
+        data = await executors.transfer.run(_read_bytes, stitched_path)
+        return _video_response(data, video_filename())
+
+    data, filename = await executors.transfer.run(download_video_bytes, operation_name)
     if not data:
         raise HTTPException(status_code=404, detail="Video not available or incomplete")
     
     # Check if we have a base video to stitch
-    safe_op_name = operation_name.replace("/", "_")
-    base_path = f"temp_base_{safe_op_name}.mp4"
+    base_key = f"base:{operation_name}"
+    base_path = await executors.control.run_admitted(shared_state.blob_path, base_key)
     
-    print(f"DEBUG: Download request for {operation_name}")
-    print(f"DEBUG: Looking for base video at {base_path}")
-    print(f"DEBUG: File exists? {os.path.exists(base_path)}")
+    logger.debug("Download request for %s (base video available: %s)", operation_name, bool(base_path))
     
-    if os.path.exists(base_path):
-        logger.info(f"Found base video for stitching: {base_path}")
-        stitched_data = stitch_videos(base_path, data)
-        if stitched_data:
-            data = stitched_data
-            logger.info("Video stitching successful")
-            print("DEBUG: Stitching successful")
-        else:
-            logger.warning("Video stitching failed, returning extension only")
-            print("DEBUG: Stitching failed (returned None)")
+    if base_path:
+        logger.info("Found base video for stitching: %s", base_path)
+        with workspace.job():
+            stitched_data = await executors.media.run_admitted(stitch_videos, base_path, data)
+            if stitched_data:
+                data = stitched_data
+                logger.info("Video stitching successful")
+                # Keep the result so repeat downloads (from any worker) skip re-stitching
+                try:
+                    out_path = workspace.path("stitched", ".mp4")
+                    await executors.transfer.run_admitted(_write_bytes, out_path, stitched_data)
+                    await executors.control.run_admitted(shared_state.put_blob, f"stitched:{operation_name}", out_path)
+                except Exception as e:
+                    logger.warning("Failed to store stitched video: %s", e)
+            else:
+                logger.warning("Video stitching failed, returning extension only")
         
-        # Cleanup base video
+        # Cleanup base video; the video is ready, so a failure here must not fail the download
         try:
-            os.remove(base_path)
-            logger.info(f"Deleted temp base video: {base_path}")
+            await executors.control.run_admitted(shared_state.delete_blob, base_key)
+            logger.info("Deleted base video for %s", operation_name)
         except Exception as e:
-            logger.warning(f"Failed to delete temp base video: {e}")
+            logger.warning("Failed to delete base video for %s: %s", operation_name, e)
+    elif meta.get("stitch_base"):
+        logger.warning("Base video for %s is missing (evicted?); returning extension only", operation_name)
 
-    return StreamingResponse(io.BytesIO(data), media_type="video/mp4",
-                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    return _video_response(data, filename)
 
 @app.get("/save_local/{operation_name:path}")
-def save_local(operation_name: str):
+async def save_local(operation_name: str):
     try:
-        data, filename = download_video_bytes(operation_name)
+        data, filename = await executors.transfer.run(download_video_bytes, operation_name)
         if not data:
             raise HTTPException(status_code=404, detail="Video not available or incomplete")
 
@@ -287,9 +577,10 @@ def save_local(operation_name: str):
         ts = datetime.now(IST).strftime("%Y%m%d-%H%M%S")
         safe_name = f"{os.path.splitext(filename)[0]}_{ts}.mp4"
         path = os.path.join(out_dir, safe_name)
-        with open(path, "wb") as f:
-            f.write(data)
+        await executors.transfer.run_admitted(_write_bytes, path, data)
         return {"ok": True, "file_path": os.path.abspath(path)}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Save local failed")
         raise HTTPException(status_code=500, detail=str(e))
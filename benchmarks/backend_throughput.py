@@ -0,0 +1,330 @@
+"""
+End-to-end throughput benchmark for backend.py.
+
+Starts the fake Veo server and the backend (uvicorn) as subprocesses, submits
+N jobs with bounded concurrency, polls each one to completion, downloads it
+(extend jobs are stitched by the backend on download), and reports throughput,
+per-stage latency percentiles and the backend's peak RSS / open file
+descriptors as JSON. Pass --baseline to fail (exit 1) when a branch regresses.
+
+    python benchmarks/backend_throughput.py --jobs 50 --concurrency 10 --output run.json
+    python benchmarks/backend_throughput.py --jobs 50 --baseline run.json --max-regression 0.15
+
+Options after ``--fake-args`` are passed to fake_veo_server.py, e.g.
+``--fake-args "--render-time uniform:2,6 --rate-429 0.05"``.
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ("submit", "poll", "download", "total")
+
+
+# ----------------------------------------------------------------------
+# PROCESSES
+# ----------------------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"process for {url} exited with {proc.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def _descendants(pid: int) -> List[int]:
+    """pid plus all of its children (uvicorn --workers forks), from /proc."""
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    out, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        out.append(p)
+        stack.extend(parents.get(p, []))
+    return out
+
+
+def _rss_and_fds(pid: int) -> tuple:
+    rss, fds = 0, 0
+    for p in _descendants(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) * 1024
+                        break
+            fds += len(os.listdir(f"/proc/{p}/fd"))
+        except OSError:
+            continue
+    return rss, fds
+
+
+class ResourceSampler(threading.Thread):
+    """Samples RSS and open FDs of a process tree; keeps the peaks."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        super().__init__(name="resource-sampler", daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_fds = 0
+        self.samples = 0
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            rss, fds = _rss_and_fds(self.pid)
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_fds = max(self.peak_fds, fds)
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.join(timeout=5)
+
+
+# ----------------------------------------------------------------------
+# JOBS
+# ----------------------------------------------------------------------
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        # nearest-rank
+        return ordered[max(0, min(len(ordered) - 1, int(round(p * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50": round(pct(0.50), 4),
+        "p95": round(pct(0.95), 4),
+        "p99": round(pct(0.99), 4),
+        "mean": round(statistics.fmean(ordered), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+async def _run_job(client: httpx.AsyncClient, kind: str, base_video: bytes, args) -> Dict[str, Any]:
+    job: Dict[str, Any] = {"kind": kind, "ok": False, "polls": 0}
+    t0 = time.perf_counter()
+    try:
+        form = {"prompt": f"benchmark {kind} {random.random():.6f}", "model": args.model, "duration_seconds": "8"}
+        if kind == "extend":
+            resp = await client.post("/extend_veo_video", data=form, files={"base_video": ("base.mp4", base_video, "video/mp4")})
+        else:
+            resp = await client.post("/text_to_video", data=form)
+        job["submit"] = time.perf_counter() - t0
+        resp.raise_for_status()
+        op_name = resp.json().get("operation_name")
+        if not op_name:
+            raise RuntimeError(f"no operation_name in {resp.text[:200]}")
+
+        t1 = time.perf_counter()
+        while True:
+            job["polls"] += 1
+            status = (await client.get(f"/status/{op_name}")).json()
+            if status.get("done"):
+                break
+            if time.perf_counter() - t1 > args.poll_timeout:
+                raise TimeoutError(f"{op_name} not done after {args.poll_timeout}s")
+            await asyncio.sleep(args.poll_interval)
+        job["poll"] = time.perf_counter() - t1
+
+        t2 = time.perf_counter()
+        resp = await client.get(f"/download/{op_name}")
+        resp.raise_for_status()
+        job["download"] = time.perf_counter() - t2
+        job["bytes"] = len(resp.content)
+        job["ok"] = True
+    except Exception as e:
+        job["error"] = f"{type(e).__name__}: {e}"[:300]
+    job["total"] = time.perf_counter() - t0
+    return job
+
+
+async def _drive(backend_url: str, base_video: bytes, args) -> List[Dict[str, Any]]:
+    kinds = ["extend" if random.random() < args.extend_ratio else "text" for _ in range(args.jobs)]
+    sem = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=backend_url, timeout=args.request_timeout, limits=limits) as client:
+        async def bounded(kind):
+            async with sem:
+                return await _run_job(client, kind, base_video, args)
+        return await asyncio.gather(*(bounded(k) for k in kinds))
+
+
+# ----------------------------------------------------------------------
+# MAIN
+# ----------------------------------------------------------------------
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--extend-ratio", type=float, default=0.5, help="fraction of jobs that upload a base video and stitch on download")
+    parser.add_argument("--model", default="veo-3.1-fast-generate-preview")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--poll-timeout", type=float, default=300)
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the backend")
+    parser.add_argument("--fake-args", default="--render-time uniform:1,3 --latency uniform:0.02,0.1")
+    parser.add_argument("--backend-env", action="append", default=[], help="extra KEY=VALUE for the backend process")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="previous JSON result to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="allowed relative throughput drop / p95 increase")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    tmp = tempfile.mkdtemp(prefix="veo_bench_")
+    fake_port, backend_port = _free_port(), _free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    procs: List[subprocess.Popen] = []
+    log = open(os.path.join(tmp, "processes.log"), "w")
+    try:
+        fake = subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, "fake_veo_server.py"), "--port", str(fake_port), *shlex.split(args.fake_args)],
+            cwd=REPO_ROOT, stdout=log, stderr=subprocess.STDOUT,
+        )
+        procs.append(fake)
+        _wait_ready(f"{fake_url}/_fake/stats", fake)
+
+        env = {
+            **os.environ,
+            "VEO_API_BASE_URL": fake_url,
+            "GEMINI_API_KEY": "fake",
+            "VEO_WORKSPACE_DIR": os.path.join(tmp, "workspace"),
+            "VEO_SHARED_STATE_URL": "sqlite://" + os.path.join(tmp, "shared_state.db"),
+        }
+        env.update(kv.split("=", 1) for kv in args.backend_env)
+        backend = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend:app", "--port", str(backend_port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        procs.append(backend)
+        _wait_ready(f"{backend_url}/", backend)
+
+        # A real clip from the fake server doubles as the upload for extend jobs
+        sys.path.insert(0, BENCH_DIR)
+        from fake_veo_server import render_video
+        base_video = render_video(2.0)
+
+        sampler = ResourceSampler(backend.pid)
+        idle_rss, idle_fds = _rss_and_fds(backend.pid)
+        sampler.start()
+        t0 = time.perf_counter()
+        jobs = asyncio.run(_drive(backend_url, base_video, args))
+        wall = time.perf_counter() - t0
+        sampler.stop()
+        fake_stats = httpx.get(f"{fake_url}/_fake/stats").json()
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        log.close()
+
+    ok = [j for j in jobs if j["ok"]]
+    errors: Dict[str, int] = {}
+    for j in jobs:
+        if not j["ok"]:
+            errors[j["error"]] = errors.get(j["error"], 0) + 1
+
+    result = {
+        "benchmark": "backend_throughput",
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "jobs": {"total": len(jobs), "ok": len(ok), "failed": len(jobs) - len(ok)},
+        "wall_seconds": round(wall, 3),
+        "throughput_jobs_per_second": round(len(ok) / wall, 4) if wall else None,
+        "stages_seconds": {stage: _percentiles([j[stage] for j in ok]) for stage in STAGES},
+        "stages_by_kind_seconds": {
+            kind: {stage: _percentiles([j[stage] for j in ok if j["kind"] == kind]) for stage in STAGES}
+            for kind in ("text", "extend")
+        },
+        "polls_per_job": _percentiles([j["polls"] for j in ok]),
+        "backend": {
+            "idle_rss_bytes": idle_rss,
+            "peak_rss_bytes": sampler.peak_rss,
+            "idle_open_fds": idle_fds,
+            "peak_open_fds": sampler.peak_fds,
+            "resource_samples": sampler.samples,
+        },
+        "fake_server": fake_stats,
+        "errors": errors,
+    }
+
+    status = 0 if ok else 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        base_tp = baseline.get("throughput_jobs_per_second")
+        base_p95 = baseline["stages_seconds"]["total"]["p95"]
+        now_tp = result["throughput_jobs_per_second"]
+        now_p95 = result["stages_seconds"]["total"]["p95"]
+        result["baseline"] = {"throughput_jobs_per_second": base_tp, "total_p95_seconds": base_p95}
+        if base_tp and now_tp is not None and now_tp < base_tp * (1 - args.max_regression):
+            print(f"FAIL: throughput {now_tp:.3f} jobs/s vs baseline {base_tp:.3f}", file=sys.stderr)
+            status = 1
+        if base_p95 and now_p95 is not None and now_p95 > base_p95 * (1 + args.max_regression):
+            print(f"FAIL: total p95 {now_p95:.3f}s vs baseline {base_p95:.3f}s", file=sys.stderr)
+            status = 1
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
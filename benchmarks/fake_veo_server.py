@@ -0,0 +1,328 @@
+"""
+Local stand-in for the parts of the Gemini API that helper.py talks to.
+
+Serves the same wire format as generativelanguage.googleapis.com, so the real
+google-genai SDK and the REST fallbacks work against it unchanged:
+
+    POST /v1beta/models/{model}:predictLongRunning      models.generate_videos / REST fallback
+    GET  /v1beta/models/{model}/operations/{id}         operations.get
+    POST /upload/v1beta/files                           files.upload (resumable protocol)
+    GET  /v1beta/files/{id}:download?alt=media          files.download
+
+Operations finish after a sampled "render" time and point at a synthetic MP4
+(rendered once with moviepy when available, or --video-file). Latency,
+failures and 429s are injected per endpoint so polling, stitching, retry and
+quota behavior can be load-tested offline.
+
+    python benchmarks/fake_veo_server.py --port 8090 --latency uniform:0.05,0.3 --render-time const:5 --rate-429 0.05
+    VEO_API_BASE_URL=http://127.0.0.1:8090 GEMINI_API_KEY=fake python -m uvicorn backend:app
+
+Latency specs: ``const:S``, ``uniform:LO,HI``, ``exp:MEAN``, ``lognormal:MEDIAN,SIGMA``
+(seconds). Counters are served at GET /_fake/stats.
+"""
+import os
+import sys
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+PUBLIC_HOST = "https://generativelanguage.googleapis.com"
+
+
+# ----------------------------------------------------------------------
+# CONFIG
+# ----------------------------------------------------------------------
+def parse_distribution(spec: str) -> Callable[[], float]:
+    """Turn a latency spec like ``uniform:0.1,0.5`` into a sampler returning seconds."""
+    kind, _, raw = spec.partition(":")
+    args = [float(a) for a in raw.split(",") if a] if raw else []
+    kind = kind.strip().lower()
+    if kind == "const":
+        value = args[0] if args else 0.0
+        return lambda: value
+    if kind == "uniform":
+        lo, hi = args
+        return lambda: random.uniform(lo, hi)
+    if kind == "exp":
+        mean = args[0]
+        return lambda: random.expovariate(1.0 / mean) if mean > 0 else 0.0
+    if kind == "lognormal":
+        median, sigma = args
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"unknown latency distribution '{spec}'")
+
+
+@dataclass
+class FakeConfig:
+    latency: str = "const:0"                 # default for every endpoint
+    submit_latency: Optional[str] = None
+    poll_latency: Optional[str] = None
+    upload_latency: Optional[str] = None
+    download_latency: Optional[str] = None
+    render_time: str = "const:3"             # time until an operation reports done
+    failure_rate: float = 0.0                # HTTP 500 on any endpoint
+    rate_429: float = 0.0                    # HTTP 429 on submit/upload
+    op_failure_rate: float = 0.0             # operation finishes with an error instead of a video
+    video_file: Optional[str] = None
+    video_seconds: float = 2.0
+    samplers: Dict[str, Callable[[], float]] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_env(cls) -> "FakeConfig":
+        env = os.getenv
+        return cls(
+            latency=env("FAKE_VEO_LATENCY", "const:0"),
+            submit_latency=env("FAKE_VEO_SUBMIT_LATENCY"),
+            poll_latency=env("FAKE_VEO_POLL_LATENCY"),
+            upload_latency=env("FAKE_VEO_UPLOAD_LATENCY"),
+            download_latency=env("FAKE_VEO_DOWNLOAD_LATENCY"),
+            render_time=env("FAKE_VEO_RENDER_TIME", "const:3"),
+            failure_rate=float(env("FAKE_VEO_FAILURE_RATE", "0")),
+            rate_429=float(env("FAKE_VEO_RATE_429", "0")),
+            op_failure_rate=float(env("FAKE_VEO_OP_FAILURE_RATE", "0")),
+            video_file=env("FAKE_VEO_VIDEO_FILE"),
+            video_seconds=float(env("FAKE_VEO_VIDEO_SECONDS", "2")),
+        )
+
+    def sampler(self, endpoint: str) -> Callable[[], float]:
+        if endpoint not in self.samplers:
+            spec = getattr(self, f"{endpoint}_latency", None) if endpoint != "render" else self.render_time
+            self.samplers[endpoint] = parse_distribution(spec or self.latency)
+        return self.samplers[endpoint]
+
+
+# ----------------------------------------------------------------------
+# SYNTHETIC VIDEO
+# ----------------------------------------------------------------------
+def _stub_mp4() -> bytes:
+    """Minimal ftyp+mdat container; enough for byte-level tests, not decodable."""
+    ftyp = b"ftypisom" + b"\x00\x00\x02\x00" + b"isomiso2mp41"
+    mdat = b"mdat" + os.urandom(1024)
+    return (len(ftyp) + 4).to_bytes(4, "big") + ftyp + (len(mdat) + 4).to_bytes(4, "big") + mdat
+
+
+def render_video(seconds: float) -> bytes:
+    """Render a small solid-color clip so downstream stitching has a real MP4 to decode."""
+    try:
+        from moviepy import ColorClip
+    except ImportError:
+        return _stub_mp4()
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    try:
+        clip = ColorClip(size=(320, 180), color=(32, 96, 160), duration=seconds)
+        clip.write_videofile(path, fps=12, codec="libx264", audio=False, logger=None)
+        clip.close()
+        with open(path, "rb") as f:
+            return f.read()
+    except Exception as e:
+        print(f"fake_veo_server: could not render video ({e}); serving stub MP4", file=sys.stderr)
+        return _stub_mp4()
+    finally:
+        os.remove(path)
+
+
+# ----------------------------------------------------------------------
+# APP
+# ----------------------------------------------------------------------
+def _error(code: int, status: str, message: str, retry_after: Optional[int] = None) -> JSONResponse:
+    headers = {"Retry-After": str(retry_after)} if retry_after else None
+    return JSONResponse({"error": {"code": code, "message": message, "status": status}}, status_code=code, headers=headers)
+
+
+def create_app(config: Optional[FakeConfig] = None) -> FastAPI:
+    config = config or FakeConfig.from_env()
+    app = FastAPI(title="Fake Veo / GenAI API")
+
+    operations: Dict[str, Dict[str, Any]] = {}
+    uploads: Dict[str, Dict[str, Any]] = {}
+    files: Dict[str, Dict[str, Any]] = {}
+    lock = threading.Lock()
+    stats: Dict[str, int] = {}
+    video: Dict[str, bytes] = {}
+
+    def bump(key: str) -> None:
+        with lock:
+            stats[key] = stats.get(key, 0) + 1
+
+    def video_bytes() -> bytes:
+        if "data" not in video:
+            if config.video_file:
+                with open(config.video_file, "rb") as f:
+                    video["data"] = f.read()
+            else:
+                video["data"] = render_video(config.video_seconds)
+        return video["data"]
+
+    async def inject(endpoint: str, allow_429: bool = False) -> Optional[JSONResponse]:
+        """Sleep for the endpoint's sampled latency, then maybe return an injected error."""
+        bump(f"{endpoint}_requests")
+        await asyncio.sleep(max(0.0, config.sampler(endpoint)()))
+        if allow_429 and random.random() < config.rate_429:
+            bump(f"{endpoint}_429")
+            return _error(429, "RESOURCE_EXHAUSTED", "Resource has been exhausted (fake quota).", retry_after=1)
+        if random.random() < config.failure_rate:
+            bump(f"{endpoint}_500")
+            return _error(500, "INTERNAL", "Injected failure from fake server.")
+        return None
+
+    @app.on_event("startup")
+    async def warm_video():
+        # Render up front so the first download does not pay for moviepy + ffmpeg
+        await asyncio.get_running_loop().run_in_executor(None, video_bytes)
+
+    # --- generation -----------------------------------------------------
+    @app.post("/v1beta/models/{model}:predictLongRunning")
+    async def predict_long_running(model: str, request: Request):
+        err = await inject("submit", allow_429=True)
+        if err:
+            return err
+        body = await request.body()
+        op_id = uuid.uuid4().hex[:16]
+        name = f"models/{model}/operations/{op_id}"
+        with lock:
+            operations[op_id] = {
+                "model": model,
+                "created": time.time(),
+                "render_seconds": max(0.0, config.sampler("render")()),
+                "fail": random.random() < config.op_failure_rate,
+                "request_bytes": len(body),
+            }
+        return {"name": name}
+
+    @app.get("/v1beta/models/{model}/operations/{op_id}")
+    async def get_operation(model: str, op_id: str):
+        err = await inject("poll")
+        if err:
+            return err
+        op = operations.get(op_id)
+        if op is None:
+            return _error(404, "NOT_FOUND", f"Operation models/{model}/operations/{op_id} not found.")
+        name = f"models/{model}/operations/{op_id}"
+        elapsed = time.time() - op["created"]
+        if elapsed < op["render_seconds"]:
+            progress = int(100 * elapsed / op["render_seconds"])
+            return {"name": name, "metadata": {"progress": progress}}
+        if op["fail"]:
+            bump("operations_failed")
+            return {"name": name, "done": True, "error": {"code": 13, "message": "Injected generation failure."}}
+
+        with lock:
+            file_id = op.setdefault("file_id", uuid.uuid4().hex[:12])
+            files.setdefault(file_id, {"generated": True})
+        uri = f"{PUBLIC_HOST}/v1beta/files/{file_id}:download?alt=media"
+        return {
+            "name": name,
+            "done": True,
+            "response": {
+                "@type": "type.googleapis.com/google.ai.generativelanguage.v1beta.PredictLongRunningResponse",
+                "generateVideoResponse": {"generatedSamples": [{"video": {"uri": uri}}]},
+            },
+        }
+
+    # --- files ------------------------------------------------------------
+    @app.post("/upload/v1beta/files")
+    async def start_upload(request: Request):
+        err = await inject("upload", allow_429=True)
+        if err:
+            return err
+        try:
+            meta = (await request.json()).get("file", {})
+        except Exception:
+            meta = {}
+        upload_id = uuid.uuid4().hex
+        uploads[upload_id] = {"meta": meta, "size": 0}
+        base = str(request.base_url).rstrip("/")
+        return Response(
+            status_code=200,
+            headers={"x-goog-upload-url": f"{base}/upload/v1beta/files/sessions/{upload_id}", "x-goog-upload-status": "active"},
+        )
+
+    @app.post("/upload/v1beta/files/sessions/{upload_id}")
+    async def upload_chunk(upload_id: str, request: Request):
+        session = uploads.get(upload_id)
+        if session is None:
+            return _error(404, "NOT_FOUND", "Unknown upload session.")
+        # Drain the body in chunks without keeping it; only the size matters here
+        async for chunk in request.stream():
+            session["size"] += len(chunk)
+        command = request.headers.get("x-goog-upload-command", "")
+        if "finalize" not in command:
+            return Response(status_code=200, headers={"x-goog-upload-status": "active"})
+
+        uploads.pop(upload_id, None)
+        with lock:
+            stats["upload_bytes"] = stats.get("upload_bytes", 0) + session["size"]
+        file_id = uuid.uuid4().hex[:12]
+        files[file_id] = {"generated": False, "size": session["size"]}
+        meta = session["meta"]
+        file_obj = {
+            "name": f"files/{file_id}",
+            "displayName": meta.get("displayName"),
+            "mimeType": meta.get("mimeType", "application/octet-stream"),
+            "sizeBytes": str(session["size"]),
+            "uri": f"{PUBLIC_HOST}/v1beta/files/{file_id}",
+            "state": "ACTIVE",
+        }
+        return JSONResponse({"file": file_obj}, headers={"x-goog-upload-status": "final"})
+
+    @app.get("/v1beta/files/{file_id}:download")
+    async def download(file_id: str):
+        err = await inject("download")
+        if err:
+            return err
+        if file_id not in files:
+            return _error(404, "NOT_FOUND", f"File files/{file_id} not found.")
+        data = video_bytes()
+        with lock:
+            stats["download_bytes"] = stats.get("download_bytes", 0) + len(data)
+        return Response(content=data, media_type="video/mp4")
+
+    # --- introspection ----------------------------------------------------
+    @app.get("/_fake/stats")
+    async def fake_stats():
+        with lock:
+            return {**stats, "operations": len(operations), "files": len(files), "open_uploads": len(uploads)}
+
+    return app
+
+
+def main() -> int:
+    defaults = FakeConfig.from_env()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default=defaults.latency, help="default latency for all endpoints")
+    parser.add_argument("--submit-latency", default=defaults.submit_latency)
+    parser.add_argument("--poll-latency", default=defaults.poll_latency)
+    parser.add_argument("--upload-latency", default=defaults.upload_latency)
+    parser.add_argument("--download-latency", default=defaults.download_latency)
+    parser.add_argument("--render-time", default=defaults.render_time, help="time until an operation is done")
+    parser.add_argument("--failure-rate", type=float, default=defaults.failure_rate, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-429", type=float, default=defaults.rate_429, help="fraction of submits/uploads answered with 429")
+    parser.add_argument("--op-failure-rate", type=float, default=defaults.op_failure_rate, help="fraction of operations that finish with an error")
+    parser.add_argument("--video-file", default=defaults.video_file, help="serve this MP4 instead of a rendered clip")
+    parser.add_argument("--video-seconds", type=float, default=defaults.video_seconds)
+    args = parser.parse_args()
+
+    config = FakeConfig(**{k: v for k, v in vars(args).items() if k not in ("host", "port")})
+    for endpoint in ("submit", "poll", "upload", "download", "render"):
+        config.sampler(endpoint)  # validate specs before binding the port
+
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
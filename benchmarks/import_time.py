@@ -0,0 +1,126 @@
+"""
+Cold-start import benchmark for backend.py.
+
+Spawns fresh interpreters that import the target module, records wall-clock
+import time plus the slowest modules from ``-X importtime``, and writes the
+result as JSON. Pass --baseline to fail (exit 1) when cold start regresses.
+
+    python benchmarks/import_time.py --runs 10 --output import_time.json
+    python benchmarks/import_time.py --baseline import_time.json --max-regression 0.2
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importing must stay free of these; they are loaded on first use.
+DEFERRED_MODULES = ("google.genai", "moviepy", "numpy", "imageio", "requests")
+
+_PROBE = (
+    "import sys, time\n"
+    "t0 = time.perf_counter()\n"
+    "import {module}\n"
+    "elapsed = time.perf_counter() - t0\n"
+    "print('ELAPSED', elapsed)\n"
+    "print('LOADED', ','.join(m for m in {deferred!r} if m in sys.modules))\n"
+)
+
+
+def _run_once(module: str) -> dict:
+    code = _PROBE.format(module=module, deferred=DEFERRED_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import of {module} failed:\n{proc.stderr[-2000:]}")
+
+    elapsed, loaded = None, []
+    for line in proc.stdout.splitlines():
+        if line.startswith("ELAPSED "):
+            elapsed = float(line.split()[1])
+        elif line.startswith("LOADED "):
+            loaded = [m for m in line.split(" ", 1)[1].split(",") if m]
+
+    # "import time: self [us] | cumulative | imported package"
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, rest = line.split(":", 1)
+            self_us, cumulative_us, name = rest.split("|")
+            modules[name.strip()] = int(cumulative_us)
+        except ValueError:
+            continue
+    return {"elapsed": elapsed, "modules": modules, "deferred_loaded": loaded}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest modules to report")
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="previous JSON result to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative slowdown vs baseline")
+    args = parser.parse_args()
+
+    runs = [_run_once(args.module) for _ in range(args.runs)]
+    elapsed = sorted(r["elapsed"] for r in runs)
+
+    # median cumulative time per module across runs
+    names = set().union(*(r["modules"] for r in runs))
+    per_module = {
+        name: statistics.median(r["modules"].get(name, 0) for r in runs) / 1e6
+        for name in names
+    }
+    top = sorted(per_module.items(), key=lambda kv: kv[1], reverse=True)[: args.top]
+
+    result = {
+        "module": args.module,
+        "python": sys.version.split()[0],
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "runs": args.runs,
+        "cold_start_seconds": {
+            "median": statistics.median(elapsed),
+            "min": elapsed[0],
+            "max": elapsed[-1],
+        },
+        "slowest_modules_seconds": dict(top),
+        "deferred_modules_loaded": sorted(set().union(*(r["deferred_loaded"] for r in runs))),
+    }
+
+    status = 0
+    if result["deferred_modules_loaded"]:
+        print(f"FAIL: importing {args.module} loaded deferred modules: {result['deferred_modules_loaded']}", file=sys.stderr)
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        base = baseline["cold_start_seconds"]["median"]
+        now = result["cold_start_seconds"]["median"]
+        result["baseline_median_seconds"] = base
+        result["regression"] = (now - base) / base if base else None
+        if base and now > base * (1 + args.max_regression):
+            print(f"FAIL: cold start {now:.3f}s vs baseline {base:.3f}s (> {args.max_regression:.0%} slower)", file=sys.stderr)
+            status = 1
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Logging overhead on the polling hot path.
+
+Starts the fake Veo server, then for each logging mode runs a fresh
+interpreter that hammers helper.get_operation_status from several threads
+and reports poll throughput and latency percentiles as JSON:
+
+    sync    logging.basicConfig-style StreamHandler (the previous setup):
+            every record is written on the polling thread
+    queue   logging_setup.configure_logging(): QueueHandler + listener thread,
+            rate limiting and DEBUG sampling
+
+--sink-delay-ms simulates a slow log sink (a blocked terminal, a container
+log driver under backpressure) by sleeping on every write.
+
+    python benchmarks/logging_overhead.py --polls 2000 --threads 8 --sink-delay-ms 1
+    python benchmarks/logging_overhead.py --level DEBUG --modes sync,queue --output logging.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class SlowSink:
+    """File-like sink that counts lines and optionally sleeps on every write."""
+
+    def __init__(self, path: str, delay: float):
+        self._f = open(path, "w")
+        self.delay = delay
+        self.lines = 0
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.lines += text.count("\n")
+            return self._f.write(text)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+
+def _percentile(ordered, p):
+    return ordered[max(0, min(len(ordered) - 1, int(round(p * len(ordered) + 0.5)) - 1))]
+
+
+def run_child(args) -> dict:
+    import logging
+    sink = SlowSink(os.path.join(args.tmp, f"{args.child}.log"), args.sink_delay_ms / 1000)
+    if args.child == "sync":
+        logging.basicConfig(level=args.level, stream=sink, format="%(asctime)s %(levelname)s %(message)s")
+    else:
+        from logging_setup import configure_logging
+        configure_logging(level=args.level, stream=sink)
+
+    import helper
+    ops = [
+        helper.generate_text_to_video("logging benchmark", "veo-3.1-fast-generate-preview", "720p", "16:9", 8)["operation_name"]
+        for _ in range(args.operations)
+    ]
+    per_thread = args.polls // args.threads
+    latencies = [[] for _ in range(args.threads)]
+
+    def poller(i):
+        out = latencies[i]
+        for n in range(per_thread):
+            t0 = time.perf_counter()
+            helper.get_operation_status(ops[(i + n) % len(ops)])
+            out.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=poller, args=(i,)) for i in range(args.threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    if args.child != "sync":
+        from logging_setup import shutdown_logging
+        shutdown_logging()
+    drain = time.perf_counter() - t1
+
+    ordered = sorted(x for lat in latencies for x in lat)
+    return {
+        "mode": args.child,
+        "polls": len(ordered),
+        "wall_seconds": round(wall, 4),
+        "polls_per_second": round(len(ordered) / wall, 2),
+        "poll_latency_ms": {
+            "p50": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p95": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99": round(_percentile(ordered, 0.99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3),
+        },
+        "log_lines_written": sink.lines,
+        "drain_seconds_after_run": round(drain, 4),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="sync,queue")
+    parser.add_argument("--level", default="INFO")
+    parser.add_argument("--polls", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=8)
+    parser.add_argument("--sink-delay-ms", type=float, default=1.0)
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--tmp", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        return 0
+
+    tmp = tempfile.mkdtemp(prefix="veo_logbench_")
+    port = _free_port()
+    fake = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "fake_veo_server.py"), "--port", str(port), "--render-time", "const:3600"],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    env = {
+        **os.environ,
+        "VEO_API_BASE_URL": f"http://127.0.0.1:{port}",
+        "GEMINI_API_KEY": "fake",
+        "VEO_WORKSPACE_DIR": os.path.join(tmp, "workspace"),
+        "VEO_LOG_LEVEL": args.level,
+        "PYTHONPATH": REPO_ROOT,
+    }
+    results = []
+    try:
+        import httpx
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/_fake/stats", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, "--tmp", tmp,
+                 "--level", args.level, "--polls", str(args.polls), "--threads", str(args.threads),
+                 "--operations", str(args.operations), "--sink-delay-ms", str(args.sink_delay_ms)],
+                cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(f"mode {mode} failed:\n{proc.stderr[-2000:]}")
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+
+    result = {
+        "benchmark": "logging_overhead",
+        "python": sys.version.split()[0],
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "child", "tmp")},
+        "results": results,
+    }
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+"""
+Record/replay of the Veo client layer in helper.py.
+
+With VEO_CASSETTE_MODE=record every SDK/REST call made through the helper's
+network wrappers (one entry per attempt, so retries are captured too) is
+appended to a JSON-lines cassette as a request/response pair, together with
+its latency and, for operations.get, the time since the operation was
+submitted. Large payloads (video bytes, HTTP bodies) go to a sidecar
+``<cassette>.blobs/`` directory.
+
+Credentials never reach the cassette: query strings are dropped from recorded
+URLs, and fields/parameters named like a key or token (``key``, ``api_key``,
+``access_token``, ``Authorization``...) are replaced by ``REDACTED`` in
+requests, responses and error messages.
+
+With VEO_CASSETTE_MODE=replay the same calls are answered from the cassette
+without touching the network:
+
+- generate/upload/REST calls are served in recorded order; operations.get and
+  files.download are matched by operation name / file URI;
+- each call sleeps for its recorded latency times VEO_CASSETTE_TIME_SCALE
+  (1 = original timing, 0 = as fast as possible);
+- with a non-zero scale an operation reports the state it had at the same
+  (scaled) time after submit, so polling cadence does not change when a
+  replayed operation completes. With scale 0 states are served in order;
+- recorded errors are re-raised with the same HTTP status so retry.py makes
+  the same decisions.
+
+    VEO_CASSETTE_MODE=record VEO_CASSETTE_PATH=cassettes/run1.jsonl python -m uvicorn backend:app
+    VEO_CASSETTE_MODE=replay VEO_CASSETTE_PATH=cassettes/run1.jsonl VEO_CASSETTE_TIME_SCALE=0.1 ...
+
+Record with a single backend worker; replay never needs credentials.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import inspect
+import importlib
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger("cassette")
+
+CASSETTE_VERSION = 1
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "veo_cassette.jsonl")
+
+REDACTED = "REDACTED"
+SECRET_FIELDS = {"key", "api_key", "apikey", "access_token", "token", "authorization", "x-goog-api-key"}
+_SECRET_PARAM = re.compile(r"([?&](?:key|api_key|apikey|access_token|token)=)[^&\s'\"]+", re.IGNORECASE)
+# request bodies bigger than this (inline base64 video) go to a blob
+INLINE_BODY_LIMIT = 16 * 1024
+
+
+def _redact(value: Any) -> Any:
+    """Copy of a JSON-like value with secret-looking fields replaced"""
+    if isinstance(value, dict):
+        return {k: REDACTED if str(k).lower() in SECRET_FIELDS else _redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact(v) for v in value]
+    if isinstance(value, str):
+        return _SECRET_PARAM.sub(r"\1" + REDACTED, value)
+    return value
+
+
+def _strip_query(url: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+class CassetteMiss(RuntimeError):
+    """Replay was asked for an interaction the cassette does not contain."""
+
+
+class ReplayedError(Exception):
+    """An error recorded from the real API, raised again during replay."""
+
+    def __init__(self, error_type: str, message: str, status: Optional[int] = None):
+        self.error_type = error_type
+        self.status_code = status
+        self.code = status
+        super().__init__(f"[replayed {error_type}] {message}")
+
+
+class ReplayedTransportError(ReplayedError, ConnectionError):
+    """Recorded transport failure after the connection was established."""
+
+
+class ReplayedConnectError(ReplayedError, ConnectionRefusedError):
+    """Recorded failure to connect at all."""
+
+
+class Cassette:
+    def __init__(self, mode: str = "off", path: str = DEFAULT_PATH, time_scale: float = 1.0):
+        if mode not in ("off", "record", "replay"):
+            raise ValueError(f"VEO_CASSETTE_MODE must be off, record or replay (got '{mode}')")
+        self.mode = mode
+        self.path = os.path.abspath(path)
+        self.blob_dir = self.path + ".blobs"
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        self._t0 = time.time()
+        # operation name -> wall time it was submitted (recorded or replayed)
+        self._submitted: Dict[str, float] = {}
+        self._queues: Dict[tuple, deque] = defaultdict(deque)
+        self._states: Dict[str, list] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+        if mode == "record":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            os.makedirs(self.blob_dir, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"cassette_version": CASSETTE_VERSION, "recorded_at": self._t0}) + "\n")
+            logger.info("cassette: recording to %s", self.path)
+        elif mode == "replay":
+            self._load()
+            logger.info("cassette: replaying %s (time scale %.3g)", self.path, time_scale)
+
+    @classmethod
+    def from_env(cls) -> "Cassette":
+        return cls(
+            mode=os.getenv("VEO_CASSETTE_MODE", "off").lower(),
+            path=os.getenv("VEO_CASSETTE_PATH", DEFAULT_PATH),
+            time_scale=float(os.getenv("VEO_CASSETTE_TIME_SCALE", "1")),
+        )
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    # ------------------------------------------------------------------
+    # ENCODING
+    # ------------------------------------------------------------------
+    def _put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.blob_dir, digest)
+        if not os.path.exists(path):
+            with open(path + ".partial", "wb") as f:
+                f.write(data)
+            os.replace(path + ".partial", path)
+        return digest
+
+    def _get_blob(self, digest: str) -> bytes:
+        with open(os.path.join(self.blob_dir, digest), "rb") as f:
+            return f.read()
+
+    def _encode(self, value: Any) -> Dict[str, Any]:
+        if value is None or isinstance(value, (str, int, float, bool, list, dict)):
+            return {"kind": "json", "data": _redact(value)}
+        if isinstance(value, (bytes, bytearray)):
+            return {"kind": "bytes", "blob": self._put_blob(bytes(value))}
+        if hasattr(value, "model_dump"):
+            cls = type(value)
+            return {
+                "kind": "model",
+                "class": f"{cls.__module__}:{cls.__qualname__}",
+                "data": _redact(value.model_dump(mode="json", exclude_none=True)),
+            }
+        if hasattr(value, "status_code") and hasattr(value, "content"):
+            return {
+                "kind": "http_response",
+                "status": value.status_code,
+                "headers": _redact(dict(value.headers)),
+                "url": _strip_query(str(getattr(value, "url", "") or "")),
+                "blob": self._put_blob(value.content or b""),
+            }
+        logger.warning("cassette: cannot encode %s, storing repr", type(value).__name__)
+        return {"kind": "json", "data": repr(value)}
+
+    def _decode(self, encoded: Dict[str, Any]) -> Any:
+        kind = encoded["kind"]
+        if kind == "json":
+            return encoded["data"]
+        if kind == "bytes":
+            return self._get_blob(encoded["blob"])
+        if kind == "model":
+            module, _, qualname = encoded["class"].partition(":")
+            cls = importlib.import_module(module)
+            for part in qualname.split("."):
+                cls = getattr(cls, part)
+            return cls.model_validate(encoded["data"])
+        if kind == "http_response":
+            import requests
+            resp = requests.Response()
+            resp.status_code = encoded["status"]
+            resp.headers.update(encoded["headers"])
+            resp.url = encoded.get("url", "")
+            resp._content = self._get_blob(encoded["blob"])
+            return resp
+        raise CassetteMiss(f"unknown cassette value kind '{kind}'")
+
+    def _encode_arg(self, value: Any) -> Any:
+        """JSON form of one call argument; never reads streams (the real call still needs them)"""
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        if isinstance(value, (list, tuple)):
+            return [self._encode_arg(v) for v in value]
+        if isinstance(value, dict):
+            return {str(k): self._encode_arg(v) for k, v in value.items()}
+        if isinstance(value, (bytes, bytearray)):
+            return {"blob": self._put_blob(bytes(value))}
+        if hasattr(value, "read"):
+            return {"stream": os.path.basename(str(getattr(value, "name", "")))}
+        if hasattr(value, "model_dump"):
+            return value.model_dump(mode="json", exclude_none=True)
+        return repr(value)
+
+    def _encode_request(self, op: str, fn: Callable[..., Any], key: Optional[str], args, kwargs) -> Dict[str, Any]:
+        """Method, path and body of one call, without query strings or credentials"""
+        args = list(args)
+        url = kwargs.get("url") or (args[0] if args and isinstance(args[0], str) and "://" in args[0] else None)
+        if url is not None:
+            # requests.post(url, params=..., headers=..., data=...)
+            if args and args[0] is url:
+                args.pop(0)
+            method = getattr(fn, "__name__", "request").upper()
+            path = urlsplit(url).path
+            body = kwargs.get("json", kwargs.get("data"))
+            if isinstance(body, (bytes, bytearray)):
+                body = bytes(body).decode("utf-8", "replace")
+            if isinstance(body, str):
+                try:
+                    body = json.loads(body)
+                except ValueError:
+                    pass
+        else:
+            # SDK call: the op is the method, the operation name / file URI the path
+            method, path = op, key
+            body = dict(kwargs)
+            if args:
+                body["args"] = list(args)
+        request: Dict[str, Any] = {"method": method, "path": path}
+        body = _redact(self._encode_arg(body))
+        encoded = json.dumps(body, default=str)
+        if len(encoded) > INLINE_BODY_LIMIT:
+            request["body_blob"] = self._put_blob(encoded.encode("utf-8"))
+        else:
+            request["body"] = body
+        return request
+
+    @staticmethod
+    def _encode_error(exc: BaseException) -> Dict[str, Any]:
+        from retry import status_of, _is_connect_error, _is_transient_transport
+        return {
+            "type": type(exc).__name__,
+            "message": _redact(str(exc)[:2000]),
+            "status": status_of(exc),
+            "connect": _is_connect_error(exc),
+            "transport": _is_transient_transport(exc),
+        }
+
+    @staticmethod
+    def _decode_error(error: Dict[str, Any]) -> ReplayedError:
+        cls = ReplayedError
+        if error.get("connect"):
+            cls = ReplayedConnectError
+        elif error.get("transport"):
+            cls = ReplayedTransportError
+        return cls(error["type"], error["message"], error.get("status"))
+
+    # ------------------------------------------------------------------
+    # RECORD
+    # ------------------------------------------------------------------
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+            self.stats["recorded"] += 1
+
+    def _record(self, op: str, key: Optional[str], fn: Callable[..., Any], args, kwargs) -> Any:
+        started = time.time()
+        entry: Dict[str, Any] = {"op": op, "key": key, "t": round(started - self._t0, 4)}
+        entry["request"] = self._encode_request(op, fn, key, args, kwargs)
+        if op == "operations.get" and key in self._submitted:
+            entry["since_submit"] = round(started - self._submitted[key], 4)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            entry["latency"] = round(time.time() - started, 4)
+            entry["error"] = self._encode_error(e)
+            self._append(entry)
+            raise
+        entry["latency"] = round(time.time() - started, 4)
+        entry["result"] = self._encode(result)
+        submitted = self._submitted_name(op, result)
+        if submitted:
+            self._submitted[submitted] = time.time()
+            entry["submitted"] = submitted
+        self._append(entry)
+        return result
+
+    @staticmethod
+    def _submitted_name(op: str, result: Any) -> Optional[str]:
+        if op not in ("models.generate_videos", "rest.predictLongRunning"):
+            return None
+        name = getattr(result, "name", None)
+        if name is None and hasattr(result, "json") and getattr(result, "status_code", 0) < 400:
+            try:
+                name = result.json().get("name")
+            except Exception:
+                name = None
+        return name if isinstance(name, str) else None
+
+    # ------------------------------------------------------------------
+    # REPLAY
+    # ------------------------------------------------------------------
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            raise CassetteMiss(f"cassette {self.path} does not exist")
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "cassette_version" in entry:
+                    continue
+                if entry["op"] == "operations.get" and entry.get("key"):
+                    self._states[entry["key"]].append(entry)
+                else:
+                    self._queues[(entry["op"], entry.get("key"))].append(entry)
+
+    def _next_state(self, key: str) -> Optional[Dict[str, Any]]:
+        states = self._states.get(key)
+        if not states:
+            return None
+        submitted = self._submitted.get(key)
+        if self.time_scale > 0 and submitted is not None and all("since_submit" in s for s in states):
+            elapsed = (time.time() - submitted) / self.time_scale
+            chosen = states[0]
+            for state in states:
+                if state["since_submit"] <= elapsed:
+                    chosen = state
+            return chosen
+        index = min(self._cursor[key], len(states) - 1)
+        self._cursor[key] += 1
+        return states[index]
+
+    def _replay(self, op: str, key: Optional[str]) -> Any:
+        with self._lock:
+            if op == "operations.get" and key:
+                entry = self._next_state(key)
+            else:
+                queue = self._queues.get((op, key)) or self._queues.get((op, None))
+                entry = queue.popleft() if queue else None
+            if entry is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["replayed"] += 1
+        if entry is None:
+            raise CassetteMiss(f"cassette {self.path} has no recorded '{op}' for key {key!r}")
+
+        delay = entry.get("latency", 0) * self.time_scale
+        if delay > 0:
+            time.sleep(delay)
+        if "error" in entry:
+            raise self._decode_error(entry["error"])
+        if entry.get("submitted"):
+            with self._lock:
+                self._submitted[entry["submitted"]] = time.time()
+        return self._decode(entry["result"])
+
+    # ------------------------------------------------------------------
+    # WRAPPING
+    # ------------------------------------------------------------------
+    def wrap(self, op: str, fn: Callable[..., Any], key: Optional[str] = None) -> Callable[..., Any]:
+        """Return `fn` unchanged when off, or a recording / replaying stand-in for it."""
+        if self.mode == "off":
+            return fn
+        try:
+            signature = inspect.signature(fn)
+        except (TypeError, ValueError):
+            signature = None
+
+        def call(*args, **kwargs):
+            # helper.py probes SDK signatures by trial; a call the real function would reject
+            # raises TypeError here in both modes and is never recorded.
+            if signature is not None:
+                signature.bind(*args, **kwargs)
+            if self.mode == "record":
+                return self._record(op, key, fn, args, kwargs)
+            return self._replay(op, key)
+        return call
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, "time_scale": self.time_scale, **self.stats}
+
+
+cassette = Cassette.from_env()
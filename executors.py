@@ -0,0 +1,213 @@
+"""
+Bulkheaded thread pools for the Veo backend.
+
+Blocking work used to share Starlette's default threadpool, so a handful of
+slow downloads or stitches could starve /status. Each class of work now runs on
+its own bounded pool:
+
+    control    status polls, submissions, operation lookups   VEO_CONTROL_WORKERS  (16)
+    transfer   video downloads, large uploads, disk writes    VEO_TRANSFER_WORKERS (8)
+    media      stitching and other moviepy/ffmpeg work       VEO_MEDIA_WORKERS    (CPU count / 2)
+
+    result = await control.run(get_operation_status, operation_name)
+
+Context variables (trace, workspace job scope) are carried into the worker
+thread. Every pool exports its size, busy workers, queued tasks, queue wait
+and task outcomes through metrics.py.
+
+Admission control: once a pool holds VEO_<POOL>_MAX_PENDING tasks (running +
+queued; 0 disables) new work is rejected immediately with ``Overloaded``,
+an HTTPException carrying a Retry-After computed from the backlog and the
+pool's recent task duration. Submissions (control) are rejected with 429,
+transfer and media work with 503.
+
+Only work entering the service is admitted: ``run()`` (or the shed_load
+middleware calling ``admit()``) at request entry. Lookups, follow-up steps and
+cleanup inside a request that was already admitted use ``run_admitted()``,
+so a request is never shed half-way, e.g. after its stitch has finished:
+
+    data = await transfer.run(download_video_bytes, name)          # may raise Overloaded
+    await control.run_admitted(shared_state.delete_blob, base_key)  # never sheds
+"""
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, TypeVar
+
+from fastapi import HTTPException
+
+import metrics
+
+logger = logging.getLogger("executors")
+
+T = TypeVar("T")
+
+BULKHEAD_WAIT_SECONDS = metrics.histogram(
+    "veo_bulkhead_queue_wait_seconds", "Time a task waited for a free worker, per pool", ["pool"])
+BULKHEAD_RUN_SECONDS = metrics.histogram(
+    "veo_bulkhead_run_seconds", "Time a task ran on a worker, per pool", ["pool"])
+BULKHEAD_TASKS = metrics.counter(
+    "veo_bulkhead_tasks_total", "Tasks finished per pool and outcome", ["pool", "outcome"])
+BULKHEAD_REJECTED = metrics.counter(
+    "veo_bulkhead_rejected_total", "Requests shed because a pool was at its high-water mark", ["pool"])
+
+MAX_RETRY_AFTER = 300
+
+
+class Overloaded(HTTPException):
+    """A pool is at its high-water mark; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, pool: str, status_code: int, retry_after: int):
+        self.pool = pool
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=status_code,
+            detail=f"Server busy ({pool} pool is full), retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class Bulkhead:
+    """A named, fixed-size thread pool that keeps track of how busy it is."""
+
+    def __init__(self, name: str, max_workers: int, max_pending: int = 0, reject_status: int = 503):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self.reject_status = reject_status
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"veo-{name}")
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        # moving average of task run time, used to estimate Retry-After
+        self.avg_seconds = 1.0
+
+    def _on_done(self, future) -> None:
+        # a task cancelled before it started never reaches _call
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+            BULKHEAD_TASKS.inc(pool=self.name, outcome="cancelled")
+
+    def _call(self, submitted: float, fn: Callable[..., T]) -> T:
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        BULKHEAD_WAIT_SECONDS.observe(started - submitted, pool=self.name)
+        outcome = "error"
+        try:
+            result = fn()
+            outcome = "ok"
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.active -= 1
+                self.avg_seconds += 0.2 * (elapsed - self.avg_seconds)
+            BULKHEAD_RUN_SECONDS.observe(elapsed, pool=self.name)
+            BULKHEAD_TASKS.inc(pool=self.name, outcome=outcome)
+
+    def retry_after(self) -> int:
+        """Seconds until the backlog ahead of a new task should have drained."""
+        with self._lock:
+            backlog = self.active + self.queued - self.max_workers + 1
+            seconds = max(1, backlog) * self.avg_seconds / self.max_workers
+        return int(min(MAX_RETRY_AFTER, max(1, math.ceil(seconds))))
+
+    def _full(self) -> bool:
+        return bool(self.max_pending) and self.active + self.queued >= self.max_pending
+
+    def admit(self) -> None:
+        """Raise Overloaded if the pool is at its high-water mark (call before accepting work)."""
+        if self._full():
+            BULKHEAD_REJECTED.inc(pool=self.name)
+            retry_after = self.retry_after()
+            logger.warning("%s pool full (%d pending), shedding request; Retry-After %ds",
+                           self.name, self.active + self.queued, retry_after)
+            raise Overloaded(self.name, self.reject_status, retry_after)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Admit new work and run it on this pool; raises Overloaded when full."""
+        self.admit()
+        return await self.run_admitted(fn, *args, **kwargs)
+
+    async def run_admitted(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking callable on this pool and await its result, without admission control."""
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, fn, *args, **kwargs)
+        with self._lock:
+            self.queued += 1
+        future = self._executor.submit(self._call, time.perf_counter(), call)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    @property
+    def saturation(self) -> float:
+        """Busy plus queued tasks relative to the number of workers (1.0 = every worker busy)."""
+        return (self.active + self.queued) / self.max_workers
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            active, queued = self.active, self.queued
+        return {"workers": self.max_workers, "active": active, "queued": queued,
+                "saturation": round((active + queued) / self.max_workers, 3),
+                "max_pending": self.max_pending, "full": self._full(),
+                "avg_task_seconds": round(self.avg_seconds, 3), "retry_after": self.retry_after()}
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _workers(env: str, default: int) -> int:
+    return int(os.getenv(env, str(default)))
+
+
+def _bulkhead(name: str, default_workers: int, reject_status: int) -> Bulkhead:
+    workers = _workers(f"VEO_{name.upper()}_WORKERS", default_workers)
+    return Bulkhead(
+        name,
+        workers,
+        max_pending=_workers(f"VEO_{name.upper()}_MAX_PENDING", 4 * workers),
+        reject_status=reject_status,
+    )
+
+
+control = _bulkhead("control", 16, reject_status=429)
+transfer = _bulkhead("transfer", 8, reject_status=503)
+media = _bulkhead("media", max(1, (os.cpu_count() or 2) // 2), reject_status=503)
+
+POOLS: Dict[str, Bulkhead] = {pool.name: pool for pool in (control, transfer, media)}
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.snapshot() for name, pool in POOLS.items()}
+
+
+def shutdown(wait: bool = False) -> None:
+    for pool in POOLS.values():
+        pool.shutdown(wait=wait)
+
+
+def _collect_pool_metrics():
+    families: Dict[str, List] = {"workers": [], "active": [], "queued": [], "saturation": []}
+    for name, state in snapshot().items():
+        for key in families:
+            families[key].append((f"veo_bulkhead_{key}", {"pool": name}, state[key]))
+    helps = {
+        "workers": "Configured worker threads per pool",
+        "active": "Tasks currently running per pool",
+        "queued": "Tasks waiting for a free worker per pool",
+        "saturation": "(active + queued) / workers per pool",
+    }
+    for key, samples in families.items():
+        yield f"veo_bulkhead_{key}", "gauge", helps[key], samples
+
+
+metrics.register_collector(_collect_pool_metrics)
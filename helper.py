@@ -3,36 +3,78 @@ import json
 import time
 import base64
 import logging
-import requests
 import uuid
-import io
 import inspect
 import mimetypes
+import mmap
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple, Union
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
-# Try importing moviepy, handle if missing
-try:
-    from moviepy import VideoFileClip, concatenate_videoclips
-    MOVIEPY_AVAILABLE = True
-except ImportError:
-    MOVIEPY_AVAILABLE = False
+from workspace import workspace
+from retry import call_with_retry, is_retryable, RetryableStatus, RETRYABLE_STATUS, status_of
+from cassette import cassette, ReplayedError
+from tracing import traced, span
+from metrics import (
+    API_CALL_SECONDS, API_ERRORS, RATE_LIMITED,
+    DOWNLOAD_SECONDS, DOWNLOAD_BYTES, STITCH_SECONDS, UPLOAD_ATTEMPTS,
+)
 
 load_dotenv()
 logger = logging.getLogger("helper")
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
-# Lazy import of the Google GenAI SDK
-try:
-    import google.genai as genai
-    from google.genai import types
-except Exception:
-    genai, types = None, None
+# Override to point both the SDK client and the REST fallbacks at another endpoint,
+# e.g. benchmarks/fake_veo_server.py for offline load tests.
+API_BASE_URL = os.getenv("VEO_API_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+
+# Heavy dependencies (google.genai ~0.6s, moviepy + numpy/imageio ~0.2s, requests ~0.1s)
+# are imported on first use so that importing this module -- and therefore backend.py
+# startup and every --reload -- does not pay for them. Logging is configured by the app.
+genai, types = None, None
+_genai_loaded = False
+_moviepy = None
+_moviepy_loaded = False
 
 _client = None
 
+def _load_genai():
+    """Import the Google GenAI SDK on first use. Returns the module, or None if not installed."""
+    global genai, types, _genai_loaded
+    if not _genai_loaded:
+        try:
+            import google.genai as _genai
+            from google.genai import types as _types
+            genai, types = _genai, _types
+        except Exception:
+            genai, types = None, None
+        _genai_loaded = True
+    return genai
+
+def _load_moviepy():
+    """Import moviepy on first use. Returns the module, or None if not installed."""
+    global _moviepy, _moviepy_loaded
+    if not _moviepy_loaded:
+        try:
+            import moviepy
+            _moviepy = moviepy
+        except ImportError:
+            _moviepy = None
+        _moviepy_loaded = True
+    return _moviepy
+
+class RestRequestError(RuntimeError):
+    pass
+
+# Media inputs may be passed as raw bytes or as a path to a file on disk
+# (e.g. an upload spooled by backend.py). Paths are memory-mapped rather than read.
+MediaSource = Union[bytes, str, os.PathLike]
+
+def _replay_api_key() -> Optional[str]:
+    # Replayed calls never reach the network, so any key will do
+    return "cassette-replay" if cassette.replaying else None
+
 # --------------------------------------------------------------
 # CLIENT CREATION
 # --------------------------------------------------------------
@@ -41,15 +83,17 @@ def create_genai_client():
     global _client
     if _client:
         return _client
-    if genai is None:
+    if _load_genai() is None:
         raise RuntimeError("google-genai SDK not installed. Install via: pip install google-genai")
 
-    api_key = os.getenv("GEMINI_API_KEY")
+    api_key = os.getenv("GEMINI_API_KEY") or _replay_api_key()
     project = os.getenv("GOOGLE_CLOUD_PROJECT")
     location = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
 
     try:
-        if api_key:
+        if api_key and os.getenv("VEO_API_BASE_URL"):
+            _client = genai.Client(api_key=api_key, http_options=types.HttpOptions(base_url=API_BASE_URL))
+        elif api_key:
             _client = genai.Client(api_key=api_key)
         elif project:
             _client = genai.Client(vertexai=True, project=project, location=location)
@@ -58,22 +102,79 @@ def create_genai_client():
     except Exception as e:
         raise RuntimeError(f"Failed to create GenAI client: {e}")
 
-    # optional: log available client.files API shapes for debugging once
-    try:
-        files_obj = getattr(_client, "files", None)
-        if files_obj is not None:
-            logger.info("create_genai_client: client.files available, dir: %s", dir(files_obj))
-            upload_fn = getattr(files_obj, "upload", None)
-            if upload_fn:
-                try:
-                    logger.info("create_genai_client: upload signature: %s", inspect.signature(upload_fn))
-                except Exception:
-                    logger.info("create_genai_client: could not inspect upload signature")
-    except Exception:
-        pass
-
     return _client
 
+# --------------------------------------------------------------
+# NETWORK CALLS (every call goes through retry.call_with_retry, and through the
+# cassette so VEO_CASSETTE_MODE=record/replay can capture or serve them)
+# --------------------------------------------------------------
+def _instrumented(op: str, fn, key: Optional[str] = None):
+    """Wrap one API attempt with the cassette, a tracing span and per-attempt latency/error metrics."""
+    fn = cassette.wrap(op, fn, key=key)
+
+    def call(*args, **kwargs):
+        start = time.perf_counter()
+        status = None
+        try:
+            with span(f"api.{op}"):
+                result = fn(*args, **kwargs)
+            code = getattr(result, "status_code", None)  # REST responses are returned, not raised
+            if isinstance(code, int) and code >= 400:
+                status = code
+            return result
+        except TypeError:
+            raise  # signature probing in upload_file, not an API attempt
+        except Exception as e:
+            status = status_of(e) or "transport"
+            raise
+        finally:
+            API_CALL_SECONDS.observe(time.perf_counter() - start, op=op)
+            if status is not None:
+                API_ERRORS.inc(op=op, status=str(status))
+                if status == 429:
+                    RATE_LIMITED.inc(op=op)
+    return call
+
+def _generate_videos(client, **kwargs):
+    # Starts a paid generation, so it is only retried when the request was provably not processed
+    fn = _instrumented("models.generate_videos", client.models.generate_videos)
+    return call_with_retry(fn, op="models.generate_videos", idempotent=False, **kwargs)
+
+def _get_operation(client, *args, **kwargs):
+    target = args[0] if args else kwargs.get("operation", kwargs.get("name"))
+    fn = _instrumented("operations.get", client.operations.get, key=get_operation_name(target))
+    return call_with_retry(fn, *args, op="operations.get", **kwargs)
+
+def _download_file(client, *args, **kwargs):
+    target = args[0] if args else kwargs.get("file")
+    key = getattr(target, "uri", None) or getattr(target, "name", None) or (target if isinstance(target, str) else None)
+    fn = _instrumented("files.download", client.files.download, key=key)
+    return call_with_retry(fn, *args, op="files.download", **kwargs)
+
+def _predict_url(model: str) -> str:
+    return f"{API_BASE_URL}/v1beta/models/{model}:predictLongRunning"
+
+def _rest_post(url: str, **kwargs) -> "requests.Response":
+    """
+    POST to a :predictLongRunning endpoint. A final retryable response is returned, not raised;
+    transport failures surface as RestRequestError.
+    """
+    import requests
+
+    post = _instrumented("rest.predictLongRunning", requests.post)
+
+    def attempt():
+        resp = post(url, **kwargs)
+        if resp.status_code in RETRYABLE_STATUS:
+            raise RetryableStatus(resp)
+        return resp
+    try:
+        return call_with_retry(attempt, op="rest.predictLongRunning", idempotent=False)
+    except RetryableStatus as e:
+        return e.response
+    except (requests.RequestException, ReplayedError) as e:
+        raise RestRequestError(str(e)) from e
+
 # --------------------------------------------------------------
 # UTILITY: SAFELY EXTRACT OPERATION NAME
 # --------------------------------------------------------------
@@ -83,23 +184,64 @@ def get_operation_name(op) -> str:
       - an operation object (with .name), or
       - a plain string (operation name), or
       - some other wrapper.
-    Also logs the returned type for debugging.
+    Logs the returned type at DEBUG.
     """
     try:
         if isinstance(op, str):
-            logger.info(f"get_operation_name: received str -> {op}")
+            logger.debug("get_operation_name: received str -> %s", op)
             return op
         if hasattr(op, "name"):
             name = getattr(op, "name")
-            logger.info(f"get_operation_name: object with .name -> {name} (type: {type(op)})")
+            logger.debug("get_operation_name: object with .name -> %s (type: %s)", name, type(op).__name__)
             return name
         s = str(op)
-        logger.info(f"get_operation_name: fallback str(op) -> {s} (type: {type(op)})")
+        logger.debug("get_operation_name: fallback str(op) -> %s (type: %s)", s, type(op).__name__)
         return s
     except Exception as e:
         logger.exception("get_operation_name error, falling back to str(op)")
         return str(op)
 
+# --------------------------------------------------------------
+# UTILITY: media buffers
+# --------------------------------------------------------------
+def _is_path(source: Any) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+@contextmanager
+def _media_buffer(source: MediaSource):
+    """
+    Yield a read-only bytes-like view of `source`.
+    Bytes are yielded as-is; file paths are memory-mapped so the kernel pages
+    them in on demand instead of us copying the whole file into the heap.
+    """
+    if not _is_path(source):
+        yield source
+        return
+    with open(source, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+def _sniff_image_mime(buf) -> str:
+    mime_type = "image/jpeg"
+    try:
+        if bytes(buf[:8]).startswith(b"\x89PNG\r\n\x1a\n"):
+            mime_type = "image/png"
+        elif bytes(buf[:2]) == b"\xff\xd8":
+            mime_type = "image/jpeg"
+        elif bytes(buf[:4]) == b"RIFF":
+            mime_type = "image/webp"
+    except Exception:
+        pass
+    return mime_type
+
+def _b64_media(source: MediaSource) -> Tuple[str, str]:
+    """Return (base64 string, sniffed image mime type) for bytes or a file path."""
+    with _media_buffer(source) as buf:
+        return base64.b64encode(buf).decode("ascii"), _sniff_image_mime(buf)
+
 # --------------------------------------------------------------
 # UTILITY: guess mime type
 # --------------------------------------------------------------
@@ -120,14 +262,7 @@ def _guess_mime_type(path: str, fallback_image: str = "image/jpeg") -> str:
 class UploadFileError(RuntimeError):
     pass
 
-# Replace existing upload_file with this function in helper.py
-import io
-import inspect
-from typing import Any
-
-class UploadFileError(RuntimeError):
-    pass
-
+@traced()
 def upload_file(client, local_path: str, *, debug_log_signature: bool = True) -> Any:
     """
     Adaptive uploader tuned for the google.genai SDK variant observed in logs.
@@ -135,14 +270,12 @@ def upload_file(client, local_path: str, *, debug_log_signature: bool = True) ->
     """
     logger.info("upload_file: attempting upload for %s", local_path)
 
-    # Read file bytes
     try:
-        with open(local_path, "rb") as fh:
-            data = fh.read()
+        size = os.path.getsize(local_path)
     except Exception as e:
         raise UploadFileError(f"Failed to open local file '{local_path}': {e}")
 
-    if not data:
+    if not size:
         raise UploadFileError("upload_file: file is empty")
 
     basename = os.path.basename(local_path)
@@ -160,31 +293,30 @@ def upload_file(client, local_path: str, *, debug_log_signature: bool = True) ->
     try:
         if upload_fn is not None:
             sig = inspect.signature(upload_fn)
-            logger.info("upload_file: detected upload signature: %s", sig)
+            logger.debug("upload_file: detected upload signature: %s", sig)
             param_names = [p for p in sig.parameters.keys() if p not in ("self", "cls")]
-            logger.info("upload_file: upload parameter names: %s", param_names)
+            logger.debug("upload_file: upload parameter names: %s", param_names)
         else:
             param_names = []
     except Exception:
-        logger.info("upload_file: could not inspect upload signature")
+        logger.debug("upload_file: could not inspect upload signature")
         param_names = []
 
-    # 1) Preferred: upload(file=BytesIO(...), config={"mime_type": mime_type})
+    # Candidate call shapes, most likely first: (strategy metric label, description, fn, kwargs).
+    # kwargs=None means the local path is passed positionally instead of streaming the file.
+    candidates = []
+
+    # 1) Preferred: upload(file=<stream>, config={"mime_type": mime_type})
     if upload_fn is not None and "file" in param_names:
-        # try typed config if available, but only with accepted fields (mime_type / display_name)
-        tried_cfgs = []
         # candidate configs to try (dicts or typed objects)
         cfg_candidates = []
-        try:
-            # prefer typed UploadFileConfig if available and accepts mime_type
-            if types and hasattr(types, "UploadFileConfig"):
-                try:
-                    cfg_candidates.append(types.UploadFileConfig(mime_type=mime_type))
-                except Exception:
-                    # typed attempt failed; we'll try dict forms below
-                    pass
-        except Exception:
-            pass
+        # prefer typed UploadFileConfig if available and accepts mime_type
+        if types and hasattr(types, "UploadFileConfig"):
+            try:
+                cfg_candidates.append(types.UploadFileConfig(mime_type=mime_type))
+            except Exception:
+                # typed attempt failed; we'll try dict forms below
+                pass
 
         # dict forms: mime_type only; mime_type + display_name
         cfg_candidates.append({"mime_type": mime_type})
@@ -192,81 +324,65 @@ def upload_file(client, local_path: str, *, debug_log_signature: bool = True) ->
         # also try a variant using 'mimeType' if some SDKs expect camelCase
         cfg_candidates.append({"mimeType": mime_type})
         cfg_candidates.append({"mime_type": mime_type, "name": basename})
-
         for cfg in cfg_candidates:
-            try:
-                logger.info("upload_file: trying upload(file=BytesIO(...), config=%s)", type(cfg) if not isinstance(cfg, dict) else cfg)
-                result = upload_fn(file=io.BytesIO(data), config=cfg)
-                logger.info("upload_file: success via upload(file=..., config=...) -> %s", type(result))
-                return result
-            except Exception as e:
-                last_exc = e
-                logger.info("upload_file: upload(file=..., config=%s) failed: %s", cfg, e)
+            candidates.append(("upload_config", "upload(file=..., config=...)", upload_fn, {"config": cfg}))
 
-        # try upload(file=BytesIO(data), mime_type=...) if SDK unexpectedly accepts direct mime_type kw
-        try:
-            logger.info("upload_file: trying upload(file=BytesIO(data), mime_type=%s) as alternate", mime_type)
-            result = upload_fn(file=io.BytesIO(data), mime_type=mime_type)  # may raise TypeError
-            logger.info("upload_file: success via upload(file=..., mime_type=...) -> %s", type(result))
-            return result
-        except Exception as e:
-            last_exc = e
-            logger.info("upload_file: upload(file=..., mime_type=...) failed: %s", e)
+        # upload(file=<stream>, mime_type=...) if SDK unexpectedly accepts direct mime_type kw
+        candidates.append(("upload_mime_type", "upload(file=..., mime_type=...)", upload_fn, {"mime_type": mime_type}))
 
-    # 2) Try upload(file=BytesIO(data)) without config — sometimes SDK can infer if bytes have a header and type
-    if upload_fn is not None and "file" in param_names:
-        try:
-            logger.info("upload_file: trying upload(file=BytesIO(data)) without config")
-            result = upload_fn(file=io.BytesIO(data))
-            logger.info("upload_file: success via upload(file=...) -> %s", type(result))
-            return result
-        except Exception as e:
-            last_exc = e
-            logger.info("upload_file: upload(file=...) failed: %s", e)
+        # 2) upload(file=<stream>) without config — sometimes SDK can infer if bytes have a header and type
+        candidates.append(("upload_bare", "upload(file=...)", upload_fn, {}))
 
-    # 3) Try client.files.create(...) with config variants
+    # 3) client.files.create(...) with config variants
     if create_fn is not None:
         cfg_candidates = []
-        try:
-            if types and hasattr(types, "UploadFileConfig"):
-                try:
-                    cfg_candidates.append(types.UploadFileConfig(mime_type=mime_type))
-                except Exception:
-                    pass
-        except Exception:
-            pass
+        if types and hasattr(types, "UploadFileConfig"):
+            try:
+                cfg_candidates.append(types.UploadFileConfig(mime_type=mime_type))
+            except Exception:
+                pass
         cfg_candidates.extend([{"mime_type": mime_type}, {"mime_type": mime_type, "display_name": basename}])
-
         for cfg in cfg_candidates:
-            try:
-                logger.info("upload_file: trying create(file=BytesIO(data), config=%s)", cfg)
-                result = create_fn(file=io.BytesIO(data), config=cfg)
-                logger.info("upload_file: success via files.create -> %s", type(result))
-                return result
-            except Exception as e:
-                last_exc = e
-                logger.info("upload_file: files.create(file=..., config=%s) failed: %s", cfg, e)
+            candidates.append(("create_config", "files.create(file=..., config=...)", create_fn, {"config": cfg}))
+
+        # fallback: create(file=<stream>, filename=...) if some variants accept that
+        candidates.append(("create_filename", "files.create(file=..., filename=...)", create_fn, {"filename": basename}))
+
+    # 4) As last resort the positional path (some SDKs accept local path)
+    if upload_fn is not None:
+        candidates.append(("positional", "upload(local_path)", upload_fn, None))
 
-        # fallback: try create(file=BytesIO(data), filename=...) if some variants accept that
+    for strategy, desc, fn, kwargs in candidates:
+        fn = _instrumented("files.upload", fn)
+
+        def attempt(fn=fn, kwargs=kwargs):
+            if kwargs is None:
+                return fn(local_path)
+            # Stream from disk on every attempt instead of buffering the whole file
+            with open(local_path, "rb") as fh:
+                return fn(file=fh, **kwargs)
+
+        logger.debug("upload_file: trying %s with %s", desc, kwargs)
         try:
-            logger.info("upload_file: trying create(file=BytesIO(data), filename=%s)", basename)
-            result = create_fn(file=io.BytesIO(data), filename=basename)
-            logger.info("upload_file: success via files.create(filename) -> %s", type(result))
-            return result
+            # Probe each shape once: a TypeError or a rejected request just moves on to the next
+            result = attempt()
         except Exception as e:
-            last_exc = e
-            logger.info("upload_file: files.create(file=..., filename=...) failed: %s", e)
-
-    # 4) As last resort try positional path (some SDKs accept local path)
-    try:
-        if upload_fn is not None:
-            logger.info("upload_file: trying positional path call upload(local_path) as last resort")
-            result = upload_fn(local_path)
-            logger.info("upload_file: success via positional path -> %s", type(result))
-            return result
-    except Exception as e:
-        last_exc = e
-        logger.info("upload_file: positional path attempt failed: %s", e)
+            if not is_retryable(e, idempotent=True):
+                UPLOAD_ATTEMPTS.inc(strategy=strategy, outcome="failed")
+                last_exc = e
+                logger.debug("upload_file: %s failed: %s", desc, e)
+                continue
+            # The SDK accepted this shape and the failure was transient, so retry this strategy
+            # only (repeating an upload at worst leaves an orphaned file that expires server-side)
+            logger.info("upload_file: %s failed transiently (%s); retrying it", desc, e)
+            try:
+                result = call_with_retry(attempt, op="files.upload")
+            except Exception as e2:
+                UPLOAD_ATTEMPTS.inc(strategy=strategy, outcome="failed")
+                raise UploadFileError(f"upload_file: {desc} failed after retries: {e2!r}") from e2
+        UPLOAD_ATTEMPTS.inc(strategy=strategy, outcome="ok")
+        logger.info("upload_file: success via %s -> %s", desc, type(result))
+        return result
 
     # Nothing worked
     sdk_info = {}
@@ -287,24 +403,27 @@ def upload_file(client, local_path: str, *, debug_log_signature: bool = True) ->
 # --------------------------------------------------------------
 # GENERATION HELPERS
 # --------------------------------------------------------------
+@traced()
 def generate_text_to_video(prompt: str, model: str, resolution: str, aspect_ratio: str, duration_seconds: int) -> Dict[str, Any]:
     client = create_genai_client()
-    logger.info(f"Starting text-to-video with model={model}")
+    logger.info("Starting text-to-video with model=%s", model)
     # defensive config creation
     try:
         cfg = types.GenerateVideosConfig(resolution=resolution, aspect_ratio=aspect_ratio, duration_seconds=str(duration_seconds))
     except Exception:
         cfg = {"resolution": resolution, "aspect_ratio": aspect_ratio, "duration_seconds": str(duration_seconds)}
-    op = client.models.generate_videos(model=model, prompt=prompt, config=cfg)
-    logger.info(f"generate_videos returned: type={type(op)} value={op}")
+    op = _generate_videos(client, model=model, prompt=prompt, config=cfg)
+    logger.debug("generate_videos returned: type=%s value=%s", type(op).__name__, op)
     operation_name = get_operation_name(op)
-    logger.info(f"Operation started: {operation_name} ({type(op)})")
+    logger.info("Operation started: %s", operation_name)
     return {"operation_name": operation_name, "message": "text-to-video operation started"}
 
-def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolution: str = "1080p", aspect_ratio: str = "16:9", duration_seconds: int = 8) -> Dict[str, Any]:
+@traced()
+def generate_image_to_video(prompt: str, image: MediaSource, model: str, resolution: str = "1080p", aspect_ratio: str = "16:9", duration_seconds: int = 8) -> Dict[str, Any]:
     """
     Introspection-guided image->video generation. Tries direct base64 payloads and typed constructors,
     then falls back to upload-then-generate. If all fail, dumps SDK schema via dump_generate_videos_schema().
+    `image` may be raw bytes or a path to the image on disk.
     """
     client = create_genai_client()
     logger.info("Starting image-to-video generation (introspection-guided)")
@@ -315,21 +434,10 @@ def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolut
     except Exception:
         cfg = {"resolution": resolution, "aspect_ratio": aspect_ratio, "duration_seconds": str(duration_seconds)}
 
-    # guess mime
+    # guess mime + base64 encode once
     mime_type = "image/jpeg"
     try:
-        if image_bytes[:8].startswith(b'\x89PNG\r\n\x1a\n'):
-            mime_type = "image/png"
-        elif image_bytes[:2] == b'\xff\xd8':
-            mime_type = "image/jpeg"
-        elif image_bytes[:4] in (b'RIFF',):
-            mime_type = "image/webp"
-    except Exception:
-        pass
-
-    # base64 encode once
-    try:
-        b64 = base64.b64encode(image_bytes).decode("ascii")
+        b64, mime_type = _b64_media(image)
     except Exception as e:
         logger.exception("Failed to base64-encode image bytes: %s", e)
         b64 = None
@@ -337,13 +445,13 @@ def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolut
     attempt_errors: List[tuple] = []
 
     def try_call(desc: str, fn):
-        logger.info("generate_image_to_video: attempt -> %s", desc)
+        logger.debug("generate_image_to_video: attempt -> %s", desc)
         try:
             res = fn()
             logger.info("generate_image_to_video: success for attempt -> %s ; result type=%s", desc, type(res))
             return res
         except Exception as e:
-            logger.info("generate_image_to_video: attempt %s failed: %s", desc, e)
+            logger.debug("generate_image_to_video: attempt %s failed: %s", desc, e)
             logger.debug("generate_image_to_video: full exception", exc_info=True)
             attempt_errors.append((desc, e))
             return None
@@ -369,7 +477,7 @@ def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolut
                     attempt_errors.append((f"{name} constructor {ctor_kwargs}", e))
                     continue
                 # try call
-                res = try_call(f"generate_videos with typed image {name}", lambda inst=inst: client.models.generate_videos(model=model, prompt=prompt, image=inst, config=cfg))
+                res = try_call(f"generate_videos with typed image {name}", lambda inst=inst: _generate_videos(client, model=model, prompt=prompt, image=inst, config=cfg))
                 if res:
                     return {"operation_name": get_operation_name(res), "message": "image-to-video started (typed image)"}
 
@@ -395,7 +503,7 @@ def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolut
                     elif "mime" in lk:
                         candidate[key] = mime_type
                 if candidate:
-                    res = try_call("generate_videos with introspected image dict", lambda candidate=candidate: client.models.generate_videos(model=model, prompt=prompt, image=candidate, config=cfg))
+                    res = try_call("generate_videos with introspected image dict", lambda candidate=candidate: _generate_videos(client, model=model, prompt=prompt, image=candidate, config=cfg))
                     if res:
                         return {"operation_name": get_operation_name(res), "message": "image-to-video started (introspected dict)"}
     except Exception as e:
@@ -403,47 +511,49 @@ def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolut
         attempt_errors.append(("introspection", e))
 
     # 3) Fallback to upload-based approach (we already know upload_file works)
-    tmp_path = f"temp_input_image_{uuid.uuid4().hex}.jpg"
+    owns_tmp = not _is_path(image)
+    tmp_path = workspace.path("input_image", ".jpg") if owns_tmp else os.fspath(image)
     try:
-        with open(tmp_path, "wb") as f:
-            f.write(image_bytes)
-        logger.info("generate_image_to_video: wrote temp file %s (%d bytes)", tmp_path, os.path.getsize(tmp_path))
+        if owns_tmp:
+            with open(tmp_path, "wb") as f:
+                f.write(image)
+            logger.info("generate_image_to_video: wrote temp file %s (%d bytes)", tmp_path, os.path.getsize(tmp_path))
 
         uploaded = try_call("upload_file(temp_path)", lambda: upload_file(client, tmp_path))
         if uploaded:
             # Try accepted forms referencing the uploaded file
-            res = try_call("generate_videos with image=uploaded", lambda uploaded=uploaded: client.models.generate_videos(model=model, prompt=prompt, image=uploaded, config=cfg))
+            res = try_call("generate_videos with image=uploaded", lambda uploaded=uploaded: _generate_videos(client, model=model, prompt=prompt, image=uploaded, config=cfg))
             if res:
                 return {"operation_name": get_operation_name(res), "message": "image-to-video started (image=uploaded)"}
 
-            res = try_call("generate_videos with image={'file': uploaded}", lambda uploaded=uploaded: client.models.generate_videos(model=model, prompt=prompt, image={"file": uploaded}, config=cfg))
+            res = try_call("generate_videos with image={'file': uploaded}", lambda uploaded=uploaded: _generate_videos(client, model=model, prompt=prompt, image={"file": uploaded}, config=cfg))
             if res:
                 return {"operation_name": get_operation_name(res), "message": "image-to-video started (image={'file': uploaded})"}
 
             if hasattr(uploaded, "as_image"):
                 try:
                     as_img = uploaded.as_image()
-                    res = try_call("generate_videos with image=uploaded.as_image()", lambda as_img=as_img: client.models.generate_videos(model=model, prompt=prompt, image=as_img, config=cfg))
+                    res = try_call("generate_videos with image=uploaded.as_image()", lambda as_img=as_img: _generate_videos(client, model=model, prompt=prompt, image=as_img, config=cfg))
                     if res:
                         return {"operation_name": get_operation_name(res), "message": "image-to-video started (image=uploaded.as_image())"}
                 except Exception as e:
                     attempt_errors.append(("uploaded.as_image()", e))
 
             # last attempt: pass local path
-            res = try_call("generate_videos with image=tmp_path", lambda tmp_path=tmp_path: client.models.generate_videos(model=model, prompt=prompt, image=tmp_path, config=cfg))
+            res = try_call("generate_videos with image=tmp_path", lambda tmp_path=tmp_path: _generate_videos(client, model=model, prompt=prompt, image=tmp_path, config=cfg))
             if res:
                 return {"operation_name": get_operation_name(res), "message": "image-to-video started (image=tmp_path)"}
 
     finally:
         try:
-            if os.path.exists(tmp_path):
+            if owns_tmp and os.path.exists(tmp_path):
                 os.remove(tmp_path)
         except Exception:
             pass
     # inside generate_image_to_video, when all earlier attempts fail:
     try:
         logger.info("generate_image_to_video: all SDK attempts failed; trying REST fallback")
-        return generate_image_to_video_rest(prompt, image_bytes, model)
+        return generate_image_to_video_rest(prompt, image, model)
     except Exception as e_rest:
         logger.exception("REST fallback failed too")
         # finally raise the original error or combined error for debugging
@@ -465,6 +575,7 @@ def dump_generate_videos_schema() -> Dict[str, Any]:
     Returns a dict with discovered info and logs it.
     """
     out: Dict[str, Any] = {"found": False, "notes": []}
+    _load_genai()
     try:
         if not types:
             out["notes"].append("No `types` module available in this environment.")
@@ -541,9 +652,10 @@ def dump_generate_videos_schema() -> Dict[str, Any]:
     logger.info("dump_generate_videos_schema -> %s", out)
     return out
 
+@traced()
 def generate_video_from_reference_images(
     prompt: str,
-    images: List[bytes],
+    images: List[MediaSource],
     model: str,
     resolution: str = "1080p",
     aspect_ratio: str = "16:9",
@@ -572,6 +684,7 @@ def generate_video_from_reference_images(
         os.getenv("GEMINI_API_KEY")
         or os.getenv("GENAI_API_KEY")
         or os.getenv("GOOGLE_API_KEY")
+        or _replay_api_key()
     )
     if not api_key:
         raise RuntimeError(
@@ -583,26 +696,14 @@ def generate_video_from_reference_images(
         raise RuntimeError("generate_video_from_reference_images_rest: no images provided")
 
     # Build URL for predictLongRunning
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:predictLongRunning"
+    url = _predict_url(model)
     params = {"key": api_key}
     headers = {"Content-Type": "application/json"}
 
     # Build referenceImages payload
     ref_images_payload = []
-    for img_bytes in images:
-        # minimal mime type guessing
-        mime_type = "image/jpeg"
-        try:
-            if img_bytes[:8].startswith(b"\x89PNG\r\n\x1a\n"):
-                mime_type = "image/png"
-            elif img_bytes[:2] == b"\xff\xd8":
-                mime_type = "image/jpeg"
-            elif img_bytes[:4] == b"RIFF":
-                mime_type = "image/webp"
-        except Exception:
-            pass
-
-        b64 = base64.b64encode(img_bytes).decode("ascii")
+    for img in images:
+        b64, mime_type = _b64_media(img)
         ref_images_payload.append(
             {
                 "image": {
@@ -634,14 +735,14 @@ def generate_video_from_reference_images(
             model,
             len(ref_images_payload),
         )
-        resp = requests.post(
+        resp = _rest_post(
             url,
             params=params,
             headers=headers,
             data=json.dumps(body),
             timeout=300,
         )
-    except requests.RequestException as e:
+    except RestRequestError as e:
         logger.exception("generate_video_from_reference_images_rest: HTTP request failed")
         raise RuntimeError(f"REST request failed: {e}")
 
@@ -668,10 +769,11 @@ def generate_video_from_reference_images(
     logger.info("generate_video_from_reference_images_rest: started operation %s", op_name)
     return {"operation_name": op_name, "message": "reference-image video started (via REST)"}
 
+@traced()
 def generate_video_from_first_last_frames(
     prompt: str,
-    first: bytes,
-    last: bytes,
+    first: MediaSource,
+    last: MediaSource,
     model: str,
     resolution: str = "1080p",
     aspect_ratio: str = "16:9",
@@ -698,6 +800,7 @@ def generate_video_from_first_last_frames(
         os.getenv("GEMINI_API_KEY")
         or os.getenv("GENAI_API_KEY")
         or os.getenv("GOOGLE_API_KEY")
+        or _replay_api_key()
     )
     if not api_key:
         raise RuntimeError(
@@ -708,29 +811,12 @@ def generate_video_from_first_last_frames(
     if not first or not last:
         raise RuntimeError("generate_video_from_first_last_frames_rest: both first and last images are required")
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:predictLongRunning"
+    url = _predict_url(model)
     params = {"key": api_key}
     headers = {"Content-Type": "application/json"}
 
-    # Small helper to guess mime type
-    def _guess_mime(img: bytes) -> str:
-        m = "image/jpeg"
-        try:
-            if img[:8].startswith(b"\x89PNG\r\n\x1a\n"):
-                m = "image/png"
-            elif img[:2] == b"\xff\xd8":
-                m = "image/jpeg"
-            elif img[:4] == b"RIFF":
-                m = "image/webp"
-        except Exception:
-            pass
-        return m
-
-    first_mime = _guess_mime(first)
-    last_mime = _guess_mime(last)
-
-    first_b64 = base64.b64encode(first).decode("ascii")
-    last_b64 = base64.b64encode(last).decode("ascii")
+    first_b64, first_mime = _b64_media(first)
+    last_b64, last_mime = _b64_media(last)
 
     # Build instance as the REST API expects
     instance = {
@@ -761,14 +847,14 @@ def generate_video_from_first_last_frames(
             url,
             model,
         )
-        resp = requests.post(
+        resp = _rest_post(
             url,
             params=params,
             headers=headers,
             data=json.dumps(body),
             timeout=300,
         )
-    except requests.RequestException as e:
+    except RestRequestError as e:
         logger.exception("generate_video_from_first_last_frames_rest: HTTP request failed")
         raise RuntimeError(f"REST request failed: {e}")
 
@@ -868,7 +954,8 @@ def _try_construct_typed_video(candidate_cls, uploaded_or_file_obj):
     # If we arrive here, we could not construct
     raise RuntimeError(f"_try_construct_typed_video failed for {candidate_cls} last_exc={last_exc}")
 
-def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generated_video_obj: Optional[Any] = None, resolution: str = "1080p", aspect_ratio: str = "16:9", duration_seconds: int = 8) -> Dict[str, Any]:
+@traced()
+def extend_veo_video(prompt: str, video: Optional[MediaSource], model: str, prior_generated_video_obj: Optional[Any] = None, resolution: str = "1080p", aspect_ratio: str = "16:9", duration_seconds: int = 8) -> Dict[str, Any]:
     """
     Attempt to extend a video.
 
@@ -880,6 +967,8 @@ def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generate
       3) If we cannot construct a typed instance, we raise a clear error instructing the user to provide a
          prior generated video object (per docs) or show how to produce one (generate a short dummy video first).
 
+    `video` may be raw bytes or a path to the base video on disk; a path is used in place without copying.
+
     Returns: {"operation_name": "...", "message": "..."}
     """
 
@@ -890,64 +979,63 @@ def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generate
     if prior_generated_video_obj is not None:
         logger.info("extend_veo_video: Using prior generated video object supplied by caller (official doc flow).")
         try:
-            op = client.models.generate_videos(model=model, video=prior_generated_video_obj, prompt=prompt)
+            op = _generate_videos(client, model=model, video=prior_generated_video_obj, prompt=prompt)
             return {"operation_name": get_operation_name(op), "message": "video-extend started (using prior generated-video object)"}
         except Exception as e:
             error_str = str(e)
             if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
                 friendly_msg = "You have reached your daily limit for video generation. Please try again later."
-                logger.warning(f"extend_veo_video: Quota exceeded: {friendly_msg}")
+                logger.warning("extend_veo_video: Quota exceeded: %s", friendly_msg)
                 raise RuntimeError(friendly_msg)
             
             logger.exception("extend_veo_video: SDK generate_videos failed with prior_generated_video_obj: %s", e)
             raise RuntimeError(f"extend_veo_video: SDK generate_videos with provided prior_generated_video_obj failed: {e}")
 
     # 2) No prior generated-video object: upload the local file and then attempt to construct a typed object
-    tmp_path = f"temp_video_input_{uuid.uuid4().hex}.mp4"
+    owns_tmp = not _is_path(video)
+    tmp_path = workspace.path("video_input", ".mp4") if owns_tmp else os.fspath(video)
     try:
-        with open(tmp_path, "wb") as fh:
-            fh.write(video_bytes)
-        logger.info("extend_veo_video: wrote temp video %s (%d bytes)", tmp_path, os.path.getsize(tmp_path))
+        if owns_tmp:
+            with open(tmp_path, "wb") as fh:
+                fh.write(video or b"")
+            logger.info("extend_veo_video: wrote temp video %s (%d bytes)", tmp_path, os.path.getsize(tmp_path))
 
         # FORCE Fallback Strategy: Extract Last Frame and use Image-to-Video.
         # The direct SDK call often results in Video-to-Video (Variation) instead of Extension for raw files.
         # To guarantee consistency (stitching), we explicitly use the last frame.
         logger.info("extend_veo_video: Forcing Last Frame -> Image-to-Video strategy for consistency.")
         
-        if not MOVIEPY_AVAILABLE:
+        moviepy = _load_moviepy()
+        if moviepy is None:
              logger.warning("extend_veo_video: moviepy not available, falling back to standard SDK attempt.")
-             print("DEBUG: MOVIEPY_AVAILABLE is False!")
              # Fall through to original logic if moviepy is missing
              raise ImportError("moviepy not available")
-        else:
-             print("DEBUG: MOVIEPY_AVAILABLE is True. Proceeding with frame extraction.")
 
         # Extract last frame from the temp video file
-        print(f"DEBUG: Extracting last frame from {tmp_path}")
-        with VideoFileClip(tmp_path) as clip:
-            print(f"DEBUG: Clip duration: {clip.duration}")
-            last_frame_time = max(0, clip.duration - 0.1)
-            last_frame_path = f"temp_frame_{uuid.uuid4().hex}.jpg"
-            clip.save_frame(last_frame_path, t=last_frame_time)
-        
-        print(f"DEBUG: Extracted frame to {last_frame_path}")
-        
-        logger.info(f"extend_veo_video: extracted last frame to {last_frame_path}")
+        logger.debug("extend_veo_video: extracting last frame from %s", tmp_path)
+        last_frame_path = workspace.path("frame", ".jpg")
+        try:
+            with moviepy.VideoFileClip(tmp_path) as clip:
+                logger.debug("extend_veo_video: clip duration %s", clip.duration)
+                last_frame_time = max(0, clip.duration - 0.1)
+                clip.save_frame(last_frame_path, t=last_frame_time)
+            
+            logger.info("extend_veo_video: extracted last frame to %s", last_frame_path)
 
-        # Upload the frame
-        uploaded_frame = upload_file(client, last_frame_path)
-        
-        # Call generate_videos with the image (Image-to-Video)
-        op = client.models.generate_videos(model=model, prompt=prompt, image=uploaded_frame, config={})
-        
-        # Cleanup frame
-        if os.path.exists(last_frame_path):
-            os.remove(last_frame_path)
+            # Upload the frame
+            uploaded_frame = upload_file(client, last_frame_path)
+            
+            # Call generate_videos with the image (Image-to-Video)
+            op = _generate_videos(client, model=model, prompt=prompt, image=uploaded_frame, config={})
+        finally:
+            # Cleanup frame
+            if os.path.exists(last_frame_path):
+                os.remove(last_frame_path)
 
         return {"operation_name": get_operation_name(op), "message": "video-extend started (forced: last-frame image-to-video)"}
 
     except Exception as e:
-        logger.info(f"extend_veo_video: Last Frame strategy failed or skipped ({e}). Trying standard SDK methods.")
+        logger.info("extend_veo_video: Last Frame strategy failed or skipped (%s). Trying standard SDK methods.", e)
         # Proceed with original SDK attempts as backup
         pass
 
@@ -959,7 +1047,7 @@ def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generate
         # Try SDK direct with uploaded first (some versions accept a File object directly)
         try:
             # Try a minimal SDK call with no extra config to avoid injection of 'encoding' or 'mimeType'
-            op = client.models.generate_videos(model=model, video=uploaded, prompt=prompt, config={})
+            op = _generate_videos(client, model=model, video=uploaded, prompt=prompt, config={})
             return {"operation_name": get_operation_name(op), "message": "video-extend started (sdk: uploaded File accepted)"}
         except Exception as e:
             logger.info("extend_veo_video: SDK did not accept uploaded File object directly: %s", e)
@@ -976,7 +1064,7 @@ def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generate
                 inst = _try_construct_typed_video(cls, uploaded)
                 # If constructed, attempt SDK call with it (minimal config)
                 try:
-                    op = client.models.generate_videos(model=model, video=inst, prompt=prompt, config={})
+                    op = _generate_videos(client, model=model, video=inst, prompt=prompt, config={})
                     return {"operation_name": get_operation_name(op), "message": f"video-extend started (sdk typed {name})"}
                 except Exception as e:
                     last_error = e
@@ -993,20 +1081,21 @@ def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generate
 
     finally:
         try:
-            if os.path.exists(tmp_path):
+            if owns_tmp and os.path.exists(tmp_path):
                 os.remove(tmp_path)
         except Exception:
             pass
 
-def extend_veo_video_rest(prompt: str, video_bytes: Optional[bytes], model: str, file_reference: Optional[Dict[str,str]] = None) -> Dict[str, Any]:
+@traced()
+def extend_veo_video_rest(prompt: str, video_bytes: Optional[MediaSource], model: str, file_reference: Optional[Dict[str,str]] = None) -> Dict[str, Any]:
     """
     Simpler REST helper: if file_reference provided, try a couple of standard shapes; if not, embed base64.
     """
-    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GENAI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GENAI_API_KEY") or os.getenv("GOOGLE_API_KEY") or _replay_api_key()
     if not api_key:
         raise RuntimeError("No GEMINI_API_KEY/GENAI_API_KEY/GOOGLE_API_KEY set for REST fallback")
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:predictLongRunning"
+    url = _predict_url(model)
     headers = {"Content-Type": "application/json"}
 
     if file_reference:
@@ -1022,7 +1111,7 @@ def extend_veo_video_rest(prompt: str, video_bytes: Optional[bytes], model: str,
         for inst in variants:
             body = {"instances": [inst]}
             logger.info("extend_veo_video_rest: trying variant keys=%s", list(inst.keys()))
-            resp = requests.post(url, params={"key": api_key}, headers=headers, data=json.dumps(body), timeout=300)
+            resp = _rest_post(url, params={"key": api_key}, headers=headers, data=json.dumps(body), timeout=300)
             try:
                 j = resp.json()
             except Exception:
@@ -1039,11 +1128,12 @@ def extend_veo_video_rest(prompt: str, video_bytes: Optional[bytes], model: str,
     # embed base64
     if not video_bytes:
         raise RuntimeError("extend_veo_video_rest: no video bytes to send and no file_reference provided")
-    b64 = base64.b64encode(video_bytes).decode("ascii")
+    with _media_buffer(video_bytes) as buf:
+        b64 = base64.b64encode(buf).decode("ascii")
     instance = {"video": {"bytesBase64Encoded": b64, "mimeType": "video/mp4"}, "prompt": prompt}
     body = {"instances": [instance]}
     logger.info("extend_veo_video_rest: POST embed payload model=%s size=%d", model, len(b64))
-    resp = requests.post(url, params={"key": api_key}, headers=headers, data=json.dumps(body), timeout=300)
+    resp = _rest_post(url, params={"key": api_key}, headers=headers, data=json.dumps(body), timeout=300)
     try:
         j = resp.json()
     except Exception:
@@ -1060,13 +1150,13 @@ def extend_veo_video_rest(prompt: str, video_bytes: Optional[bytes], model: str,
 # --------------------------------------------------------------
 def handle_async_operation(operation_name: str) -> Dict[str, Any]:
     client = create_genai_client()
-    logger.info(f"Checking async operation {operation_name}")
+    logger.debug("Checking async operation %s", operation_name)
     try:
-        op = client.operations.get(operation_name)
+        op = _get_operation(client, operation_name)
     except Exception as e:
         try:
             if types and hasattr(types, "GenerateVideosOperation"):
-                op = client.operations.get(types.GenerateVideosOperation(name=operation_name))
+                op = _get_operation(client, types.GenerateVideosOperation(name=operation_name))
             else:
                 raise
         except Exception as e2:
@@ -1074,7 +1164,7 @@ def handle_async_operation(operation_name: str) -> Dict[str, Any]:
             return {"done": False, "message": f"failed to fetch operation: {e2}", "raw": str(e2)}
 
     if isinstance(op, str):
-        logger.info(f"handle_async_operation: operations.get returned str -> {op}")
+        logger.debug("handle_async_operation: operations.get returned str -> %s", op)
         return {"done": False, "message": "operation represented as string; check later", "raw": op}
 
     done = bool(getattr(op, "done", False))
@@ -1082,24 +1172,25 @@ def handle_async_operation(operation_name: str) -> Dict[str, Any]:
         return {"done": True, "message": "operation complete", "raw": str(op)}
     return {"done": False, "message": "operation still running", "raw": str(op)}
 
+@traced("poll")
 def get_operation_status(operation_name: str) -> Dict[str, Any]:
     client = create_genai_client()
     try:
         # Try passing name as keyword arg first, as SDK seems to expect object or kwargs
-        op = client.operations.get(name=operation_name)
+        op = _get_operation(client, name=operation_name)
     except Exception:
         try:
             if types and hasattr(types, "GenerateVideosOperation"):
-                op = client.operations.get(types.GenerateVideosOperation(name=operation_name))
+                op = _get_operation(client, types.GenerateVideosOperation(name=operation_name))
             else:
                 # Fallback to positional if kwargs fail (though unlikely given the error)
-                op = client.operations.get(operation_name)
+                op = _get_operation(client, operation_name)
         except Exception as e2:
             logger.exception("get_operation_status: failed to get operation")
             return {"done": False, "status": "ERROR", "progress": None, "eta_seconds": None, "message": f"failed to get operation: {e2}", "raw": None}
 
     if isinstance(op, str):
-        logger.info(f"get_operation_status: operations.get returned str -> {op}")
+        logger.debug("get_operation_status: operations.get returned str -> %s", op)
         return {
             "done": False,
             "status": "POLLING",
@@ -1139,57 +1230,65 @@ def get_operation_status(operation_name: str) -> Dict[str, Any]:
     except Exception as e:
         logger.exception("get_operation_status: failed to parse operation")
         return {"done": False, "status": "ERROR", "message": f"failed to parse operation: {e}", "raw": str(op)}
+@traced()
 def download_video_bytes(operation_name: str) -> Tuple[Optional[bytes], Optional[str]]:
     client = create_genai_client()
     op = None
     try:
         if types and hasattr(types, "GenerateVideosOperation"):
-            op = client.operations.get(types.GenerateVideosOperation(name=operation_name))
+            op = _get_operation(client, types.GenerateVideosOperation(name=operation_name))
         else:
-            op = client.operations.get(name=operation_name)
+            op = _get_operation(client, name=operation_name)
     except Exception as e:
-        logger.error(f"download_video_bytes: failed to get operation: {e}")
+        logger.error("download_video_bytes: failed to get operation: %s", e)
         return None, None
 
     if isinstance(op, str):
-        logger.info(f"download_video_bytes: operations.get returned str -> {op}")
+        logger.debug("download_video_bytes: operations.get returned str -> %s", op)
         return None, None
 
     if not bool(getattr(op, "done", False)):
-        logger.info(f"download_video_bytes: operation {operation_name} not done yet")
+        logger.debug("download_video_bytes: operation %s not done yet", operation_name)
         return None, None
 
     resp = getattr(op, "response", None) or getattr(op, "result", None)
     if not resp:
-        logger.info(f"download_video_bytes: operation {operation_name} has no response/result")
+        logger.info("download_video_bytes: operation %s has no response/result", operation_name)
         return None, None
 
     videos = getattr(resp, "generated_videos", None)
     if not videos:
-        logger.info(f"download_video_bytes: operation {operation_name} has no generated_videos")
+        logger.info("download_video_bytes: operation %s has no generated_videos", operation_name)
         return None, None
 
     video_obj = videos[0]
+    start = time.perf_counter()
     try:
-        downloaded = client.files.download(file=video_obj.video)
+        downloaded = _download_file(client, file=video_obj.video)
     except Exception as e1:
-        logger.warning(f"download_video_bytes: first download attempt failed: {e1}")
+        logger.warning("download_video_bytes: first download attempt failed: %s", e1)
         try:
-            downloaded = client.files.download(video_obj.video)
+            downloaded = _download_file(client, video_obj.video)
         except Exception as e2:
-            logger.error(f"download_video_bytes: second download attempt failed: {e2}")
+            logger.error("download_video_bytes: second download attempt failed: %s", e2)
             return None, None
 
     if hasattr(downloaded, "read"):
         data = downloaded.read()
     else:
         data = bytes(downloaded)
+    DOWNLOAD_SECONDS.observe(time.perf_counter() - start)
+    DOWNLOAD_BYTES.inc(len(data))
+    return data, video_filename()
+
+def video_filename() -> str:
+    """Download filename stamped with the current IST time."""
     # IST is UTC + 5:30
     ist_time = datetime.now(timezone.utc) + timedelta(hours=5, minutes=30)
-    filename = f"video_{ist_time.strftime('%Y_%m_%d_%H_%M_%S')}.mp4"
-    return data, filename
+    return f"video_{ist_time.strftime('%Y_%m_%d_%H_%M_%S')}.mp4"
 
-def generate_image_to_video_rest(prompt: str, image_bytes: bytes, model: str) -> Dict[str, Any]:
+@traced()
+def generate_image_to_video_rest(prompt: str, image: MediaSource, model: str) -> Dict[str, Any]:
     """
     Fallback: call the Generative Language REST long-running endpoint directly
     to start a Veo job using a single image + a text prompt.
@@ -1198,6 +1297,7 @@ def generate_image_to_video_rest(prompt: str, image_bytes: bytes, model: str) ->
         os.getenv("GEMINI_API_KEY")
         or os.getenv("GENAI_API_KEY")
         or os.getenv("GOOGLE_API_KEY")
+        or _replay_api_key()
     )
     if not api_key:
         raise RuntimeError(
@@ -1205,27 +1305,15 @@ def generate_image_to_video_rest(prompt: str, image_bytes: bytes, model: str) ->
             "for REST image-to-video call"
         )
 
-    if not image_bytes:
+    if image is None or (not _is_path(image) and not image):
         raise RuntimeError("generate_image_to_video_rest: no image provided")
 
     # Build URL for predictLongRunning
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:predictLongRunning"
+    url = _predict_url(model)
     params = {"key": api_key}
     headers = {"Content-Type": "application/json"}
 
-    # minimal mime type guessing
-    mime_type = "image/jpeg"
-    try:
-        if image_bytes[:8].startswith(b"\x89PNG\r\n\x1a\n"):
-            mime_type = "image/png"
-        elif image_bytes[:2] == b"\xff\xd8":
-            mime_type = "image/jpeg"
-        elif image_bytes[:4] == b"RIFF":
-            mime_type = "image/webp"
-    except Exception:
-        pass
-
-    b64 = base64.b64encode(image_bytes).decode("ascii")
+    b64, mime_type = _b64_media(image)
 
     # Build instance
     instance = {
@@ -1250,14 +1338,14 @@ def generate_image_to_video_rest(prompt: str, image_bytes: bytes, model: str) ->
             url,
             model,
         )
-        resp = requests.post(
+        resp = _rest_post(
             url,
             params=params,
             headers=headers,
             data=json.dumps(body),
             timeout=300,
         )
-    except requests.RequestException as e:
+    except RestRequestError as e:
         logger.exception("generate_image_to_video_rest: HTTP request failed")
         raise RuntimeError(f"REST request failed: {e}")
 
@@ -1284,35 +1372,40 @@ def generate_image_to_video_rest(prompt: str, image_bytes: bytes, model: str) ->
     logger.info("generate_image_to_video_rest: started operation %s", op_name)
     return {"operation_name": op_name, "message": "image-to-video operation started (via REST)"}
 
+@traced()
 def stitch_videos(base_video_path: str, extension_bytes: bytes) -> Optional[bytes]:
     """
     Stitches the base video (file path) and the extension video (bytes) together.
     Returns the bytes of the combined video.
     """
-    if not MOVIEPY_AVAILABLE:
+    moviepy = _load_moviepy()
+    if moviepy is None:
         logger.warning("stitch_videos: moviepy not available, returning extension only")
         return None
 
+    # Save extension bytes to temp file
+    ext_path = workspace.path("ext", ".mp4")
+    output_path = workspace.path("stitched", ".mp4")
+    clips = []
+    start = time.perf_counter()
+    outcome = "failed"
     try:
-        # Save extension bytes to temp file
-        ext_path = f"temp_ext_{uuid.uuid4().hex}.mp4"
-        output_path = f"temp_stitched_{uuid.uuid4().hex}.mp4"
-        
         with open(ext_path, "wb") as f:
             f.write(extension_bytes)
             
-        logger.info(f"stitch_videos: stitching {base_video_path} + {ext_path}")
+        logger.info("stitch_videos: stitching %s + %s", base_video_path, ext_path)
         
         # Load clips
-        print(f"DEBUG: stitch_videos called with base={base_video_path}")
-        clip1 = VideoFileClip(base_video_path)
-        clip2 = VideoFileClip(ext_path)
+        clip1 = moviepy.VideoFileClip(base_video_path)
+        clips.append(clip1)
+        clip2 = moviepy.VideoFileClip(ext_path)
+        clips.append(clip2)
         
-        logger.info(f"stitch_videos: clip1 duration={clip1.duration}, clip2 duration={clip2.duration}")
-        print(f"DEBUG: Stitching {base_video_path} ({clip1.duration}s) + {ext_path} ({clip2.duration}s)")
+        logger.debug("stitch_videos: clip1 duration=%s, clip2 duration=%s", clip1.duration, clip2.duration)
         
         # Concatenate with method="compose" to handle different resolutions/fps
-        final_clip = concatenate_videoclips([clip1, clip2], method="compose")
+        final_clip = moviepy.concatenate_videoclips([clip1, clip2], method="compose")
+        clips.append(final_clip)
         
         # Write output
         # Use 'libx264' codec for compatibility, preset 'ultrafast' for speed
@@ -1323,25 +1416,26 @@ def stitch_videos(base_video_path: str, extension_bytes: bytes) -> Optional[byte
         with open(output_path, "rb") as f:
             stitched_bytes = f.read()
         
-        print(f"DEBUG: Stitching successful! Final size: {len(stitched_bytes)} bytes")
-            
-        # Cleanup
-        clip1.close()
-        clip2.close()
-        final_clip.close()
-        
-        if os.path.exists(ext_path):
-            os.remove(ext_path)
-        if os.path.exists(output_path):
-            os.remove(output_path)
-            
+        logger.info("stitch_videos: done, %d bytes", len(stitched_bytes))
+        outcome = "ok"
         return stitched_bytes
         
     except Exception as e:
         logger.exception("stitch_videos: failed to stitch videos")
-        print(f"DEBUG: Stitching FAILED: {e}")
         return None
 
+    finally:
+        STITCH_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+        # Cleanup, also on failure
+        for clip in clips:
+            try:
+                clip.close()
+            except Exception:
+                pass
+        for path in (ext_path, output_path):
+            if os.path.exists(path):
+                os.remove(path)
+
 def get_video_object_from_operation(operation_name: str) -> Optional[Any]:
     """
     Retrieves the generated video object from a completed operation.
@@ -1350,12 +1444,12 @@ def get_video_object_from_operation(operation_name: str) -> Optional[Any]:
     client = create_genai_client()
     try:
         if types and hasattr(types, "GenerateVideosOperation"):
-             op = client.operations.get(types.GenerateVideosOperation(name=operation_name))
+             op = _get_operation(client, types.GenerateVideosOperation(name=operation_name))
         else:
-             op = client.operations.get(name=operation_name)
+             op = _get_operation(client, name=operation_name)
              
         if not op.done:
-            logger.warning(f"get_video_object_from_operation: operation {operation_name} is not done")
+            logger.warning("get_video_object_from_operation: operation %s is not done", operation_name)
             return None
         
         # The result should contain generated_videos
@@ -1368,7 +1462,7 @@ def get_video_object_from_operation(operation_name: str) -> Optional[Any]:
             if isinstance(res, dict) and "generated_videos" in res:
                  return res["generated_videos"][0]["video"]
                  
-        logger.warning(f"get_video_object_from_operation: could not find generated_videos in result for {operation_name}")
+        logger.warning("get_video_object_from_operation: could not find generated_videos in result for %s", operation_name)
         return None
         
     except Exception as e:
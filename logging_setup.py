@@ -0,0 +1,189 @@
+"""
+Logging pipeline for the Veo backend.
+
+``configure_logging()`` installs a single QueueHandler on the root logger. The
+calling thread only renders the message and enqueues the record. A
+QueueListener thread formats and does the stream/file I/O, so a slow stdout or
+log collector never stalls a request or a poll.
+
+Two filters run before a record is enqueued:
+
+- RateLimitFilter caps each DEBUG/INFO message template (logger + level +
+  format string) at VEO_LOG_RATE_LIMIT records per VEO_LOG_RATE_WINDOW seconds.
+  The next record let through reports how many were suppressed. WARNING and
+  above always pass unless VEO_LOG_RATE_LIMIT_WARNINGS=1.
+- SamplingFilter keeps only VEO_LOG_DEBUG_SAMPLE of DEBUG records (per-attempt
+  SDK chatter). INFO and above are never sampled.
+
+Records carry the current trace ID (see tracing.py). VEO_LOG_FORMAT=json
+emits one JSON object per line for log aggregation.
+
+    VEO_LOG_LEVEL=INFO VEO_LOG_FORMAT=json VEO_LOG_RATE_LIMIT=20 python -m uvicorn backend:app
+"""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+from typing import Dict, Optional, Tuple
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configured_lock = threading.Lock()
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+
+class TraceContextFilter(logging.Filter):
+    """Attach the current trace ID; must run on the calling thread (contextvars)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "trace_id"):
+            from tracing import current_trace_id
+            record.trace_id = current_trace_id()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most `limit` records per message template through per `window` seconds."""
+
+    def __init__(self, limit: int = 20, window: float = 10.0, limit_warnings: bool = False):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.limit_warnings = limit_warnings
+        self._lock = threading.Lock()
+        # template key -> [window_start, passed, suppressed]
+        self._buckets: Dict[Tuple[str, int, str], list] = {}
+        self.suppressed_total = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0:
+            return True
+        if record.levelno >= logging.WARNING and not self.limit_warnings:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[0] >= self.window:
+                suppressed = bucket[2] if bucket else 0
+                self._buckets[key] = [now, 1, 0]
+                if len(self._buckets) > 10000:
+                    self._buckets = {key: self._buckets[key]}
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if bucket[1] < self.limit:
+                bucket[1] += 1
+                return True
+            bucket[2] += 1
+            self.suppressed_total += 1
+            return False
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random `rate` fraction of records below INFO."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.INFO or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if getattr(record, "trace_id", None):
+            out["trace_id"] = record.trace_id
+        if getattr(record, "suppressed", None):
+            out["suppressed"] = record.suppressed
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        if getattr(record, "trace_id", None):
+            text += f" trace={record.trace_id}"
+        if getattr(record, "suppressed", None):
+            text += f" (+{record.suppressed} similar suppressed)"
+        return text
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    stream=None,
+) -> logging.Logger:
+    """Route all logging through a background queue listener. Safe to call more than once."""
+    global _listener
+    with _configured_lock:
+        root = logging.getLogger()
+        level = (level or os.getenv("VEO_LOG_LEVEL", "INFO")).upper()
+        root.setLevel(level)
+        if _listener is not None:
+            return root
+
+        fmt = (fmt or os.getenv("VEO_LOG_FORMAT", "text")).lower()
+        formatter = JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT)
+        sink = logging.StreamHandler(stream or sys.stderr)
+        sink.setFormatter(formatter)
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=int(os.getenv("VEO_LOG_QUEUE_SIZE", "10000")))
+        # No formatter here: prepare() only merges args into the message on the calling
+        # thread; the listener's sink applies the real formatter.
+        handler = _DroppingQueueHandler(log_queue)
+        handler.addFilter(TraceContextFilter())
+        handler.addFilter(SamplingFilter(float(os.getenv("VEO_LOG_DEBUG_SAMPLE", "1"))))
+        handler.addFilter(RateLimitFilter(
+            limit=int(os.getenv("VEO_LOG_RATE_LIMIT", "20")),
+            window=float(os.getenv("VEO_LOG_RATE_WINDOW", "10")),
+            limit_warnings=os.getenv("VEO_LOG_RATE_LIMIT_WARNINGS", "0") == "1",
+        ))
+
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+
+        _listener = logging.handlers.QueueListener(log_queue, sink, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return root
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never block the caller: when the queue is full the record is counted and dropped."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _configured_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,11 @@
+"""
+Event-loop lag monitor for the Veo backend (see observability.loop_monitor).
+
+    VEO_LOOP_LAG_INTERVAL=0.25 VEO_LOOP_LAG_THRESHOLD=0.5 python -m uvicorn backend:app
+
+Set VEO_LOOP_LAG_THRESHOLD=0 to disable the monitor.
+"""
+from observability.loop_monitor import LoopLagMonitor
+
+# metric names veo_*, environment variables VEO_*
+loop_monitor = LoopLagMonitor.from_env("veo")
@@ -0,0 +1,30 @@
+"""
+Prometheus-style metrics for the Veo backend.
+
+The registry lives in observability.metrics (shared with App4); this module
+re-exports it and defines the pipeline metrics. ``render()`` is served at
+GET /metrics by backend.py, and values that already live elsewhere (workspace
+usage, retry stats) are pulled at scrape time through ``register_collector``.
+
+    SUBMIT_SECONDS.observe(0.42, mode="text_to_video")
+    with STITCH_SECONDS.time():
+        ...
+"""
+from observability.metrics import (  # noqa: F401
+    CONTENT_TYPE, DEFAULT_BUCKETS, Counter, Gauge, Histogram,
+    counter, gauge, histogram, register_collector, render,
+)
+
+
+# ----------------------------------------------------------------------
+# PIPELINE METRICS
+# ----------------------------------------------------------------------
+SUBMIT_SECONDS = histogram("veo_submit_seconds", "Time to start a generation, per mode", ["mode"])
+SUBMIT_TOTAL = counter("veo_submit_total", "Generation submissions, per mode and outcome", ["mode", "outcome"])
+API_CALL_SECONDS = histogram("veo_api_call_seconds", "Latency of each Veo API attempt (SDK or REST)", ["op"])
+API_ERRORS = counter("veo_api_errors_total", "Failed Veo API attempts by HTTP status (or 'transport')", ["op", "status"])
+RATE_LIMITED = counter("veo_rate_limited_total", "Veo API attempts rejected with HTTP 429", ["op"])
+DOWNLOAD_SECONDS = histogram("veo_download_seconds", "Time to fetch a finished video")
+DOWNLOAD_BYTES = counter("veo_download_bytes_total", "Bytes of video downloaded from the Veo API")
+STITCH_SECONDS = histogram("veo_stitch_seconds", "Time spent in stitch_videos", ["outcome"])
+UPLOAD_ATTEMPTS = counter("veo_upload_attempts_total", "files.upload attempts per fallback strategy and outcome", ["strategy", "outcome"])
@@ -0,0 +1,5 @@
+"""
+Metrics and event-loop monitoring shared by the Veo backend (backend.py) and
+App4 (app4/api.py). Each app keeps its own thin ``metrics`` / ``loop_monitor``
+module that picks its metric-name prefix.
+"""
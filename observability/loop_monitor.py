@@ -0,0 +1,148 @@
+"""
+Event-loop lag monitor.
+
+A blocking call inside an ``async def`` endpoint (a sync SDK call, a
+requests.get, a moviepy render) freezes every other request on the worker.
+``LoopLagMonitor(prefix)`` makes that visible:
+
+- a sampler task sleeps {PREFIX}_LOOP_LAG_INTERVAL seconds and records how late
+  it woke up into the ``{prefix}_event_loop_lag_seconds`` histogram;
+- a watchdog thread notices when the loop has not ticked for
+  {PREFIX}_LOOP_LAG_THRESHOLD seconds and, while the loop is still blocked, logs
+  the running task and the loop thread's stack, which points at the offending call.
+
+A threshold of 0 disables the monitor.
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Any, Dict, Optional
+
+from observability import metrics
+
+logger = logging.getLogger("loop_monitor")
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+
+def _describe_task(task: Optional[asyncio.Task]) -> str:
+    if task is None:
+        return "<no task>"
+    coro = task.get_coro()
+    code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+    where = getattr(code, "co_qualname", None) or getattr(code, "co_name", None) or repr(coro)
+    return f"{task.get_name()} ({where})"
+
+
+class LoopLagMonitor:
+    def __init__(self, prefix: str, interval: float = 0.25, threshold: float = 0.5, stack_limit: int = 25):
+        self.prefix = prefix
+        self.lag_seconds = metrics.histogram(
+            f"{prefix}_event_loop_lag_seconds", "How late the event loop ran a scheduled callback", buckets=LAG_BUCKETS)
+        self.stalls_total = metrics.counter(
+            f"{prefix}_event_loop_stalls_total", f"Event-loop stalls longer than {prefix.upper()}_LOOP_LAG_THRESHOLD")
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_limit = stack_limit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_tick = time.monotonic()
+        # set by the watchdog while the loop is stuck, cleared by the sampler once it runs again
+        self._stall: Optional[Dict[str, Any]] = None
+        self.stats = {"samples": 0, "stalls": 0, "max_lag": 0.0, "last_lag": 0.0}
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "LoopLagMonitor":
+        """Monitor configured from {PREFIX}_LOOP_LAG_INTERVAL / {PREFIX}_LOOP_LAG_THRESHOLD."""
+        env = prefix.upper()
+        return cls(
+            prefix,
+            interval=float(os.getenv(f"{env}_LOOP_LAG_INTERVAL", "0.25")),
+            threshold=float(os.getenv(f"{env}_LOOP_LAG_THRESHOLD", "0.5")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0 and self.interval > 0
+
+    def start(self) -> None:
+        """Start monitoring the running loop. Call from the loop thread (e.g. a startup handler)."""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._last_tick = time.monotonic()
+        self._task = self._loop.create_task(self._sample(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=2)
+            self._watchdog = None
+
+    async def _sample(self) -> None:
+        while not self._stop.is_set():
+            scheduled = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_tick = now
+            lag = max(0.0, now - scheduled - self.interval)
+            self.lag_seconds.observe(lag)
+            self.stats["samples"] += 1
+            self.stats["last_lag"] = lag
+            self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+            stall, self._stall = self._stall, None
+            if stall is not None:
+                logger.warning("event loop was blocked for %.3fs by %s", lag, stall["task"])
+            elif lag > self.threshold:
+                # shorter than the watchdog's resolution; record it without a stack
+                self.stats["stalls"] += 1
+                self.stalls_total.inc()
+                logger.warning("event loop lag %.3fs (threshold %.3fs)", lag, self.threshold)
+
+    def _watch(self) -> None:
+        period = max(0.01, min(self.interval, self.threshold) / 2)
+        while not self._stop.wait(period):
+            blocked_for = time.monotonic() - self._last_tick - self.interval
+            if blocked_for <= self.threshold or self._stall is not None:
+                continue
+            self._stall = self._capture(blocked_for)
+            self.stats["stalls"] += 1
+            self.stalls_total.inc()
+            logger.warning(
+                "event loop blocked for %.3fs so far in %s:\n%s",
+                blocked_for, self._stall["task"], self._stall["stack"],
+            )
+
+    def _capture(self, blocked_for: float) -> Dict[str, Any]:
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=self.stack_limit)) if frame else "<no frame>"
+        return {"blocked_for": blocked_for, "task": _describe_task(task), "stack": stack.rstrip()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "running": self._task is not None,
+            **{k: round(v, 4) if isinstance(v, float) else v for k, v in self.stats.items()},
+        }
+
@@ -0,0 +1,200 @@
+"""
+Central retry policy for the Veo network calls in helper.py.
+
+Every SDK or REST call goes through ``call_with_retry``. A call is retried
+only when the error is transient. For non-idempotent calls (anything that
+starts a paid generation) the error must also prove the request was never
+processed: a connection that was never established, 429, or 503. Delays use
+capped exponential backoff with full jitter.
+
+A process-wide retry budget caps retries at a fraction of first attempts, so a
+real upstream outage cannot be amplified into a retry storm.
+"""
+import os
+import time
+import random
+import socket
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("retry")
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Statuses that guarantee the server did not act on the request
+NOT_PROCESSED_STATUS = {429, 503}
+
+
+class RetryableStatus(Exception):
+    """Raised inside a retried call to turn a retryable HTTP response into a retry."""
+
+    def __init__(self, response: Any):
+        self.response = response
+        self.status_code = getattr(response, "status_code", None)
+        super().__init__(f"retryable HTTP status {self.status_code}")
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    multiplier: float = 2.0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("VEO_RETRY_MAX_ATTEMPTS", "4")),
+            base_delay=float(os.getenv("VEO_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("VEO_RETRY_MAX_DELAY", "20")),
+        )
+
+    def delay(self, attempt: int) -> float:
+        """Full-jitter backoff for the given retry number (1-based)."""
+        cap = min(self.max_delay, self.base_delay * (self.multiplier ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+
+class RetryBudget:
+    """
+    Token bucket shared by all calls: each first attempt deposits `ratio` tokens
+    (up to `max_tokens`), each retry withdraws one. When empty, calls fail fast.
+    """
+
+    def __init__(self, ratio: float = 0.2, initial_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = initial_tokens
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "budget_exhausted": 0, "gave_up": 0, "recovered": 0}
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.stats["calls"] += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.stats["retries"] += 1
+                return True
+            self.stats["budget_exhausted"] += 1
+            return False
+
+    def record(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "tokens": round(self._tokens, 2)}
+
+
+def status_of(exc: BaseException) -> Optional[int]:
+    """HTTP status carried by an SDK or REST exception, or None for transport errors."""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def _is_connect_error(exc: BaseException) -> bool:
+    """True when the request never reached the server."""
+    try:
+        import requests
+        import urllib3
+        if isinstance(exc, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+            # "Connection aborted" mid-request also surfaces as ConnectionError; only trust
+            # failures to open the connection in the first place.
+            reason = getattr(exc.args[0], "reason", None)
+            if isinstance(reason, urllib3.exceptions.NewConnectionError):
+                return True
+    except ImportError:
+        pass
+    try:
+        import httpx
+        if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+    except ImportError:
+        pass
+    return isinstance(exc, ConnectionRefusedError)
+
+
+def _is_transient_transport(exc: BaseException) -> bool:
+    if _is_connect_error(exc):
+        return True
+    if isinstance(exc, (ConnectionError, TimeoutError, socket.timeout)):
+        return True
+    try:
+        import requests
+        if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+            return True
+    except ImportError:
+        pass
+    try:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return False
+
+
+def is_retryable(exc: BaseException, idempotent: bool) -> bool:
+    status = status_of(exc)
+    if status is not None:
+        return status in (RETRYABLE_STATUS if idempotent else NOT_PROCESSED_STATUS)
+    if idempotent:
+        return _is_transient_transport(exc)
+    return _is_connect_error(exc)
+
+
+default_policy = RetryPolicy.from_env()
+default_budget = RetryBudget(ratio=float(os.getenv("VEO_RETRY_BUDGET_RATIO", "0.2")))
+
+
+def call_with_retry(
+    fn: Callable[..., Any],
+    *args: Any,
+    op: str = "call",
+    idempotent: bool = True,
+    policy: Optional[RetryPolicy] = None,
+    budget: Optional[RetryBudget] = None,
+    **kwargs: Any,
+) -> Any:
+    """Call ``fn(*args, **kwargs)``, retrying transient failures per `policy` and `budget`."""
+    policy = policy or default_policy
+    budget = budget or default_budget
+    budget.record_call()
+    attempt = 1
+    while True:
+        try:
+            result = fn(*args, **kwargs)
+            if attempt > 1:
+                budget.record("recovered")
+            return result
+        except Exception as e:
+            if not is_retryable(e, idempotent):
+                raise
+            if attempt >= policy.max_attempts:
+                budget.record("gave_up")
+                logger.warning("retry: %s failed after %d attempts: %s", op, attempt, e)
+                raise
+            if not budget.try_acquire():
+                logger.warning("retry: budget exhausted, not retrying %s: %s", op, e)
+                raise
+            delay = policy.delay(attempt)
+            logger.info("retry: %s attempt %d failed (%s); retrying in %.2fs", op, attempt, e, delay)
+            time.sleep(delay)
+            attempt += 1
+
+
+def retry_stats() -> Dict[str, Any]:
+    return default_budget.snapshot()
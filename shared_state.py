@@ -0,0 +1,219 @@
+"""
+Shared state for backend workers.
+
+Operation metadata, stitch-base blobs and idempotency-key responses have to be
+visible to every uvicorn worker (and replica) that might serve a later
+/status, /download or client retry, so they live behind the SharedState
+interface instead of in process memory or the CWD.
+
+The bundled backend keeps metadata in SQLite (WAL mode, safe for concurrent
+processes on one host) and blobs as plain files in a blob directory. Put both
+on a shared volume to span hosts, or register another backend:
+
+    register_backend("redis", lambda url: RedisSharedState(url))
+    VEO_SHARED_STATE_URL=redis://...
+"""
+import os
+import json
+import time
+import shutil
+import sqlite3
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Dict, Any, Callable
+from urllib.parse import urlparse
+
+from workspace import workspace
+
+logger = logging.getLogger("shared_state")
+
+
+class SharedState(ABC):
+    """Interface for cross-worker operation metadata and blobs."""
+
+    # --- operation metadata -------------------------------------------
+    @abstractmethod
+    def put_operation(self, operation_name: str, meta: Dict[str, Any]) -> None:
+        """Create or merge metadata for an operation."""
+
+    @abstractmethod
+    def get_operation(self, operation_name: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    # --- blobs --------------------------------------------------------
+    @abstractmethod
+    def put_blob(self, key: str, src_path: str) -> None:
+        """Move the file at `src_path` into the store under `key`."""
+
+    @abstractmethod
+    def blob_path(self, key: str) -> Optional[str]:
+        """Local path of the blob, or None if it does not exist (or was evicted)."""
+
+    @abstractmethod
+    def delete_blob(self, key: str) -> None:
+        ...
+
+    # --- idempotency keys ---------------------------------------------
+    @abstractmethod
+    def claim_idempotency_key(self, key: str, fingerprint: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Atomically reserve `key` for a request being processed now.
+
+        Returns None if the caller now owns the key, otherwise the existing record:
+        {"state": "pending" | "done", "fingerprint", "status", "headers", "body"}.
+        An unfinished claim expires after `lease_seconds` (e.g. its worker died).
+        """
+
+    @abstractmethod
+    def complete_idempotency_key(self, key: str, status: int, headers: Dict[str, str], body: bytes, ttl_seconds: float) -> None:
+        """Store the response for a claimed key; it is replayed until `ttl_seconds` have passed."""
+
+    @abstractmethod
+    def release_idempotency_key(self, key: str) -> None:
+        """Drop a claim without a stored response so the request can be retried."""
+
+
+class SQLiteSharedState(SharedState):
+    def __init__(self, db_path: str, blob_dir: str):
+        self.db_path = os.path.abspath(db_path)
+        self.blob_dir = os.path.abspath(blob_dir)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS operations ("
+                " name TEXT PRIMARY KEY, meta TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency ("
+                " key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, state TEXT NOT NULL,"
+                " status INTEGER, headers TEXT, body BLOB, expires_at REAL NOT NULL)"
+            )
+        logger.info("SQLiteSharedState: db=%s blobs=%s", self.db_path, self.blob_dir)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # --- operation metadata -------------------------------------------
+    def put_operation(self, operation_name: str, meta: Dict[str, Any]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT meta FROM operations WHERE name = ?", (operation_name,)).fetchone()
+            merged = json.loads(row[0]) if row else {}
+            merged.update(meta)
+            conn.execute(
+                "INSERT OR REPLACE INTO operations (name, meta, updated_at) VALUES (?, ?, ?)",
+                (operation_name, json.dumps(merged, default=str), time.time()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_operation(self, operation_name: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT meta FROM operations WHERE name = ?", (operation_name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # --- blobs --------------------------------------------------------
+    def _blob_file(self, key: str) -> str:
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+        return os.path.join(self.blob_dir, safe)
+
+    def put_blob(self, key: str, src_path: str) -> None:
+        dest = self._blob_file(key)
+        tmp = f"{dest}.partial.{os.getpid()}"
+        shutil.move(src_path, tmp)
+        os.replace(tmp, dest)  # atomic publish: readers never see a partial file
+
+    def blob_path(self, key: str) -> Optional[str]:
+        path = self._blob_file(key)
+        return path if os.path.exists(path) else None
+
+    def delete_blob(self, key: str) -> None:
+        try:
+            os.remove(self._blob_file(key))
+        except FileNotFoundError:
+            pass
+
+    # --- idempotency keys ---------------------------------------------
+    def claim_idempotency_key(self, key: str, fingerprint: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM idempotency WHERE expires_at < ?", (now,))
+            row = conn.execute(
+                "SELECT fingerprint, state, status, headers, body FROM idempotency WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO idempotency (key, fingerprint, state, expires_at) VALUES (?, ?, 'pending', ?)",
+                    (key, fingerprint, now + lease_seconds),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {
+            "fingerprint": row[0],
+            "state": row[1],
+            "status": row[2],
+            "headers": json.loads(row[3]) if row[3] else {},
+            "body": row[4],
+        }
+
+    def complete_idempotency_key(self, key: str, status: int, headers: Dict[str, str], body: bytes, ttl_seconds: float) -> None:
+        self._conn().execute(
+            "UPDATE idempotency SET state = 'done', status = ?, headers = ?, body = ?, expires_at = ? WHERE key = ?",
+            (status, json.dumps(headers), body, time.time() + ttl_seconds, key),
+        )
+
+    def release_idempotency_key(self, key: str) -> None:
+        self._conn().execute("DELETE FROM idempotency WHERE key = ? AND state = 'pending'", (key,))
+
+
+# ----------------------------------------------------------------------
+# FACTORY
+# ----------------------------------------------------------------------
+_BACKENDS: Dict[str, Callable[[str], SharedState]] = {}
+
+
+def register_backend(scheme: str, factory: Callable[[str], SharedState]) -> None:
+    _BACKENDS[scheme] = factory
+
+
+def _sqlite_factory(url: str) -> SharedState:
+    parsed = urlparse(url)
+    db_path = parsed.path or os.path.join(tempfile.gettempdir(), "veo_shared_state.db")
+    # Blobs default to the workspace bases/ area so the janitor ages them out.
+    blob_dir = os.getenv("VEO_SHARED_BLOB_DIR") or workspace.area("bases")
+    return SQLiteSharedState(db_path, blob_dir)
+
+
+register_backend("sqlite", _sqlite_factory)
+
+
+def create_shared_state(url: Optional[str] = None) -> SharedState:
+    url = url or os.getenv(
+        "VEO_SHARED_STATE_URL",
+        "sqlite://" + os.path.join(tempfile.gettempdir(), "veo_shared_state.db"),
+    )
+    scheme = urlparse(url).scheme
+    if scheme not in _BACKENDS:
+        raise RuntimeError(f"No shared-state backend registered for scheme '{scheme}' (url={url})")
+    return _BACKENDS[scheme](url)
+
+
+shared_state = create_shared_state()
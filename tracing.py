@@ -0,0 +1,319 @@
+"""
+Per-job tracing for the Veo pipeline.
+
+Every generation job gets a trace ID when it is submitted. backend.py stores it
+in the operation's shared-state metadata, so the later /status polls and the
+/download (possibly on another worker) add their spans to the same trace:
+
+    submit:<mode>
+      spool_upload, upload_file, generate_*
+    poll                        (one per /status call)
+    download
+      download_video_bytes, stitch_videos
+
+Finished spans are handed to a background exporter thread, so the request
+path never does trace I/O. Exporters are selected with VEO_TRACE_EXPORT
+(comma-separated):
+
+    chrome   one JSON-lines file per trace under VEO_TRACE_DIR; GET /trace/{operation}
+             returns it as Chrome trace JSON (open in chrome://tracing or Perfetto)
+    otlp     OTLP/HTTP JSON batches to VEO_OTLP_ENDPOINT
+             (default http://127.0.0.1:4318/v1/traces, e.g. a local OpenTelemetry Collector or Jaeger)
+
+With VEO_TRACE_EXPORT unset spans are still timed (they are cheap) but dropped.
+"""
+import os
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+import contextvars
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+from workspace import workspace
+
+logger = logging.getLogger("tracing")
+
+SERVICE_NAME = os.getenv("VEO_TRACE_SERVICE_NAME", "veo-backend")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = 0
+    end_ns: int = 0
+    thread_id: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "pid": os.getpid(),
+            "tid": self.thread_id,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+_current_trace: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex  # 32 hex chars, valid as an OTLP/W3C trace ID
+
+
+def current_trace_id() -> Optional[str]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace(trace_id: Optional[str] = None):
+    """Make `trace_id` (or a new one) the trace for spans opened in this context."""
+    trace_id = trace_id or new_trace_id()
+    token = _current_trace.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Time a block as a child of the current span (or a root span of the current trace)."""
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent else (_current_trace.get() or new_trace_id())
+    s = Span(
+        name=name,
+        trace_id=trace_id,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        thread_id=threading.get_ident(),
+        attributes=dict(attributes),
+    )
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(token)
+        exporter.submit(s)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of ``span`` for helper functions."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ----------------------------------------------------------------------
+# EXPORT
+# ----------------------------------------------------------------------
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """OTLP/HTTP JSON payload (ExportTraceServiceRequest) for span dicts."""
+    out = []
+    for s in spans:
+        item = {
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "name": s["name"],
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["end_ns"]),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s["attributes"].items()],
+            "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+        }
+        if s["parent_id"]:
+            item["parentSpanId"] = s["parent_id"]
+        out.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "veo.tracing"}, "spans": out}],
+        }]
+    }
+
+
+def to_chrome(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Chrome trace-event JSON ("X" complete events) for span dicts."""
+    events = []
+    for s in sorted(spans, key=lambda s: s["start_ns"]):
+        args = dict(s["attributes"], span_id=s["span_id"])
+        if s["error"]:
+            args["error"] = s["error"]
+        events.append({
+            "name": s["name"],
+            "cat": "veo",
+            "ph": "X",
+            "ts": s["start_ns"] / 1000,
+            "dur": max(0, s["end_ns"] - s["start_ns"]) / 1000,
+            "pid": s["pid"],
+            "tid": s["tid"],
+            "args": args,
+        })
+    trace_id = spans[0]["trace_id"] if spans else None
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": trace_id}}
+
+
+class TraceExporter:
+    """Batches finished spans on a background thread and writes them to the configured sinks."""
+
+    def __init__(self, sinks: List[str], trace_dir: Optional[str] = None, otlp_endpoint: Optional[str] = None,
+                 batch_size: int = 256, flush_interval: float = 2.0, max_queue: int = 10000):
+        self.sinks = [s for s in sinks if s]
+        self.trace_dir = trace_dir
+        self.otlp_endpoint = otlp_endpoint
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {"exported": 0, "dropped": 0, "export_errors": 0}
+
+    @classmethod
+    def from_env(cls) -> "TraceExporter":
+        sinks = [s.strip().lower() for s in os.getenv("VEO_TRACE_EXPORT", "").split(",")]
+        return cls(
+            sinks=sinks,
+            trace_dir=os.getenv("VEO_TRACE_DIR"),
+            otlp_endpoint=os.getenv("VEO_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def _trace_dir(self) -> str:
+        # Default under the workspace so the janitor ages old traces out
+        if not self.trace_dir:
+            self.trace_dir = workspace.area("traces")
+        os.makedirs(self.trace_dir, exist_ok=True)
+        return self.trace_dir
+
+    def trace_file(self, trace_id: str) -> str:
+        safe = "".join(c for c in trace_id if c.isalnum())
+        return os.path.join(self._trace_dir(), f"{safe}.jsonl")
+
+    def submit(self, s: Span) -> None:
+        if not self.enabled:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(s)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _ensure_thread(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Span] = []
+            waiters: List[threading.Event] = []
+            deadline = time.monotonic() + self.flush_interval
+            item = self._queue.get()
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)  # flush() marker: export what we have now
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._export([s.to_dict() for s in batch])
+            for waiter in waiters:
+                waiter.set()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Block until spans finished so far have been exported (e.g. before reading a trace)."""
+        if not self.enabled or not (self._thread and self._thread.is_alive()):
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _export(self, spans: List[Dict[str, Any]]) -> None:
+        if "chrome" in self.sinks:
+            try:
+                by_trace: Dict[str, List[str]] = {}
+                for s in spans:
+                    by_trace.setdefault(s["trace_id"], []).append(json.dumps(s, default=str))
+                for trace_id, lines in by_trace.items():
+                    with open(self.trace_file(trace_id), "a") as f:
+                        f.write("\n".join(lines) + "\n")
+            except Exception as e:
+                self.stats["export_errors"] += 1
+                logger.warning("tracing: failed to write chrome spans: %s", e)
+        if "otlp" in self.sinks and self.otlp_endpoint:
+            try:
+                body = json.dumps(to_otlp(spans), default=str).encode()
+                req = urllib.request.Request(self.otlp_endpoint, data=body, headers={"Content-Type": "application/json"})
+                urllib.request.urlopen(req, timeout=5).close()
+            except Exception as e:
+                self.stats["export_errors"] += 1
+                logger.warning("tracing: OTLP export to %s failed: %s", self.otlp_endpoint, e)
+        self.stats["exported"] += len(spans)
+
+    def load_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Spans written by the chrome sink (from every worker) for one trace."""
+        path = self.trace_file(trace_id)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+exporter = TraceExporter.from_env()
@@ -0,0 +1,118 @@
+"""
+Streaming ingestion for multipart uploads.
+
+FastAPI's UploadFile keeps small bodies in memory and rolls larger ones over to
+an anonymous temp file. Calling ``await upload.read()`` pulls the whole body
+back into memory, so instead we copy ``upload.file`` in fixed-size chunks into
+the managed workspace (hashing as we go) and hand downstream helpers a path.
+"""
+import os
+import uuid
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from workspace import workspace
+from tracing import span
+
+logger = logging.getLogger("uploads")
+
+CHUNK_SIZE = int(os.getenv("VEO_SPOOL_CHUNK_BYTES", str(1024 * 1024)))
+
+
+@dataclass
+class SpooledUpload:
+    """An upload that has been written to disk."""
+    path: str
+    size: int
+    sha256: str
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+
+    def remove(self) -> None:
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except OSError as e:
+            logger.warning("SpooledUpload: failed to remove %s: %s", self.path, e)
+
+
+def _copy_to_spool(src, dest_path: str, chunk_size: int) -> tuple:
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        src.seek(0)
+    except Exception:
+        pass
+    with open(dest_path, "wb") as out:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def _hash_stream(src, chunk_size: int) -> str:
+    digest = hashlib.sha256()
+    src.seek(0)
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+    src.seek(0)
+    return digest.hexdigest()
+
+
+async def upload_sha256(upload) -> str:
+    """sha256 of an UploadFile's content, read in chunks off the loop; the file is rewound for spool_upload."""
+    return await run_in_threadpool(_hash_stream, upload.file, CHUNK_SIZE)
+
+
+async def spool_upload(upload, suffix: str = "", spool_dir: Optional[str] = None) -> SpooledUpload:
+    """
+    Copy an UploadFile into the workspace in chunks and return its location.
+
+    Inside a ``workspace.job()`` scope the file lands in the job directory and is
+    cleaned up with it. The copy runs in the threadpool so the event loop is never
+    blocked on disk I/O. The caller should still ``remove()`` (or move) the file
+    as soon as it is no longer needed.
+    """
+    if not suffix and upload.filename:
+        suffix = os.path.splitext(upload.filename)[1]
+    # Walks (and may evict from) the workspace: keep it off the loop. The reservation stops
+    # concurrent uploads from all passing the check and overshooting the quota together.
+    reserved = await run_in_threadpool(workspace.ensure_capacity, getattr(upload, "size", None) or 0)
+    try:
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+            dest_path = os.path.join(spool_dir, f"upload_{uuid.uuid4().hex}{suffix}")
+        else:
+            dest_path = workspace.path("upload", suffix)
+
+        try:
+            with span("spool_upload", filename=upload.filename or "") as s:
+                size, sha256 = await run_in_threadpool(_copy_to_spool, upload.file, dest_path, CHUNK_SIZE)
+                s.set(bytes=size)
+        except Exception:
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            raise
+    finally:
+        # written (now counted on disk) or removed
+        workspace.release(reserved)
+
+    logger.info("spool_upload: %s -> %s (%d bytes, sha256=%s)", upload.filename, dest_path, size, sha256[:12])
+    return SpooledUpload(
+        path=dest_path,
+        size=size,
+        sha256=sha256,
+        filename=upload.filename,
+        content_type=upload.content_type,
+    )
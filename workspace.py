@@ -0,0 +1,345 @@
+"""
+Managed temp-file workspace for the Veo backend.
+
+All scratch files (spooled uploads, extracted frames, stitch inputs/outputs and
+stitch bases) live under one configurable root instead of the process CWD:
+
+    <root>/jobs/<job_id>/   per-request scratch, removed when the job scope exits
+    <root>/bases/           stitch bases that must outlive a request
+    <root>/scratch/         files allocated outside of any job scope
+
+A background janitor evicts files by age, and by size once usage crosses the
+quota's high-water mark. Point VEO_WORKSPACE_DIR at a tmpfs (e.g. /dev/shm/veo)
+to keep scratch I/O off disk.
+
+The root is shared by every worker process, so eviction never relies on
+in-process state alone:
+
+- each open job directory holds a ``.live`` marker that its owner touches on
+  every janitor pass; job directories with a fresh marker (any worker's) are
+  never evicted, and a marker older than three janitor intervals means the
+  owner died and the directory is fair game;
+- stitch bases are only removed by age, never to make room, since another
+  worker's download still has to consume them.
+"""
+import os
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger("workspace")
+
+DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), "veo_workspace")
+LIVE_MARKER = ".live"
+
+
+class WorkspaceQuotaExceeded(RuntimeError):
+    pass
+
+
+class JobScope:
+    """Scratch directory for a single job; everything in it is removed on exit."""
+
+    def __init__(self, workspace: "Workspace", job_id: str):
+        self.workspace = workspace
+        self.job_id = job_id
+        self.dir = os.path.join(workspace.root, "jobs", job_id)
+        self.marker = os.path.join(self.dir, LIVE_MARKER)
+
+    def touch(self) -> None:
+        """Create or refresh the marker that keeps every worker's janitor out of this job."""
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(self.marker, "a"):
+                pass
+            os.utime(self.marker)
+        except OSError as e:
+            logger.warning("workspace: cannot mark job %s live: %s", self.job_id, e)
+
+    def path(self, prefix: str, suffix: str = "") -> str:
+        os.makedirs(self.dir, exist_ok=True)
+        return os.path.join(self.dir, f"{prefix}_{uuid.uuid4().hex}{suffix}")
+
+
+_current_job: contextvars.ContextVar[Optional[JobScope]] = contextvars.ContextVar("workspace_job", default=None)
+
+
+class Workspace:
+    def __init__(
+        self,
+        root: str = DEFAULT_ROOT,
+        quota_bytes: int = 10 * 1024 ** 3,
+        max_age_seconds: float = 6 * 3600,
+        janitor_interval: float = 60.0,
+        high_water: float = 0.9,
+        low_water: float = 0.75,
+    ):
+        self.root = os.path.abspath(root)
+        self.quota_bytes = quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self.janitor_interval = janitor_interval
+        self.high_water = high_water
+        self.low_water = low_water
+
+        self._lock = threading.Lock()
+        self._active_jobs: Dict[str, JobScope] = {}
+        # bytes promised to files being written (see ensure_capacity / release)
+        self._reserved = 0
+        # last full scan: (monotonic time, bytes used, file count)
+        self._usage_cache: Optional[Tuple[float, int, int]] = None
+        # a job marker not touched for this long belongs to a dead worker
+        self.live_timeout = max(60.0, 3 * janitor_interval)
+        self._stop = threading.Event()
+        self._janitor: Optional[threading.Thread] = None
+        self._stats = {"evicted_files": 0, "evicted_bytes": 0, "janitor_runs": 0, "quota_rejections": 0}
+
+        os.makedirs(self.root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "Workspace":
+        return cls(
+            root=os.getenv("VEO_WORKSPACE_DIR", DEFAULT_ROOT),
+            quota_bytes=int(float(os.getenv("VEO_WORKSPACE_QUOTA_MB", "10240")) * 1024 * 1024),
+            max_age_seconds=float(os.getenv("VEO_WORKSPACE_MAX_AGE_SECONDS", str(6 * 3600))),
+            janitor_interval=float(os.getenv("VEO_WORKSPACE_JANITOR_INTERVAL", "60")),
+        )
+
+    # ------------------------------------------------------------------
+    # ALLOCATION
+    # ------------------------------------------------------------------
+    def area(self, name: str) -> str:
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def path(self, prefix: str, suffix: str = "") -> str:
+        """Allocate a unique path in the current job scope (or the shared scratch area)."""
+        job = _current_job.get()
+        if job is not None and job.workspace is self:
+            return job.path(prefix, suffix)
+        return os.path.join(self.area("scratch"), f"{prefix}_{uuid.uuid4().hex}{suffix}")
+
+    def fixed_path(self, area: str, filename: str) -> str:
+        """Deterministic path for files looked up by name later (e.g. stitch bases)."""
+        return os.path.join(self.area(area), filename)
+
+    @contextmanager
+    def job(self, job_id: Optional[str] = None):
+        """Scope temp files to one job. The job directory is removed on exit, even on failure."""
+        scope = JobScope(self, job_id or uuid.uuid4().hex)
+        scope.touch()
+        with self._lock:
+            self._active_jobs[scope.job_id] = scope
+        token = _current_job.set(scope)
+        try:
+            yield scope
+        finally:
+            _current_job.reset(token)
+            with self._lock:
+                self._active_jobs.pop(scope.job_id, None)
+            shutil.rmtree(scope.dir, ignore_errors=True)
+
+    def ensure_capacity(self, nbytes: int = 0) -> int:
+        """
+        Reserve `nbytes` of the quota for a file about to be written, evicting if needed;
+        raise WorkspaceQuotaExceeded if it would not fit next to the other reservations.
+
+        Walks the workspace, so call it off the event loop. Returns the bytes reserved:
+        pass them to release() once the file is written (or removed).
+        """
+        for attempt in range(2):
+            used = self._scan_usage()[0]
+            with self._lock:
+                reserved = self._reserved
+                if used + reserved + nbytes <= self.quota_bytes:
+                    self._reserved += nbytes
+                    return nbytes
+            if attempt == 0:
+                self.evict(target_bytes=max(0, self.quota_bytes - reserved - nbytes))
+        self._stats["quota_rejections"] += 1
+        raise WorkspaceQuotaExceeded(
+            f"workspace quota exceeded: used={used} reserved={reserved} requested={nbytes} quota={self.quota_bytes}"
+        )
+
+    def release(self, nbytes: int) -> None:
+        """Return a reservation made by ensure_capacity()."""
+        with self._lock:
+            self._reserved = max(0, self._reserved - nbytes)
+
+    # ------------------------------------------------------------------
+    # EVICTION
+    # ------------------------------------------------------------------
+    def _iter_files(self) -> List[Tuple[str, int, float]]:
+        out = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name == LIVE_MARKER:
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                out.append((full, st.st_size, st.st_mtime))
+        return out
+
+    def _scan_usage(self) -> Tuple[int, int]:
+        files = self._iter_files()
+        used, count = sum(size for _, size, _ in files), len(files)
+        self._usage_cache = (time.monotonic(), used, count)
+        return used, count
+
+    def _heartbeat(self) -> None:
+        with self._lock:
+            scopes = list(self._active_jobs.values())
+        for scope in scopes:
+            scope.touch()
+
+    def _live_job_dirs(self) -> List[str]:
+        """Job directories of this and every other worker whose marker is fresh."""
+        with self._lock:
+            live = {scope.dir for scope in self._active_jobs.values()}
+        jobs_dir = os.path.join(self.root, "jobs")
+        now = time.time()
+        try:
+            names = os.listdir(jobs_dir)
+        except OSError:
+            names = []
+        for name in names:
+            path = os.path.join(jobs_dir, name)
+            try:
+                if now - os.stat(os.path.join(path, LIVE_MARKER)).st_mtime < self.live_timeout:
+                    live.add(path)
+            except OSError:
+                continue
+        return list(live)
+
+    @staticmethod
+    def _is_protected(path: str, live_dirs: List[str]) -> bool:
+        return any(path.startswith(d + os.sep) for d in live_dirs)
+
+    def _remove(self, path: str, size: int) -> bool:
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        self._stats["evicted_files"] += 1
+        self._stats["evicted_bytes"] += size
+        return True
+
+    def evict(self, target_bytes: Optional[int] = None) -> int:
+        """
+        Remove expired files, then the oldest files until usage is under `target_bytes`
+        (defaults to the low-water mark). Files in live job scopes (of any worker) are never
+        touched; stitch bases only expire by age. Returns the number of files removed.
+        """
+        self._heartbeat()
+        now = time.time()
+        removed = 0
+        live_dirs = self._live_job_dirs()
+        bases = os.path.join(self.root, "bases") + os.sep
+        files = [f for f in self._iter_files() if not self._is_protected(f[0], live_dirs)]
+        survivors = []
+        for path, size, mtime in files:
+            if now - mtime > self.max_age_seconds:
+                removed += self._remove(path, size)
+            elif not path.startswith(bases):
+                survivors.append((path, size, mtime))
+
+        used = self._scan_usage()[0]
+        if target_bytes is None:
+            if used <= self.quota_bytes * self.high_water:
+                return removed
+            target_bytes = int(self.quota_bytes * self.low_water)
+        for path, size, _ in sorted(survivors, key=lambda f: f[2]):
+            if used <= target_bytes:
+                break
+            if self._remove(path, size):
+                removed += 1
+                used -= size
+
+        self._prune_empty_dirs()
+        if removed:
+            logger.info("workspace: evicted %d files (used now %d bytes)", removed, used)
+        return removed
+
+    def _prune_empty_dirs(self) -> None:
+        jobs_dir = os.path.join(self.root, "jobs")
+        if not os.path.isdir(jobs_dir):
+            return
+        live = set(self._live_job_dirs())
+        for name in os.listdir(jobs_dir):
+            path = os.path.join(jobs_dir, name)
+            if path in live or not os.path.isdir(path):
+                continue
+            try:
+                # only a stale marker left: the owner died after its files were evicted
+                if set(os.listdir(path)) <= {LIVE_MARKER}:
+                    if os.path.exists(os.path.join(path, LIVE_MARKER)):
+                        os.remove(os.path.join(path, LIVE_MARKER))
+                    os.rmdir(path)
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # JANITOR
+    # ------------------------------------------------------------------
+    def start_janitor(self) -> None:
+        if self._janitor and self._janitor.is_alive():
+            return
+        self._stop.clear()
+        self._janitor = threading.Thread(target=self._janitor_loop, name="workspace-janitor", daemon=True)
+        self._janitor.start()
+        logger.info("workspace: janitor started (root=%s, quota=%d bytes)", self.root, self.quota_bytes)
+
+    def stop_janitor(self) -> None:
+        self._stop.set()
+        if self._janitor:
+            self._janitor.join(timeout=5)
+
+    def _janitor_loop(self) -> None:
+        while not self._stop.wait(self.janitor_interval):
+            try:
+                self.evict()
+                self._stats["janitor_runs"] += 1
+            except Exception:
+                logger.exception("workspace: janitor pass failed")
+
+    # ------------------------------------------------------------------
+    # METRICS
+    # ------------------------------------------------------------------
+    def usage(self) -> Dict[str, Any]:
+        """Workspace usage; the tree is walked at most once per janitor interval."""
+        cached = self._usage_cache
+        if cached is not None and time.monotonic() - cached[0] < self.janitor_interval:
+            used, count = cached[1], cached[2]
+        else:
+            used, count = self._scan_usage()
+        with self._lock:
+            active_jobs = len(self._active_jobs)
+            reserved = self._reserved
+        try:
+            disk = shutil.disk_usage(self.root)
+            disk_free = disk.free
+        except OSError:
+            disk_free = None
+        return {
+            "root": self.root,
+            "bytes_used": used,
+            "bytes_reserved": reserved,
+            "files": count,
+            "quota_bytes": self.quota_bytes,
+            "quota_used_ratio": round(used / self.quota_bytes, 4) if self.quota_bytes else None,
+            "active_jobs": active_jobs,
+            "disk_free_bytes": disk_free,
+            **self._stats,
+        }
+
+
+workspace = Workspace.from_env()